@@ -1,9 +1,14 @@
 # Optional list of dependencies required by the package
 dependencies = ['torch']
 
+# With pretrained=True every entry point loads its checkpoint from the
+# torchvision.models.store.WeightStore in $TORCHVISION_WEIGHT_STORE when it
+# holds it, and only downloads otherwise.
 from torchvision.models.alexnet import alexnet
 from torchvision.models.densenet import densenet121, densenet169, densenet201, densenet161
-from torchvision.models.inception import inception_v3
-from torchvision.models.resnet import resnet18, resnet34, resnet50, resnet101, resnet152
+from torchvision.models.googlenet import googlenet
+from torchvision.models.inception import inception_v3, inception_v3_wide
+from torchvision.models.resnet import resnet18, resnet34, resnet50, resnet101, resnet152, resnet101_wide
+from torchvision.models.shufflenetv2 import shufflenetv2_x0_5, shufflenetv2_x1_0
 from torchvision.models.squeezenet import squeezenet1_0, squeezenet1_1
 from torchvision.models.vgg import vgg11, vgg13, vgg16, vgg19, vgg11_bn, vgg13_bn, vgg16_bn, vgg19_bn
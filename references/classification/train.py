@@ -12,13 +12,15 @@ from torchvision import transforms
 import utils
 
 
-def train_one_epoch(model, criterion, optimizer, data_loader, device, epoch, print_freq):
+def train_one_epoch(model, criterion, optimizer, data_loader, device, epoch, print_freq, batch_transform=None):
     model.train()
     metric_logger = utils.MetricLogger(delimiter="  ")
     metric_logger.add_meter('lr', utils.SmoothedValue(window_size=1, fmt='{value}'))
     header = 'Epoch: [{}]'.format(epoch)
     for image, target in metric_logger.log_every(data_loader, print_freq, header):
         image, target = image.to(device), target.to(device)
+        if batch_transform is not None:
+            image = batch_transform(image)
         output = model(image)
         loss = criterion(output, target)
 
@@ -79,14 +81,22 @@ def main(args):
     scale = (0.08, 1.0)
     if args.model == 'mobilenet_v2':
         scale = (0.2, 1.0)
-    dataset = torchvision.datasets.ImageFolder(
-        traindir,
-        transforms.Compose([
+    batch_transform = None
+    if args.fused_transform == 'float':
+        train_transform = transforms.FusedRandomResizedCrop(224, scale=scale, mean=normalize.mean,
+                                                            std=normalize.std)
+    elif args.fused_transform == 'uint8':
+        # normalize whole batches on the device instead of per sample
+        train_transform = transforms.FusedRandomResizedCrop(224, scale=scale, dtype=torch.uint8)
+        batch_transform = transforms.BatchNormalize(normalize.mean, normalize.std)
+    else:
+        train_transform = transforms.Compose([
             transforms.RandomResizedCrop(224, scale=scale),
             transforms.RandomHorizontalFlip(),
             transforms.ToTensor(),
             normalize,
-        ]))
+        ])
+    dataset = torchvision.datasets.ImageFolder(traindir, train_transform)
     print("Took", time.time() - st)
 
     print("Loading validation data")
@@ -150,7 +160,7 @@ def main(args):
         if args.distributed:
             train_sampler.set_epoch(epoch)
         lr_scheduler.step()
-        train_one_epoch(model, criterion, optimizer, data_loader, device, epoch, args.print_freq)
+        train_one_epoch(model, criterion, optimizer, data_loader, device, epoch, args.print_freq, batch_transform)
         evaluate(model, criterion, data_loader_test, device=device)
         if args.output_dir:
             utils.save_on_master({
@@ -188,6 +198,9 @@ if __name__ == "__main__":
     parser.add_argument('--print-freq', default=10, type=int, help='print frequency')
     parser.add_argument('--output-dir', default='.', help='path where to save')
     parser.add_argument('--resume', default='', help='resume from checkpoint')
+    parser.add_argument('--fused-transform', default=None, choices=['float', 'uint8'],
+                        help='crop, flip and normalize training images with FusedRandomResizedCrop; '
+                             'uint8 defers normalization to the device')
     parser.add_argument(
         "--test-only",
         dest="test_only",
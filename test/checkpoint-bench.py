@@ -0,0 +1,59 @@
+import argparse
+import resource
+import subprocess
+import sys
+from timeit import default_timer as timer
+import torch
+from torchvision import models
+
+
+parser = argparse.ArgumentParser(description='Activation checkpointing memory / step time report')
+parser.add_argument('--models', default=['inception_v3', 'resnet50', 'densenet121'], nargs='+',
+                    help='model names in torchvision.models')
+parser.add_argument('--size', default=448, type=int, help='square input size (default: 448)')
+parser.add_argument('-b', '--batch-size', default=4, type=int)
+parser.add_argument('--steps', default=3, type=int, help='timed training steps (default: 3)')
+parser.add_argument('--model', default=None, help='run a single model in this process (used internally)')
+parser.add_argument('--checkpoint', action='store_true', help='enable checkpointing (used internally)')
+
+
+def run(args):
+    kwargs = {'aux_logits': False} if args.model == 'inception_v3' else {}
+    model = models.__dict__[args.model](num_classes=10, checkpoint=args.checkpoint, **kwargs)
+    model.train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+    criterion = torch.nn.CrossEntropyLoss()
+    x = torch.rand(args.batch_size, 3, args.size, args.size)
+    target = torch.randint(0, 10, (args.batch_size,))
+
+    def step():
+        loss = criterion(model(x), target)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+    # a first step allocates the gradients and the optimizer state
+    step()
+    start_time = timer()
+    for _ in range(args.steps):
+        step()
+    step_time = (timer() - start_time) / args.steps
+    # ru_maxrss is reported in kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print("{model:>14} checkpoint={checkpoint!s:<5}: {time:.2f} s/step, max RSS {rss:.0f} MB"
+          .format(model=args.model, checkpoint=args.checkpoint, time=step_time, rss=rss))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.model is not None:
+        run(args)
+    else:
+        print("{}px, batch size {}".format(args.size, args.batch_size))
+        # each setting runs in a fresh interpreter so RSS is not shared between them
+        for model in args.models:
+            for checkpoint in (False, True):
+                command = [sys.executable, __file__, '--model', model, '--size', str(args.size),
+                           '-b', str(args.batch_size), '--steps', str(args.steps)]
+                subprocess.check_call(command + (['--checkpoint'] if checkpoint else []))
@@ -0,0 +1,75 @@
+import argparse
+import resource
+import subprocess
+import sys
+from timeit import default_timer as timer
+import torch
+import torch.nn.functional as F
+from torchvision import models
+from torchvision.models import densenet
+
+
+parser = argparse.ArgumentParser(description='DenseNet memory-efficient mode memory / throughput report')
+parser.add_argument('--arch', default='densenet121', help='densenet121, densenet161, densenet169 or densenet201')
+parser.add_argument('--size', default=224, type=int, help='square input size (default: 224)')
+parser.add_argument('-b', '--batch-size', default=16, type=int)
+parser.add_argument('--steps', default=3, type=int, help='timed training steps (default: 3)')
+parser.add_argument('--mode', default=None, choices=['concat', 'default', 'memory_efficient'],
+                    help='run a single mode in this process (used internally)')
+
+
+def concat_layer_forward(self, x):
+    # the implementation before the memory-efficient mode: every layer
+    # returns the concatenation of its input and its new features
+    new_features = self.conv2(self.relu2(self.norm2(self.bn_function(x))))
+    if self.drop_rate > 0:
+        new_features = F.dropout(new_features, p=self.drop_rate, training=self.training)
+    return torch.cat([x, new_features], 1)
+
+
+def concat_block_forward(self, x):
+    for layer in self.children():
+        x = layer(x)
+    return x
+
+
+def run(args):
+    if args.mode == 'concat':
+        densenet._DenseLayer.forward = concat_layer_forward
+        densenet._DenseBlock.forward = concat_block_forward
+    model = models.__dict__[args.arch](memory_efficient=args.mode == 'memory_efficient')
+    model.train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+    criterion = torch.nn.CrossEntropyLoss()
+    x = torch.rand(args.batch_size, 3, args.size, args.size)
+    target = torch.randint(0, 1000, (args.batch_size,))
+
+    def step():
+        loss = criterion(model(x), target)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+    # a first step allocates the gradients and the optimizer state
+    step()
+    start_time = timer()
+    for _ in range(args.steps):
+        step()
+    step_time = (timer() - start_time) / args.steps
+    # ru_maxrss is reported in kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print("{mode:>16}: {throughput:.1f} img/s, {time:.2f} s/step, max RSS {rss:.0f} MB"
+          .format(mode=args.mode, throughput=args.batch_size / step_time, time=step_time, rss=rss))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run(args)
+    else:
+        print("{} {}px, batch size {}".format(args.arch, args.size, args.batch_size))
+        # each mode runs in a fresh interpreter so RSS is not shared between them
+        for mode in ('concat', 'default', 'memory_efficient'):
+            subprocess.check_call([sys.executable, __file__, '--arch', args.arch, '--size', str(args.size),
+                                   '-b', str(args.batch_size), '--steps', str(args.steps), '--mode', mode])
@@ -0,0 +1,50 @@
+from __future__ import division
+import argparse
+from timeit import default_timer as timer
+import torch
+from torchvision import models
+from torchvision.models.utils import fuse_conv_bn
+
+
+parser = argparse.ArgumentParser(description='Conv+BN fusion CPU latency benchmark')
+parser.add_argument('--models', default=['inception_v3', 'inceptionv4', 'googlenet', 'resnet50', 'densenet121'],
+                    nargs='+', help='model names in torchvision.models')
+parser.add_argument('-b', '--batch-size', default=1, type=int)
+parser.add_argument('--repeat', default=10, type=int,
+                    help='forward passes per model (default: 10)')
+parser.add_argument('--threads', default=None, type=int,
+                    help='number of intra-op threads (default: torch default)')
+
+INPUT_SIZES = {'inception_v3': 299, 'inceptionv4': 299}
+
+
+def bench(model, x, repeat):
+    model(x)
+    start_time = timer()
+    for _ in range(repeat):
+        out = model(x)
+    return (timer() - start_time) / repeat * 1.0e+3, out
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+    torch.set_grad_enabled(False)
+    for name in args.models:
+        kwargs = {'aux_logits': False} if name in ('inception_v3', 'inceptionv4', 'googlenet') else {}
+        model = models.__dict__[name](**kwargs)
+        model.eval()
+        fused = fuse_conv_bn(model)
+        size = INPUT_SIZES.get(name, 224)
+        x = torch.rand(args.batch_size, 3, size, size)
+        model_ms, expected = bench(model, x, args.repeat)
+        fused_ms, output = bench(fused, x, args.repeat)
+        num_params = sum(p.numel() for p in model.parameters())
+        fused_params = sum(p.numel() for p in fused.parameters())
+        print("{name}: {model:.1f} ms -> {fused:.1f} ms ({speedup:.2f}x), params {params} -> {fused_params}, "
+              "max rel diff {diff:.1e}".format(name=name, model=model_ms, fused=fused_ms,
+                                               speedup=model_ms / fused_ms, params=num_params,
+                                               fused_params=fused_params,
+                                               diff=((output - expected).abs().max() /
+                                                     expected.abs().max()).item()))
@@ -0,0 +1,57 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+from timeit import default_timer as timer
+import torchvision.datasets as datasets
+from torchvision.datasets.heatmap import build_heatmap_index
+
+
+parser = argparse.ArgumentParser(description='positive_heatmap.json index benchmark')
+parser.add_argument('--data', metavar='PATH', required=True,
+                    help='path to a dataset split with a sibling <split>_heatmap folder, e.g. .../train')
+parser.add_argument('--mode', choices=['json', 'index'], default=None,
+                    help='run a single mode in this process (used internally)')
+
+
+def run(args):
+    index_path = os.path.join(args.data.rstrip('/').replace('_aug', '') + '_heatmap',
+                              'positive_heatmap.sqlite')
+    start_time = timer()
+    dataset = datasets.ImageFolder(args.data, with_heatmap=True,
+                                   heatmap_index=index_path if args.mode == 'index' else None)
+    startup = timer() - start_time
+
+    start_time = timer()
+    count = min(len(dataset), 1000)
+    for path, _ in dataset.samples[:count]:
+        filename = os.path.basename(path)
+        for suffix in ('_vhflip', '_vflip', '_hflip'):
+            filename = filename.replace(suffix, '')
+        stage = int(os.path.basename(os.path.dirname(path)))
+        if args.mode == 'index':
+            dataset.heatmap_index.get(stage, 1, filename)
+        else:
+            dataset.heatmap_Hemorrhages_jsons[stage][filename]
+    lookup = timer() - start_time
+
+    # ru_maxrss is reported in kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print("{mode:>5}: startup {startup:.2f} s, {lookup:.3f} ms/lookup, max RSS {rss:.0f} MB"
+          .format(mode=args.mode, startup=startup, lookup=lookup / count * 1.0e+3, rss=rss))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run(args)
+    else:
+        heatmap_root = args.data.rstrip('/').replace('_aug', '') + '_heatmap'
+        start_time = timer()
+        build_heatmap_index(heatmap_root)
+        print("Built index in {:.2f} s".format(timer() - start_time))
+        # each mode runs in a fresh interpreter so RSS is not shared between them
+        for mode in ('json', 'index'):
+            subprocess.check_call([sys.executable, __file__, '--data', args.data, '--mode', mode])
@@ -0,0 +1,54 @@
+from __future__ import division
+import argparse
+from timeit import default_timer as timer
+import numpy as np
+from PIL import Image
+import torchvision.transforms.functional as F
+
+
+parser = argparse.ArgumentParser(description='img_circle benchmark')
+parser.add_argument('--sizes', default=[299, 512, 2000], type=int, nargs='+',
+                    help='square image sizes to time (default: 299 512 2000)')
+parser.add_argument('--repeat', default=5, type=int,
+                    help='calls per size of the vectorized version (default: 5)')
+
+
+def loop_img_circle(img):
+    # the per-pixel implementation img_circle replaced
+    ima = img
+    size = ima.size
+    r2 = min(size[0], size[1])
+    if size[0] != size[1]:
+        ima = ima.resize((r2, r2), Image.ANTIALIAS)
+    r3 = int(r2 / 2)
+    imb = Image.new('RGBA', (r3 * 2, r3 * 2), (255, 255, 255, 0))
+    pima = ima.load()
+    pimb = imb.load()
+    r = float(r2 / 2)
+    for i in range(r2):
+        for j in range(r2):
+            lx = abs(i - r)
+            ly = abs(j - r)
+            dist = (pow(lx, 2) + pow(ly, 2)) ** 0.5
+            if dist < r3:
+                pimb[i - (r - r3), j - (r - r3)] = pima[i, j]
+    return imb
+
+
+def bench(fn, img, repeat):
+    start_time = timer()
+    for _ in range(repeat):
+        out = fn(img)
+    return (timer() - start_time) / repeat * 1.0e+3, out
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    for size in args.sizes:
+        img = Image.fromarray(np.random.randint(0, 256, (size, size, 3), dtype=np.uint8))
+        loop_ms, expected = bench(loop_img_circle, img, 1)
+        F.img_circle(img)  # build the cached mask
+        fast_ms, output = bench(F.img_circle, img, args.repeat)
+        print("{size}px: loop {loop:.1f} ms, vectorized {fast:.2f} ms, {speedup:.0f}x, identical: {same}"
+              .format(size=size, loop=loop_ms, fast=fast_ms, speedup=loop_ms / fast_ms,
+                      same=np.array_equal(np.array(expected), np.array(output))))
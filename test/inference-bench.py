@@ -0,0 +1,54 @@
+import argparse
+import warnings
+from timeit import default_timer as timer
+import torch
+from torchvision import models
+from torchvision.models.utils import prepare_for_inference
+
+
+parser = argparse.ArgumentParser(description='prepare_for_inference accuracy / CPU throughput report')
+parser.add_argument('--models', default=['resnet50', 'inception_v3', 'densenet121', 'mobilenet_v2',
+                                         'shufflenetv2_x1_0', 'squeezenet1_1', 'vgg11'], nargs='+',
+                    help='model names in torchvision.models')
+parser.add_argument('-b', '--batch-size', default=8, type=int)
+parser.add_argument('--repeat', default=3, type=int, help='timed batches per setting (default: 3)')
+
+SETTINGS = [
+    ('float32', torch.float32, None),
+    ('float32 channels_last', torch.float32, torch.channels_last),
+    ('bfloat16 channels_last', torch.bfloat16, torch.channels_last),
+    ('qint8 channels_last', torch.qint8, torch.channels_last),
+]
+
+
+def bench(model, x, repeat):
+    with torch.no_grad():
+        model(x)
+        start_time = timer()
+        for _ in range(repeat):
+            output = model(x)
+    return x.size(0) * repeat / (timer() - start_time), output
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    # the random weights make the dynamically quantized outputs meaningless for
+    # models whose activations vanish at initialization, e.g. mobilenet_v2
+    torch.manual_seed(0)
+    warnings.simplefilter('ignore')
+    for name in args.models:
+        kwargs = {'aux_logits': False} if name == 'inception_v3' else {}
+        model = models.__dict__[name](**kwargs).eval()
+        size = 299 if name == 'inception_v3' else 224
+        x = torch.rand(args.batch_size, 3, size, size)
+        baseline, expected = bench(model, x, args.repeat)
+        print("{}: float32 reference {:.1f} img/s".format(name, baseline))
+        for label, dtype, memory_format in SETTINGS:
+            prepared = prepare_for_inference(model, dtype, memory_format)
+            throughput, output = bench(prepared, x, args.repeat)
+            error = ((output - expected).abs().max() / expected.abs().max()).item()
+            agreement = (output.argmax(1) == expected.argmax(1)).float().mean().item()
+            print("  {label:>22}: {throughput:.1f} img/s ({speedup:.2f}x), max error {error:.2g}, "
+                  "top-1 agreement {agreement:.0%}".format(label=label, throughput=throughput,
+                                                           speedup=throughput / baseline, error=error,
+                                                           agreement=agreement))
@@ -0,0 +1,46 @@
+import argparse
+from timeit import default_timer as timer
+import torch
+import torch.nn as nn
+from torchvision import models
+
+
+parser = argparse.ArgumentParser(description='Model construction benchmark')
+parser.add_argument('--models', default=['googlenet', 'inception_v3', 'inception_v3_wide'], nargs='+',
+                    help='model names in torchvision.models')
+parser.add_argument('--repeat', default=3, type=int, help='constructions per setting (default: 3)')
+
+
+def scipy_initialize_weights(model, stddev=0.1):
+    # the per-layer scipy initialization truncated_normal_ replaced
+    import scipy.stats as stats
+    for m in model.modules():
+        if isinstance(m, nn.Conv2d) or isinstance(m, nn.Linear):
+            X = stats.truncnorm(-2, 2, scale=m.stddev if hasattr(m, 'stddev') else stddev)
+            values = torch.as_tensor(X.rvs(m.weight.numel()), dtype=m.weight.dtype)
+            values = values.view(m.weight.size())
+            with torch.no_grad():
+                m.weight.copy_(values)
+        elif isinstance(m, nn.BatchNorm2d):
+            nn.init.constant_(m.weight, 1)
+            nn.init.constant_(m.bias, 0)
+    return model
+
+
+def bench(fn, repeat):
+    start_time = timer()
+    for _ in range(repeat):
+        fn()
+    return (timer() - start_time) / repeat
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    for name in args.models:
+        build = models.__dict__[name]
+        stddev = 0.01 if name == 'googlenet' else 0.1
+        scipy_time = bench(lambda: scipy_initialize_weights(build(init_weights=False), stddev), 1)
+        torch_time = bench(build, args.repeat)
+        skip_time = bench(lambda: build(init_weights=False), args.repeat)
+        print("{name:>18}: scipy {scipy:.2f} s, torch {torch:.2f} s, init_weights=False {skip:.2f} s"
+              .format(name=name, scipy=scipy_time, torch=torch_time, skip=skip_time))
@@ -18,6 +18,30 @@ parser.add_argument('--batchSize', '-b', default=256, type=int, metavar='N',
                     help='mini-batch size (1 = pure stochastic) Default: 256')
 parser.add_argument('--accimage', action='store_true',
                     help='use accimage')
+parser.add_argument('--draft', action='store_true',
+                    help='also time JPEG draft-mode decoding at the size the transform needs')
+parser.add_argument('--resize', default=None, type=int, metavar='N',
+                    help='resize to N x N with Resize2 instead of a random 224 crop')
+
+
+def bench(dataset, args):
+    train_loader = torch.utils.data.DataLoader(
+        dataset, batch_size=args.batchSize, shuffle=True, num_workers=args.nThreads)
+    train_iter = iter(train_loader)
+
+    start_time = timer()
+    batch_count = 20 * args.nThreads
+    with tqdm(total=batch_count) as pbar:
+        for _ in range(batch_count):
+            pbar.update(1)
+            next(train_iter)
+    end_time = timer()
+    print("Performance: {dataset:.0f} minutes/dataset, {batch:.1f} ms/batch,"
+          " {image:.2f} ms/image {rate:.0f} images/sec"
+          .format(dataset=(end_time - start_time) * (float(len(train_loader)) / batch_count / 60.0),
+                  batch=(end_time - start_time) / float(batch_count) * 1.0e+3,
+                  image=(end_time - start_time) / (batch_count * args.batchSize) * 1.0e+3,
+                  rate=(batch_count * args.batchSize) / (end_time - start_time)))
 
 
 if __name__ == "__main__":
@@ -29,7 +53,7 @@ if __name__ == "__main__":
 
     # Data loading code
     transform = transforms.Compose([
-        transforms.RandomSizedCrop(224),
+        transforms.Resize2(args.resize) if args.resize else transforms.RandomSizedCrop(224),
         transforms.RandomHorizontalFlip(),
         transforms.ToTensor(),
         transforms.Normalize(mean=[0.485, 0.456, 0.406],
@@ -37,23 +61,11 @@ if __name__ == "__main__":
     ])
 
     traindir = os.path.join(args.data, 'train')
-    valdir = os.path.join(args.data, 'val')
     train = datasets.ImageFolder(traindir, transform)
-    val = datasets.ImageFolder(valdir, transform)
-    train_loader = torch.utils.data.DataLoader(
-        train, batch_size=args.batchSize, shuffle=True, num_workers=args.nThreads)
-    train_iter = iter(train_loader)
+    print('default_loader')
+    bench(train, args)
 
-    start_time = timer()
-    batch_count = 20 * args.nThreads
-    with tqdm(total=batch_count) as pbar:
-        for _ in tqdm(range(batch_count)):
-            pbar.update(1)
-            batch = next(train_iter)
-    end_time = timer()
-    print("Performance: {dataset:.0f} minutes/dataset, {batch:.1f} ms/batch,"
-          " {image:.2f} ms/image {rate:.0f} images/sec"
-          .format(dataset=(end_time - start_time) * (float(len(train_loader)) / batch_count / 60.0),
-                  batch=(end_time - start_time) / float(batch_count) * 1.0e+3,
-                  image=(end_time - start_time) / (batch_count * args.batchSize) * 1.0e+3,
-                  rate=(batch_count * args.batchSize) / (end_time - start_time)))
+    if args.draft:
+        train = datasets.ImageFolder(traindir, transform, draft=True)
+        print('draft loader, decoding at >= {}'.format(datasets.folder.get_draft_size(transform)))
+        bench(train, args)
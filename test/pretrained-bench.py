@@ -0,0 +1,87 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from timeit import default_timer as timer
+import torch
+from torchvision import models
+from torchvision.models.utils import load_pretrained
+
+
+parser = argparse.ArgumentParser(description='Pretrained weight loading memory report')
+parser.add_argument('--arch', default='resnet152', help='resnet model name (default: resnet152)')
+parser.add_argument('--mode', default=None, choices=['state_dict', 'streaming'],
+                    help='run a single mode in this process (used internally)')
+parser.add_argument('--checkpoint', default=None, help='checkpoint to load (used internally)')
+
+
+def memory(field):
+    # current value of a /proc/self/status field, in MB
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024.0
+
+
+class PeakSampler(threading.Thread):
+    # samples the anonymous (not file-backed) resident memory every millisecond
+    def __init__(self):
+        super(PeakSampler, self).__init__()
+        self.daemon = True
+        self.peak = memory('RssAnon')
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(0.001):
+            self.peak = max(self.peak, memory('RssAnon'))
+
+
+def state_dict_load(model, path):
+    # the loading code load_pretrained replaced in _resnet
+    state_dict = torch.load(path, map_location='cpu')
+    model_dict = model.state_dict()
+    pretrained_dict = {k: v for k, v in state_dict.items() if 'conv1' not in k}
+    model_dict.update(pretrained_dict)
+    model.load_state_dict(model_dict)
+
+
+def run(args):
+    model = models.__dict__[args.arch]()
+    before = memory('RssAnon')
+    sampler = PeakSampler()
+    sampler.start()
+    start_time = timer()
+    if args.mode == 'state_dict':
+        state_dict_load(model, args.checkpoint)
+    else:
+        load_pretrained(model, args.checkpoint, skip=lambda key: 'conv1' in key, strict=False)
+    load_time = timer() - start_time
+    sampler.done.set()
+    sampler.join()
+    print("{mode:>10}: {time:.2f} s, peak anonymous memory +{anon:.0f} MB over the model, peak RSS {rss:.0f} MB"
+          .format(mode=args.mode, time=load_time, anon=sampler.peak - before, rss=memory('VmHWM')))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run(args)
+    else:
+        temp_dir = tempfile.mkdtemp()
+        checkpoint = os.path.join(temp_dir, args.arch + '.pth')
+        state_dict = models.__dict__[args.arch]().state_dict()
+        torch.save(state_dict, checkpoint)
+        print("{}: {:.0f} MB checkpoint".format(
+            args.arch, sum(v.numel() * v.element_size() for v in state_dict.values()) / 1024.0 ** 2))
+        del state_dict
+        try:
+            # each mode runs in a fresh interpreter so memory is not shared between them
+            for mode in ('state_dict', 'streaming'):
+                subprocess.check_call([sys.executable, __file__, '--arch', args.arch, '--mode', mode,
+                                       '--checkpoint', checkpoint])
+        finally:
+            os.remove(checkpoint)
+            os.rmdir(temp_dir)
@@ -0,0 +1,55 @@
+from __future__ import division
+import argparse
+from timeit import default_timer as timer
+import torch
+import torch.nn.functional as F
+from torchvision.models.inception import BasicConv2d
+from torchvision.models.utils import multiscale_conv2d
+
+
+parser = argparse.ArgumentParser(description='wider / bigger_wider Inception3 stem benchmark')
+parser.add_argument('--sizes', default=[299, 600, 1000], type=int, nargs='+',
+                    help='square input sizes to time (default: 299 600 1000)')
+parser.add_argument('--stems', default=['wider', 'bigger_wider'], nargs='+',
+                    choices=['wider', 'bigger_wider'])
+parser.add_argument('--repeat', default=3, type=int,
+                    help='calls per configuration of the single-pass stem (default: 3)')
+
+# kernel sizes and stride of Conv2d_1a_3x3a/b/c
+STEMS = {'wider': ((15, 31, 61), 5), 'bigger_wider': ((21, 41, 81), 10)}
+
+
+def separate_stem(stem, x):
+    # what Inception3.forward used to do
+    return stem[0](x) + stem[1](x) + stem[2](x)
+
+
+def single_pass_stem(stem, x):
+    x1, x2, x3 = [F.relu(m.bn(out), inplace=True)
+                  for m, out in zip(stem, multiscale_conv2d(x, [m.conv for m in stem]))]
+    return x1 + x2 + x3
+
+
+def bench(fn, stem, x, repeat):
+    start_time = timer()
+    for _ in range(repeat):
+        out = fn(stem, x)
+    return (timer() - start_time) / repeat * 1.0e+3, out
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    torch.set_grad_enabled(False)
+    for name in args.stems:
+        kernel_sizes, stride = STEMS[name]
+        stem = [BasicConv2d(3, 32, kernel_size=k, stride=stride, padding=k // 2).eval() for k in kernel_sizes]
+        for size in args.sizes:
+            x = torch.rand(1, 3, size, size) * 2 - 1
+            # the large-kernel convolutions are slow enough to time once
+            separate_ms, expected = bench(separate_stem, stem, x, 1)
+            single_pass_stem(stem, x)
+            fast_ms, output = bench(single_pass_stem, stem, x, args.repeat)
+            print("{name} {size}px: separate {separate:.0f} ms, single pass {fast:.0f} ms, {speedup:.1f}x, "
+                  "max diff {diff:.1e}".format(name=name, size=size, separate=separate_ms, fast=fast_ms,
+                                               speedup=separate_ms / fast_ms,
+                                               diff=(output - expected).abs().max().item()))
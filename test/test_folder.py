@@ -1,8 +1,26 @@
 import unittest
 
+import json
 import os
+import pickle
+import shutil
+import tempfile
 
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+import torchvision
+import torchvision.transforms as transforms
 from torchvision.datasets import ImageFolder
+from torchvision.datasets.folder import (IMG_EXTENSIONS, composite_heatmap, cv2_loader, default_loader,
+                                         get_draft_size, make_dataset, pil_loader)
+from torchvision.datasets.shards import ImageShards, build_image_shards
+from torchvision.datasets.heatmap import LESION_CATEGORIES, build_heatmap_index, build_heatmap_store
 from torch._utils_internal import get_file_path_2
 
 
@@ -13,6 +31,12 @@ def mock_transform(return_value, arg_list):
     return mock
 
 
+class FakeHeatmapFolder(ImageFolder):
+    def get_heatmap(self, image_path, input_size):
+        seed = sum(bytearray(os.path.basename(image_path).encode()))
+        return torch.rand(4, input_size, input_size, generator=torch.Generator().manual_seed(seed)).double()
+
+
 class Tester(unittest.TestCase):
     root = get_file_path_2('test/assets/dataset/')
     classes = ['a', 'b']
@@ -79,6 +103,238 @@ class Tester(unittest.TestCase):
                          [class_b_idx] * len(Tester.class_b_images))
         self.assertEqual(targets, sorted(args))
 
+    def test_heatmap_store(self):
+        dataset = FakeHeatmapFolder(Tester.root, loader=lambda x: x, input_size=8)
+        for dtype, atol in [('float16', 1e-3), ('uint8', 1. / 255)]:
+            store_dir = tempfile.mkdtemp()
+            try:
+                build_heatmap_store(dataset, store_dir, dtype=dtype)
+                stored = ImageFolder(Tester.root, loader=lambda x: x, input_size=8, heatmap_store=store_dir)
+                self.assertEqual(len(stored.heatmap_store), len(dataset))
+                for i, (path, _) in enumerate(dataset.samples):
+                    expected = dataset.get_heatmap(path, 8).float()
+                    heatmap = stored.heatmap_store[i].float()
+                    self.assertEqual(heatmap.shape, (4, 8, 8))
+                    self.assertTrue(torch.allclose(heatmap, expected, atol=atol))
+
+                with self.assertRaises(ValueError):
+                    ImageFolder(Tester.root, loader=lambda x: x, input_size=16, heatmap_store=store_dir)
+            finally:
+                shutil.rmtree(store_dir)
+
+        class NegativeHeatmapFolder(FakeHeatmapFolder):
+            def get_heatmap(self, image_path, input_size):
+                return super(NegativeHeatmapFolder, self).get_heatmap(image_path, input_size) - 0.5
+
+        dataset = NegativeHeatmapFolder(Tester.root, loader=lambda x: x, input_size=8)
+        store_dir = tempfile.mkdtemp()
+        try:
+            self.assertRaises(ValueError, build_heatmap_store, dataset, store_dir, dtype='uint8')
+        finally:
+            shutil.rmtree(store_dir)
+
+    def test_heatmap_index(self):
+        heatmap_root = tempfile.mkdtemp()
+        try:
+            for stage in range(5):
+                for category_id, lesion in enumerate(LESION_CATEGORIES, 1):
+                    os.makedirs(os.path.join(heatmap_root, str(stage), lesion))
+                    records = {'img{}.png'.format(i): {'image_shape': [stage, category_id, i],
+                                                       'bboxes': [[i, i, 1, 1]]} for i in range(3)}
+                    with open(os.path.join(heatmap_root, str(stage), lesion, 'positive_heatmap.json'), 'w') as f:
+                        json.dump(records, f)
+
+            index = build_heatmap_index(heatmap_root)
+            self.assertEqual(index.get(3, 2, 'img1.png'), {'image_shape': [3, 2, 1], 'bboxes': [[1, 1, 1, 1]]})
+            with self.assertRaises(KeyError):
+                index.get(0, 1, 'missing.png')
+
+            index = pickle.loads(pickle.dumps(index))
+            self.assertEqual(index.get(4, 4, 'img2.png')['image_shape'], [4, 4, 2])
+        finally:
+            shutil.rmtree(heatmap_root)
+
+    def test_composite_heatmap(self):
+        sample = torch.rand(3, 5, 6)
+        heatmap = torch.rand(4, 5, 6).double()
+        expected_heatmap = heatmap.type(sample.dtype)
+
+        expected = torch.cat((sample, expected_heatmap), 0)
+        self.assertTrue(torch.equal(composite_heatmap(sample, heatmap, masked=False), expected))
+
+        expected = torch.cat([sample] + [sample * expected_heatmap[i] for i in range(4)], 0)
+        self.assertTrue(torch.equal(composite_heatmap(sample, heatmap), expected))
+
+        half = composite_heatmap(sample, heatmap, dtype=torch.float16)
+        self.assertEqual(half.dtype, torch.float16)
+        self.assertTrue(torch.allclose(half.float(), expected, atol=1e-2))
+
+    def test_heatmap_cache_flips(self):
+        data_root = tempfile.mkdtemp()
+        try:
+            train = os.path.join(data_root, 'train')
+            os.makedirs(os.path.join(train, '0'))
+            for suffix in ['', '_vflip', '_hflip', '_vhflip']:
+                Image.new('RGB', (4, 4)).save(os.path.join(train, '0', 'img{}.png'.format(suffix)))
+            rng = np.random.RandomState(0)
+            for stage in range(5):
+                for lesion in LESION_CATEGORIES:
+                    lesion_dir = os.path.join(data_root, 'train_heatmap', str(stage), lesion)
+                    os.makedirs(os.path.join(lesion_dir, 'positive_heatmap_v2'))
+                    records = {'img.png': {'image_shape': [12, 10], 'bboxes': [[1, 2, 5, 4]]}}
+                    with open(os.path.join(lesion_dir, 'positive_heatmap.json'), 'w') as f:
+                        json.dump(records, f)
+                    np.save(os.path.join(lesion_dir, 'positive_heatmap_v2', 'img.png_0.npy'), rng.rand(4, 5))
+
+            dataset = ImageFolder(train, loader=lambda x: x, input_size=6, with_heatmap=True)
+            cached = ImageFolder(train, loader=lambda x: x, input_size=6, with_heatmap=True,
+                                 heatmap_cache_size=8)
+            original = dataset.get_heatmap(dataset.samples[0][0], 6).numpy()
+            flips = {'img.png': lambda a: a, 'img_vflip.png': lambda a: cv2.flip(a, 1),
+                     'img_hflip.png': lambda a: cv2.flip(a, 0), 'img_vhflip.png': lambda a: cv2.flip(a, -1)}
+            for path, _ in dataset.samples:
+                expected = np.stack([flips[os.path.basename(path)](c) for c in original])
+                self.assertTrue(np.array_equal(dataset.get_heatmap(path, 6).numpy(), expected))
+                self.assertTrue(np.array_equal(cached.get_heatmap(path, 6).numpy(), expected))
+            self.assertEqual(cached.heatmap_cache.misses, 4)
+            self.assertEqual(cached.heatmap_cache.hits, 12)
+        finally:
+            shutil.rmtree(data_root)
+
+    def test_make_dataset_manifest(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            root = os.path.join(tmp_dir, 'dataset')
+            shutil.copytree(Tester.root, root)
+            manifest = os.path.join(tmp_dir, 'manifest.pkl')
+            class_to_idx = {'a': 0, 'b': 1}
+            expected = make_dataset(root, class_to_idx, IMG_EXTENSIONS)
+
+            self.assertEqual(make_dataset(root, class_to_idx, IMG_EXTENSIONS, manifest=manifest, num_workers=2),
+                             expected)
+            self.assertTrue(os.path.isfile(manifest))
+
+            with mock.patch('torchvision.datasets.folder.os.walk', wraps=os.walk) as walk:
+                self.assertEqual(make_dataset(root, class_to_idx, IMG_EXTENSIONS, manifest=manifest), expected)
+                self.assertEqual(walk.call_count, 0)
+
+            shutil.copy(os.path.join(root, 'b', 'b1.png'), os.path.join(root, 'b', 'b5.png'))
+            with mock.patch('torchvision.datasets.folder.os.walk', wraps=os.walk) as walk:
+                images = make_dataset(root, class_to_idx, IMG_EXTENSIONS, manifest=manifest)
+                self.assertEqual(walk.call_count, 1)
+            self.assertEqual(images, make_dataset(root, class_to_idx, IMG_EXTENSIONS))
+            self.assertIn((os.path.join(root, 'b', 'b5.png'), 1), images)
+            with open(manifest, 'rb') as f:
+                entry = pickle.load(f)['classes']['b']
+            b5 = os.stat(os.path.join(root, 'b', 'b5.png'))
+            self.assertIn(('b5.png', b5.st_mtime, b5.st_size), entry['files'])
+
+            # b was modified in the tick of its scan: a file added right after
+            # that may leave its mtime as it was on a coarse filesystem
+            mtime = entry['dirs']['.']
+            shutil.copy(os.path.join(root, 'b', 'b1.png'), os.path.join(root, 'b', 'b6.png'))
+            os.utime(os.path.join(root, 'b'), (mtime, mtime))
+            images = make_dataset(root, class_to_idx, IMG_EXTENSIONS, manifest=manifest)
+            self.assertIn((os.path.join(root, 'b', 'b6.png'), 1), images)
+
+            dataset = ImageFolder(root, loader=lambda x: x, manifest=manifest)
+            self.assertEqual(dataset.samples, images)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_compact_samples(self):
+        dataset = ImageFolder(Tester.root, loader=lambda x: x)
+        compact = ImageFolder(Tester.root, loader=lambda x: x, compact_samples=True)
+        self.assertEqual(compact.samples, dataset.samples)
+        self.assertEqual(compact.imgs, dataset.imgs)
+        self.assertEqual(compact.targets.tolist(), dataset.targets)
+        self.assertEqual(compact.samples[-1], dataset.samples[-1])
+        self.assertEqual(compact.samples[1:4], dataset.samples[1:4])
+        self.assertEqual([compact[i] for i in range(len(compact))], [dataset[i] for i in range(len(dataset))])
+        with self.assertRaises(IndexError):
+            compact.samples[len(dataset)]
+        with self.assertRaises(ValueError):
+            compact.targets[0] = 1
+
+        compact.set_imgs(dataset.samples[:2])
+        self.assertEqual(len(compact), 2)
+        self.assertEqual(compact.samples, dataset.samples[:2])
+
+    def test_draft_loader(self):
+        self.assertEqual(get_draft_size(transforms.Compose([
+            transforms.RandomHorizontalFlip(), transforms.Resize2(299), transforms.ToTensor()])), (299, 299))
+        self.assertEqual(get_draft_size(transforms.Resize((100, 200))), (200, 100))
+        self.assertEqual(get_draft_size(transforms.RandomResizedCrop(100, scale=(0.25, 1), ratio=(1, 1))),
+                         (200, 200))
+        self.assertIsNone(get_draft_size(transforms.Compose([transforms.CenterCrop(10), transforms.Resize(5)])))
+        self.assertIsNone(get_draft_size(None))
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(tmp_dir, 'a'))
+            path = os.path.join(tmp_dir, 'a', 'a1.jpg')
+            Image.new('RGB', (800, 600), (255, 0, 0)).save(path)
+            self.assertEqual(pil_loader(path).size, (800, 600))
+            self.assertEqual(pil_loader(path, draft_size=(150, 150)).size, (200, 150))
+            self.assertEqual(pil_loader(path, draft_size=(151, 151)).size, (400, 300))
+
+            dataset = ImageFolder(tmp_dir, transform=transforms.Resize2(150), draft=True)
+            self.assertEqual(dataset.loader(path).size, (200, 150))
+            self.assertEqual(dataset[0][0].size, (150, 150))
+            dataset = ImageFolder(tmp_dir, transform=transforms.CenterCrop(150), draft=True)
+            self.assertEqual(dataset.loader(path).size, (800, 600))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_image_backend(self):
+        path = Tester.class_a_images[0]
+        self.assertTrue(np.array_equal(cv2_loader(path), np.array(pil_loader(path))))
+        with self.assertRaises(IOError):
+            cv2_loader(path + '.missing')
+        with self.assertRaises(ValueError):
+            torchvision.set_image_backend('missing')
+
+        torchvision.register_image_backend('fake', lambda x: 'fake')
+        torchvision.set_image_backend('cv2')
+        try:
+            self.assertIsInstance(default_loader(path), np.ndarray)
+            dataset = ImageFolder(Tester.root, transform=transforms.Compose([
+                transforms.RandomResizedCrop(8), transforms.RandomHorizontalFlip(), transforms.ToTensor()]))
+            self.assertEqual(dataset[0][0].size(), (3, 8, 8))
+            torchvision.set_image_backend('fake')
+            self.assertEqual(default_loader(path), 'fake')
+        finally:
+            torchvision.set_image_backend('PIL')
+
+    def test_image_shards(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            dataset = ImageFolder(Tester.root)
+            resize = transforms.Resize2((6, 4))
+            shards = build_image_shards(dataset, tmp_dir, transform=resize, shard_size=3)
+            self.assertEqual(len(shards), len(dataset))
+            self.assertEqual(len([f for f in os.listdir(tmp_dir) if f.startswith('shard-')]), 3)
+            self.assertEqual(shards.classes, dataset.classes)
+            self.assertEqual(shards.targets.tolist(), dataset.targets)
+
+            shards = pickle.loads(pickle.dumps(ImageShards(tmp_dir, transform=transforms.ToTensor())))
+            for i in range(len(dataset)):
+                sample, target = shards[i]
+                expected = transforms.ToTensor()(resize(dataset[i][0]))
+                self.assertTrue(torch.equal(sample, expected))
+                self.assertEqual(target, dataset.targets[i])
+            self.assertTrue(torch.equal(shards[-1][0], shards[len(dataset) - 1][0]))
+            with self.assertRaises(IndexError):
+                shards[len(dataset)]
+
+            pil_shards = ImageShards(tmp_dir, to_pil=True)
+            self.assertEqual(pil_shards[0][0].size, (4, 6))
+            sizes = iter([(2, 2), (3, 3)])
+            with self.assertRaises(ValueError):
+                build_image_shards(dataset, tmp_dir, transform=lambda x: np.zeros(next(sizes), dtype=np.uint8))
+        finally:
+            shutil.rmtree(tmp_dir)
+
 
 if __name__ == '__main__':
     unittest.main()
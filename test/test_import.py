@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+def imported_modules(statement):
+    # names of the modules loaded by `statement` in a fresh interpreter, from
+    # the `python -X importtime` report
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root, env.get('PYTHONPATH', '')])
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    _, err = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(err.decode())
+    modules = set()
+    for line in err.decode().splitlines():
+        if line.startswith('import time:') and '|' in line:
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'lazy submodules and -X importtime need Python 3.7')
+class Tester(unittest.TestCase):
+
+    def assertNotImported(self, modules, names):
+        for name in names:
+            loaded = sorted(m for m in modules if m == name or m.startswith(name + '.'))
+            self.assertEqual(loaded, [], '{} imported {}'.format(name, loaded))
+
+    def test_import_torchvision(self):
+        modules = imported_modules('import torchvision')
+        self.assertIn('torchvision.transforms', modules)
+        self.assertNotImported(modules, ['torchvision.models', 'torchvision.datasets',
+                                         'cv2', 'scipy', 'lmdb', 'pycocotools'])
+
+    def test_import_datasets(self):
+        modules = imported_modules('import torchvision.datasets')
+        self.assertIn('torchvision.datasets.folder', modules)
+        self.assertNotImported(modules, ['torchvision.models', 'cv2', 'scipy', 'lmdb', 'pycocotools'])
+
+    def test_import_models(self):
+        modules = imported_modules('import torchvision.models')
+        self.assertNotImported(modules, ['torchvision.datasets', 'cv2', 'scipy'])
+
+    def test_lazy_submodules(self):
+        import torchvision
+        self.assertTrue(callable(torchvision.models.resnet18))
+        self.assertTrue(callable(torchvision.datasets.ImageFolder))
+        self.assertIn('models', dir(torchvision))
+        with self.assertRaises(AttributeError):
+            torchvision.not_a_submodule
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,36 @@
 from collections import OrderedDict
 from itertools import product
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
 import torch
 from torchvision import models
+from torchvision.models.resnet import BasicBlock
+from torchvision.models.densenet import _load_state_dict as load_densenet_state_dict
+from torchvision.models.store import WeightStore, _mmap_copy, _sha256, build_weight_store, set_weight_store
+from torchvision.models.utils import (_space_to_depth, fuse_conv_bn, load_pretrained, multiscale_conv2d,
+                                      prepare_for_inference, truncated_normal_)
+from torchvision.models.tiling import TiledForward, receptive_field, tiled_forward
 import unittest
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 
 def get_available_models():
     # TODO add a registration mechanism to torchvision.models
     return [k for k, v in models.__dict__.items() if callable(v) and k[0].lower() == k[0]]
 
 
+def _add_to_store(args):
+    root, checkpoint = args
+    return WeightStore(root).add(checkpoint, progress=False)
+
+
 class Tester(unittest.TestCase):
     def _test_model(self, name, input_shape):
         # passing num_class equal to a number other than 1000 helps in making the test
@@ -40,6 +61,398 @@ class Tester(unittest.TestCase):
             f = 2 ** sum(i)
             self.assertEqual(out.shape, (1, 2048, 7 * f, 7 * f))
 
+    def test_inception_input_rescale(self):
+        def per_channel_rescale(x, channels):
+            # the concatenation forward used to build the stem input with
+            return torch.cat([torch.unsqueeze(x[:, i], 1) / 0.5 - 1 for i in range(channels)], 1)
+
+        for kwargs, channels in [({}, 3), ({'with_heatmap': True}, 7), ({'with_heatmap_v2': True}, 15)]:
+            model = models.Inception3(num_classes=50, aux_logits=False, **kwargs)
+            model.eval()
+            x = torch.rand(2, channels + 1, 107, 107)
+            with torch.no_grad():
+                output = model(x)
+                # skip the rescale in forward and feed the old stem input instead
+                model.input_folded = True
+                expected = model(per_channel_rescale(x, channels))
+            self.assertTrue(torch.equal(output, expected))
+
+    def test_inception_fold_input_transform(self):
+        for kwargs, channels in [({}, 3), ({'with_heatmap': True}, 7)]:
+            model = models.Inception3(num_classes=50, aux_logits=False, **kwargs)
+            model.eval()
+            x = torch.rand(2, channels, 107, 107)
+            with torch.no_grad():
+                expected = model(x)
+                model.fold_input_transform()
+                self.assertTrue(torch.allclose(model(x), expected, rtol=1e-4, atol=1e-4 * expected.abs().max()))
+                self.assertRaises(RuntimeError, model.fold_input_transform)
+
+        model = models.Inception3(num_classes=50, aux_logits=False)
+        model.eval()
+        x = torch.randint(0, 256, (1, 3, 107, 107), dtype=torch.uint8)
+        with torch.no_grad():
+            expected = model(x.float() / 255)
+            model.fold_input_transform(max_value=255)
+            self.assertTrue(torch.allclose(model(x.float()), expected, rtol=1e-4, atol=1e-4 * expected.abs().max()))
+
+        for kwargs in [{'wide': True}, {'wider': True}, {'wider2': True}]:
+            model = models.Inception3(num_classes=50, aux_logits=False, **kwargs)
+            self.assertRaises(ValueError, model.fold_input_transform)
+            self.assertFalse(model.input_folded)
+
+    def test_fuse_conv_bn(self):
+        architectures = [
+            (lambda: models.Inception3(num_classes=50, aux_logits=False), 107),
+            (lambda: models.Inception3(num_classes=50, aux_logits=False, wider2=True), 299),
+            (lambda: models.InceptionV4(num_classes=50, aux_logits=False), 299),
+            (lambda: models.GoogLeNet(num_classes=50, aux_logits=False), 64),
+            (lambda: models.ResNet(BasicBlock, [1, 1, 1, 1], num_classes=50), 64),
+            (lambda: models.ResNet(BasicBlock, [1, 1, 1, 1], num_classes=50, wider=True), 160),
+            (lambda: models.DenseNet(16, (2, 2), 32, num_classes=50), 64),
+        ]
+        torch.manual_seed(0)
+        for make_model, size in architectures:
+            model = make_model()
+            # non-trivial statistics so the folded scale and shift are checked
+            for m in model.modules():
+                if isinstance(m, torch.nn.BatchNorm2d):
+                    m.running_mean.uniform_(-0.1, 0.1)
+                    m.running_var.uniform_(0.5, 2)
+                    m.weight.data.uniform_(0.5, 1.5)
+                    m.bias.data.uniform_(-0.1, 0.1)
+            model.eval()
+            fused = fuse_conv_bn(model)
+            self.assertFalse(fused.training)
+            # only the pre-activation batch norms of DenseNet are kept
+            num_bn = len([m for m in fused.modules() if isinstance(m, torch.nn.BatchNorm2d)])
+            self.assertTrue(num_bn == 0 or isinstance(model, models.DenseNet))
+            self.assertTrue(any(isinstance(m, torch.nn.BatchNorm2d) for m in model.modules()))
+            self.assertLess(sum(p.numel() for p in fused.parameters()),
+                            sum(p.numel() for p in model.parameters()))
+            x = torch.rand(2, 3, size, size)
+            with torch.no_grad():
+                expected = model(x)
+                output = fused(x)
+            scale = expected.abs().max()
+            self.assertTrue(torch.allclose(output, expected, rtol=1e-4, atol=1e-4 * scale),
+                            (make_model().__class__.__name__, (output - expected).abs().max(), scale))
+
+        model = models.ResNet(BasicBlock, [1, 1, 1, 1])
+        self.assertIs(fuse_conv_bn(model, inplace=True), model)
+        self.assertIsInstance(model.bn1, torch.nn.Identity)
+
+        class NormFirst(torch.nn.Module):
+            def __init__(self):
+                super(NormFirst, self).__init__()
+                self.conv = torch.nn.Conv2d(4, 4, 3, padding=1)
+                self.bn = torch.nn.BatchNorm2d(4)
+
+            def forward(self, x):
+                return self.conv(self.bn(x))
+
+        model = NormFirst()
+        model.bn.running_mean.uniform_(-1, 1)
+        x = torch.rand(2, 4, 8, 8)
+        fuse_conv_bn(model)
+        self.assertRaises(RuntimeError, fuse_conv_bn, model, example=x)
+        model = models.ResNet(BasicBlock, [1, 1, 1, 1], num_classes=50)
+        fuse_conv_bn(model, example=torch.rand(2, 3, 64, 64))
+
+    def test_truncated_normal(self):
+        torch.manual_seed(0)
+        x = truncated_normal_(torch.empty(200000), std=0.1)
+        self.assertLessEqual(x.abs().max().item(), 0.2)
+        # standard deviation of the normal distribution truncated to two sigmas
+        self.assertAlmostEqual(x.std().item(), 0.1 * 0.8796, delta=1e-3)
+        self.assertAlmostEqual(x.mean().item(), 0., delta=1e-3)
+
+    def test_inception_initialize_weights_skip(self):
+        model = models.Inception3(aux_logits=False, init_weights=False)
+        fc_weight = model.fc.weight.clone()
+        stem_weight = model.Conv2d_1a_3x3.conv.weight.clone()
+        model._initialize_weights(skip={'fc.weight': None})
+        self.assertTrue(torch.equal(model.fc.weight, fc_weight))
+        self.assertFalse(torch.equal(model.Conv2d_1a_3x3.conv.weight, stem_weight))
+        self.assertLessEqual(model.Conv2d_1a_3x3.conv.weight.abs().max().item(), 0.2)
+
+    def test_load_pretrained(self):
+        temp_dir = tempfile.mkdtemp()
+        hub_dir = torch.hub.get_dir()
+        try:
+            source = models.resnet18(num_classes=10)
+            legacy = os.path.join(temp_dir, 'legacy.pth')
+            torch.save(source.state_dict(), legacy, _use_new_zipfile_serialization=False)
+            torch.hub.set_dir(os.path.join(temp_dir, 'hub'))
+            # downloads into the hub cache, converting it to the zip format
+            url = 'file://' + legacy
+            for location in [url, url]:
+                model = models.resnet18(num_classes=10)
+                result = load_pretrained(model, location, progress=False,
+                                         skip=lambda key: key.startswith('conv1'), strict=False)
+                self.assertEqual(result.skipped_keys, ['conv1.weight'])
+                self.assertEqual(result.missing_keys, ['conv1.weight'])
+                self.assertFalse(torch.equal(model.conv1.weight, source.conv1.weight))
+                for key, value in source.state_dict().items():
+                    if key != 'conv1.weight':
+                        self.assertTrue(torch.equal(model.state_dict()[key], value), key)
+            # the hub file is left as downloaded, next to a zip-format copy
+            # named after its own digest
+            cached = os.path.join(temp_dir, 'hub', 'checkpoints', 'legacy.pth')
+            self.assertFalse(zipfile.is_zipfile(cached))
+            names = sorted(os.listdir(os.path.dirname(cached)))
+            self.assertEqual(names[0], 'legacy-{}.pth'.format(_sha256(_mmap_copy(cached))[:8]))
+            self.assertEqual(names[1:], ['legacy.pth', 'legacy.pth.lock'])
+
+            with self.assertRaises(RuntimeError):
+                load_pretrained(models.resnet18(num_classes=10), cached, skip=lambda key: 'conv1' in key)
+            with self.assertRaises(RuntimeError):
+                load_pretrained(models.resnet18(num_classes=10), cached, rename=lambda key: 'extra.' + key,
+                                strict=False)
+
+            # previous DenseNet checkpoints name the layers 'norm.1', 'conv.1', ...
+            source = models.DenseNet(16, (2, 2), 32, num_classes=10)
+            renamed = OrderedDict((k.replace('norm1', 'norm.1').replace('conv2', 'conv.2'), v)
+                                  for k, v in source.state_dict().items() if 'num_batches_tracked' not in k)
+            path = os.path.join(temp_dir, 'densenet.pth')
+            torch.save(renamed, path)
+            model = models.DenseNet(16, (2, 2), 32, num_classes=10)
+            load_densenet_state_dict(model, path, False)
+            for key, value in source.state_dict().items():
+                self.assertTrue(torch.equal(model.state_dict()[key], value), key)
+        finally:
+            torch.hub.set_dir(hub_dir)
+            shutil.rmtree(temp_dir)
+
+    def test_mmap_copy_concurrent(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            state_dict = models.resnet18(num_classes=10).state_dict()
+            legacy = os.path.join(temp_dir, 'legacy.pth')
+            torch.save(state_dict, legacy, _use_new_zipfile_serialization=False)
+            # two processes converting the same legacy file at the same time
+            pool = multiprocessing.Pool(2)
+            paths = pool.map(_mmap_copy, [legacy] * 2)
+            pool.close()
+            pool.join()
+            self.assertEqual(paths[0], paths[1])
+            self.assertEqual(paths[0], os.path.join(temp_dir, 'legacy-{}.pth'.format(_sha256(paths[0])[:8])))
+            self.assertFalse(zipfile.is_zipfile(legacy))
+            self.assertTrue(zipfile.is_zipfile(paths[0]))
+            loaded = torch.load(paths[0])
+            for key, value in state_dict.items():
+                self.assertTrue(torch.equal(loaded[key], value), key)
+            self.assertEqual(sorted(name for name in os.listdir(temp_dir) if not name.endswith('.lock')),
+                             [os.path.basename(paths[0]), 'legacy.pth'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_weight_store(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            source = models.resnet18()
+            # a local copy named as in the model URL, saved in the legacy format
+            name = os.path.basename(models.resnet.model_urls['resnet18'])
+            checkpoint = os.path.join(temp_dir, name)
+            torch.save(source.state_dict(), checkpoint, _use_new_zipfile_serialization=False)
+            root = os.path.join(temp_dir, 'store')
+
+            # several processes populating the store at once
+            pool = multiprocessing.Pool(4)
+            paths = pool.map(_add_to_store, [(root, checkpoint)] * 8)
+            pool.close()
+            pool.join()
+            store = WeightStore(root)
+            self.assertEqual(len(store), 1)
+            # converted to the zip format and named after the digest of the converted file
+            path = store.get(models.resnet.model_urls['resnet18'])
+            self.assertEqual(set(paths), {path})
+            self.assertEqual(os.path.basename(path), 'resnet18.5c106cde-{}.pth'.format(_sha256(path)[:8]))
+            self.assertIn(models.resnet.model_urls['resnet18'], store)
+            self.assertTrue(zipfile.is_zipfile(store.get(models.resnet.model_urls['resnet18'])))
+            self.assertIsNone(store.get(models.resnet.model_urls['resnet34']))
+            self.assertEqual(store.verify(), [])
+            self.assertEqual(len(build_weight_store(root, [checkpoint], progress=False)), 1)
+
+            set_weight_store(root)
+            try:
+                model = models.resnet18(pretrained=True)
+            finally:
+                set_weight_store(None)
+            self.assertTrue(torch.equal(model.fc.weight, source.fc.weight))
+
+            with open(store.get(name), 'ab') as f:
+                f.write(b'0')
+            with self.assertRaises(RuntimeError):
+                store.get(name)
+            self.assertEqual(store.verify(), [name])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_prepare_for_inference(self):
+        torch.manual_seed(0)
+        x = torch.rand(2, 3, 64, 64)
+        for model in [models.resnet18(num_classes=10), models.vgg11(num_classes=10),
+                      models.Inception3(num_classes=10, aux_logits=False, tile_size=48)]:
+            example = torch.rand(2, 3, 107, 107) if isinstance(model, models.Inception3) else x
+            model.eval()
+            with torch.no_grad():
+                expected = model(example)
+            for dtype in [torch.float32, torch.bfloat16, torch.qint8]:
+                prepared = prepare_for_inference(model, dtype, example=example)
+                with torch.no_grad():
+                    output = prepared(example)
+                self.assertEqual(output.dtype, torch.float32)
+                self.assertEqual(output.shape, expected.shape)
+            # the original model is left untouched
+            with torch.no_grad():
+                self.assertTrue(torch.equal(model(example), expected))
+        with self.assertRaises(RuntimeError):
+            prepare_for_inference(models.resnet18(num_classes=10), torch.bfloat16, example=x, tolerance=0)
+        with self.assertRaises(ValueError):
+            prepare_for_inference(models.resnet18(num_classes=10), torch.float16)
+
+    def test_multiscale_conv2d(self):
+        torch.manual_seed(0)
+        for kernel_sizes, stride in [((15, 31, 61), 5), ((21, 41, 81), 10), ((3, 5), 2)]:
+            convs = [torch.nn.Conv2d(3, 4, k, stride=stride, padding=k // 2, bias=(k == 3))
+                     for k in kernel_sizes]
+            for size in [(97, 131), (100, 100)]:
+                x = torch.rand(2, 3, *size, requires_grad=True)
+                expected = [conv(x) for conv in convs]
+                outputs = multiscale_conv2d(x, convs)
+                for output, out in zip(outputs, expected):
+                    self.assertEqual(output.shape, out.shape)
+                    self.assertTrue(torch.allclose(output, out, atol=1e-5))
+                summed = multiscale_conv2d(x, convs, summed=True)
+                self.assertTrue(torch.allclose(summed, sum(expected), atol=1e-5))
+
+                grad = torch.autograd.grad(sum(expected).sum(), [x] + [c.weight for c in convs])
+                output_grad = torch.autograd.grad(summed.sum(), [x] + [c.weight for c in convs])
+                for g, output_g in zip(grad, output_grad):
+                    self.assertTrue(torch.allclose(g, output_g, atol=1e-3))
+
+        convs = [torch.nn.Conv2d(3, 4, 3, stride=2, padding=1), torch.nn.Conv2d(3, 4, 5, stride=2, padding=0)]
+        self.assertRaises(ValueError, multiscale_conv2d, torch.rand(1, 3, 16, 16), convs)
+
+    def test_inception_multiscale_stem(self):
+        for kwargs, size in [({'wider': True}, 299), ({'bigger_wider': True}, 750)]:
+            model = models.Inception3(num_classes=50, aux_logits=False, **kwargs)
+            model.eval()
+            stem_outputs = []
+            model.Conv2d_2a_3x3.register_forward_hook(lambda m, input, output: stem_outputs.append(input[0]))
+            x = torch.rand(1, 3, size, size)
+            with torch.no_grad():
+                model(x)
+                x = x * 2 - 1
+                expected = model.Conv2d_1a_3x3a(x) + model.Conv2d_1a_3x3b(x) + model.Conv2d_1a_3x3c(x)
+            self.assertTrue(torch.allclose(stem_outputs[0], expected, atol=1e-4))
+
+            # the input is rearranged once for the three kernel sizes
+            x = torch.rand(2, 3, size, size)
+            with mock.patch('torchvision.models.utils._space_to_depth', wraps=_space_to_depth) as s2d, \
+                    torch.no_grad():
+                model._forward_stem(x)
+            self.assertEqual(sum(args[0].size(0) == 2 for args, _ in s2d.call_args_list), 1)
+
+    def test_receptive_field(self):
+        trunk = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3, stride=2, padding=1),
+                                    torch.nn.Conv2d(4, 4, (3, 5), padding=(1, 0)))
+        self.assertEqual(receptive_field(trunk), ((2, -3, 3), (2, -1, 9)))
+        pooled = torch.nn.Sequential(trunk, torch.nn.AdaptiveAvgPool2d(1))
+        self.assertRaises(ValueError, receptive_field, pooled, max_size=512)
+
+    def test_receptive_field_device(self):
+        trunk = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3, stride=2, padding=1),
+                                    torch.nn.Conv2d(4, 4, (3, 5), padding=(1, 0)))
+        devices = [torch.device('cpu')]
+        if torch.cuda.is_available():
+            devices.append(torch.device('cuda'))
+        for device in devices:
+            trunk.to(device)
+            probes = []
+
+            def fn(x):
+                probes.append(x.device)
+                return trunk(x)
+
+            self.assertEqual(receptive_field(fn, device=device), ((2, -3, 3), (2, -1, 9)))
+            self.assertEqual(set(probes), {device})
+            # the tiled models probe on the device of their input
+            model = models.resnet18(num_classes=10, tile_size=96).to(device).eval()
+            x = torch.rand(1, 3, 200, 160, device=device)
+            with torch.no_grad():
+                output = model(x)
+            self.assertEqual(output.device, device)
+
+    def test_tiled_forward(self):
+        trunk = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3, stride=2, padding=1), torch.nn.ReLU(),
+                                    torch.nn.MaxPool2d(3, stride=2), torch.nn.Conv2d(4, 4, 5, padding=1))
+        tiled = TiledForward(trunk, 32).eval()
+        x = torch.rand(2, 3, 101, 77)
+        with torch.no_grad():
+            for tile_size in [8, 37, 64, 1000]:
+                self.assertTrue(torch.equal(tiled_forward(trunk, x, tile_size), trunk(x)))
+            self.assertTrue(torch.equal(tiled(x), trunk(x)))
+
+        for model in [models.Inception3(num_classes=50, aux_logits=False, tile_size=64),
+                      models.resnet18(num_classes=50, tile_size=96)]:
+            model.eval()
+            x = torch.rand(1, 3, 331, 300)
+            with torch.no_grad():
+                output = model(x)
+                model.tile_size = None
+                expected = model(x)
+            self.assertTrue(torch.allclose(output, expected, rtol=1e-4, atol=1e-4 * expected.abs().max()))
+
+    def test_checkpoint(self):
+        architectures = [
+            (lambda **kwargs: models.Inception3(num_classes=50, aux_logits=False, **kwargs), 107),
+            (lambda **kwargs: models.ResNet(BasicBlock, [1, 1, 1, 1], num_classes=50, **kwargs), 64),
+            (lambda **kwargs: models.DenseNet(16, (2, 2), 32, num_classes=50, **kwargs), 64),
+        ]
+        for make_model, size in architectures:
+            model = make_model()
+            checkpointed = make_model(checkpoint=True)
+            checkpointed.load_state_dict(model.state_dict())
+            x = torch.rand(2, 3, size, size)
+            outputs, grads = [], []
+            for m in (model, checkpointed):
+                torch.manual_seed(0)
+                out = m(x)
+                out.sum().backward()
+                outputs.append(out)
+                grads.append([p.grad for p in m.parameters()])
+            self.assertTrue(torch.allclose(outputs[0], outputs[1]))
+            for grad, checkpointed_grad in zip(*grads):
+                self.assertTrue(torch.allclose(grad, checkpointed_grad, rtol=1e-4, atol=1e-6))
+            buffers = dict(checkpointed.named_buffers())
+            for name, buf in model.named_buffers():
+                self.assertTrue(torch.allclose(buf, buffers[name], rtol=1e-4, atol=1e-6), name)
+
+    def test_densenet_memory_efficient(self):
+        model = models.DenseNet(16, (3, 3), 32, num_classes=50)
+        efficient = models.DenseNet(16, (3, 3), 32, num_classes=50, memory_efficient=True)
+        self.assertEqual(list(model.state_dict()), list(efficient.state_dict()))
+        efficient.load_state_dict(model.state_dict())
+        x = torch.rand(2, 3, 64, 64)
+        outputs, grads = [], []
+        for m in (model, efficient):
+            out = m(x)
+            out.sum().backward()
+            outputs.append(out)
+            grads.append([p.grad for p in m.parameters()])
+        self.assertTrue(torch.allclose(outputs[0], outputs[1]))
+        for grad, efficient_grad in zip(*grads):
+            self.assertTrue(torch.allclose(grad, efficient_grad, rtol=1e-4, atol=1e-6))
+        buffers = dict(efficient.named_buffers())
+        for name, buf in model.named_buffers():
+            self.assertTrue(torch.allclose(buf, buffers[name], rtol=1e-4, atol=1e-6), name)
+        efficient.eval()
+        model.eval()
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(model(x), efficient(x)))
+
 
 for model_name in get_available_models():
     # for-loop bodies don't define scopes, so we have to save the variables
@@ -1,10 +1,12 @@
 from __future__ import division
+import os
 import torch
 import torchvision.transforms as transforms
 import torchvision.transforms.functional as F
 from torch._utils_internal import get_file_path_2
 import unittest
 import math
+import pickle
 import random
 import numpy as np
 from PIL import Image
@@ -18,7 +20,12 @@ try:
 except ImportError:
     stats = None
 
-GRACE_HOPPER = get_file_path_2('assets/grace_hopper_517x606.jpg')
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+GRACE_HOPPER = get_file_path_2(os.path.dirname(os.path.abspath(__file__)), 'assets', 'grace_hopper_517x606.jpg')
 
 
 class Tester(unittest.TestCase):
@@ -447,6 +454,62 @@ class Tester(unittest.TestCase):
         output = trans(img)
         assert np.allclose(input_data.numpy(), output.numpy())
 
+    def test_to_tensor_matches_bytes_path(self):
+        def bytes_to_tensor(pic):
+            # the tobytes based implementation to_tensor used to have
+            if pic.mode == 'I':
+                img = torch.from_numpy(np.array(pic, np.int32, copy=False))
+            elif pic.mode == 'I;16':
+                img = torch.from_numpy(np.array(pic, np.int16, copy=False))
+            elif pic.mode == 'F':
+                img = torch.from_numpy(np.array(pic, np.float32, copy=False))
+            elif pic.mode == '1':
+                img = 255 * torch.from_numpy(np.array(pic, np.uint8, copy=False))
+            else:
+                img = torch.ByteTensor(bytearray(pic.tobytes()))
+            if pic.mode == 'YCbCr':
+                nchannel = 3
+            elif pic.mode == 'I;16':
+                nchannel = 1
+            else:
+                nchannel = len(pic.mode)
+            img = img.view(pic.size[1], pic.size[0], nchannel)
+            img = img.transpose(0, 1).transpose(0, 2).contiguous()
+            if isinstance(img, torch.ByteTensor):
+                return img.float().div(255)
+            else:
+                return img
+
+        rgb = Image.open(GRACE_HOPPER).convert('RGB').resize((37, 29))
+        images = [rgb.convert(mode) for mode in ['1', 'L', 'LA', 'P', 'RGB', 'RGBA', 'CMYK', 'YCbCr', 'HSV',
+                                                 'I', 'F']]
+        images.append(Image.fromarray(np.random.randint(0, 2 ** 16, (29, 37)).astype(np.uint16), 'I;16'))
+        for img in images:
+            expected_output = bytes_to_tensor(img)
+            output = F.to_tensor(img)
+            self.assertEqual(output.dtype, expected_output.dtype, img.mode)
+            self.assertTrue(torch.equal(output, expected_output), img.mode)
+
+        ndarray = np.array(rgb)
+        assert torch.equal(F.to_tensor(ndarray), torch.from_numpy(ndarray).permute(2, 0, 1).float().div(255))
+
+    def test_to_byte_tensor(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        ndarray = np.array(img)
+        output = transforms.ToByteTensor()(img)
+        self.assertEqual(output.dtype, torch.uint8)
+        self.assertEqual(output.size(), (3, img.size[1], img.size[0]))
+        self.assertEqual(output.stride(), (1, 3 * img.size[0], 3))
+        assert torch.equal(output.float().div(255), F.to_tensor(img))
+        assert torch.equal(F.to_byte_tensor(img.convert('1')), F.to_tensor(img.convert('1')).mul(255).byte())
+
+        output = F.to_byte_tensor(ndarray)
+        self.assertEqual(output.data_ptr(), ndarray.ctypes.data)
+        output = F.to_byte_tensor(ndarray[:, ::-1])
+        assert torch.equal(output, F.to_byte_tensor(np.ascontiguousarray(ndarray[:, ::-1])))
+        with self.assertRaises(TypeError):
+            F.to_byte_tensor(img.convert('F'))
+
     @unittest.skipIf(accimage is None, 'accimage not available')
     def test_accimage_to_tensor(self):
         trans = transforms.ToTensor()
@@ -492,6 +555,172 @@ class Tester(unittest.TestCase):
         self.assertEqual(expected_output.size(), output.size())
         assert np.allclose(output.numpy(), expected_output.numpy())
 
+    @unittest.skipIf(cv2 is None, 'cv2 not available')
+    def test_ndarray_resize(self):
+        trans = transforms.Compose([
+            transforms.Resize(256),
+            transforms.ToTensor(),
+        ])
+
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        expected_output = trans(img)
+        output = trans(np.array(img))
+
+        self.assertEqual(expected_output.size(), output.size())
+        self.assertLess(np.abs((expected_output - output).mean()), 1e-2)
+        self.assertEqual(transforms.Resize2((40, 30))(np.array(img)).shape, (40, 30, 3))
+        self.assertEqual(transforms.Resize((40, 30))(np.array(img.convert('L'))[:, :, None]).shape, (40, 30, 1))
+
+    def test_ndarray_tensor_crop_flip(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        ndarray = np.array(img)
+        tensor = torch.from_numpy(ndarray).permute(2, 0, 1)
+        to_tensor = transforms.ToTensor()
+
+        for trans in [transforms.CenterCrop(256), transforms.RandomHorizontalFlip(p=1),
+                      transforms.RandomVerticalFlip(p=1)]:
+            expected_output = np.array(trans(img))
+            assert np.array_equal(trans(ndarray), expected_output)
+            assert np.array_equal(trans(tensor).permute(1, 2, 0).numpy(), expected_output)
+            self.assertEqual(to_tensor(trans(ndarray)).size(), to_tensor(trans(img)).size())
+
+        self.assertEqual(F._get_image_size(ndarray), img.size)
+        self.assertEqual(F._get_image_size(tensor), img.size)
+        i, j, h, w = transforms.RandomResizedCrop.get_params(ndarray, (0.08, 1.0), (3. / 4., 4. / 3.))
+        self.assertEqual(F.resized_crop(ndarray, i, j, h, w, (32, 24)).shape, (32, 24, 3))
+        self.assertEqual(F.resized_crop(tensor, i, j, h, w, (32, 24)).shape, (3, 32, 24))
+        self.assertEqual(F.resized_crop(tensor, i, j, h, w, (32, 24)).dtype, torch.uint8)
+
+    def test_batch_flip_rotation(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB').resize((32, 32))
+        batch = transforms.ToByteTensor()(img).unsqueeze(0).repeat(4, 1, 1, 1)
+        self.assertEqual(batch.dtype, torch.uint8)
+
+        def to_tensor(pic):
+            return torch.from_numpy(np.array(pic)).permute(2, 0, 1)
+
+        output = transforms.BatchRandomHorizontalFlip(p=1)(batch)
+        for sample in output:
+            assert torch.equal(sample, to_tensor(F.hflip(img)))
+        output = transforms.BatchRandomVerticalFlip(p=1)(batch)
+        for sample in output:
+            assert torch.equal(sample, to_tensor(F.vflip(img)))
+        assert torch.equal(transforms.BatchRandomHorizontalFlip(p=0)(batch), batch)
+
+        for angle in [0, 90, 180, 270]:
+            output = transforms.BatchRandomRotation2((angle, angle))(batch)
+            for sample in output:
+                assert torch.equal(sample, to_tensor(F.rotate(img, angle)))
+
+        random_state = torch.get_rng_state()
+        torch.manual_seed(42)
+        output = transforms.BatchRandomHorizontalFlip()(batch.repeat(25, 1, 1, 1))
+        flipped = sum(1 for sample in output if not torch.equal(sample, batch[0]))
+        torch.set_rng_state(random_state)
+        self.assertTrue(20 < flipped < 80)
+
+        with self.assertRaises(TypeError):
+            transforms.BatchRandomHorizontalFlip()(batch[0])
+        with self.assertRaises(ValueError):
+            transforms.BatchRandomRotation2((90, 90))(batch[:, :, :16])
+
+    def test_batch_color_jitter(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB').resize((32, 32))
+        batch = transforms.ToByteTensor()(img).unsqueeze(0).float()
+
+        for adjust, batch_adjust, factor in [(F.adjust_brightness, F.batch_adjust_brightness, 1.4),
+                                             (F.adjust_contrast, F.batch_adjust_contrast, 0.6),
+                                             (F.adjust_saturation, F.batch_adjust_saturation, 1.7)]:
+            expected_output = np.array(adjust(img, factor)).transpose(2, 0, 1)
+            output = batch_adjust(batch, factor).round()[0].numpy()
+            assert np.allclose(output, expected_output, atol=1)
+
+        expected_output = np.array(F.adjust_hue(img, 0.2)).transpose(2, 0, 1)
+        output = F.batch_adjust_hue(batch, 0.2).round()[0].numpy()
+        self.assertLess(np.abs(output - expected_output).mean(), 1)
+        assert np.allclose(F.batch_adjust_hue(batch, 0).numpy(), batch.numpy(), atol=1e-3)
+
+        byte_batch = batch.byte().repeat(8, 1, 1, 1)
+        output = transforms.BatchColorJitter(0.5, 0.5, 0.5, 0.1)(byte_batch)
+        self.assertEqual(output.dtype, torch.uint8)
+        self.assertEqual(output.size(), byte_batch.size())
+        self.assertFalse(torch.equal(output[0], output[1]))
+        output = transforms.BatchColorJitter(0.5, 0.5, 0.5, 0.1)(byte_batch.float() / 255)
+        self.assertTrue(0 <= output.min() and output.max() <= 1)
+
+    def test_batch_normalize(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        mean, std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+        expected_output = transforms.Normalize(mean, std)(transforms.ToTensor()(img))
+        batch = transforms.ToByteTensor()(img).unsqueeze(0)
+        output = transforms.BatchNormalize(mean, std)(batch)
+        assert np.allclose(output[0].numpy(), expected_output.numpy(), atol=1e-5)
+        output = transforms.BatchNormalize(mean, std)(batch.float() / 255)
+        assert np.allclose(output[0].numpy(), expected_output.numpy(), atol=1e-5)
+
+    def test_fused_random_resized_crop(self):
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        mean, std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+        expected = transforms.Compose([
+            transforms.RandomResizedCrop(32),
+            transforms.RandomHorizontalFlip(),
+            transforms.ToTensor(),
+            transforms.Normalize(mean, std),
+        ])
+        fused = transforms.FusedRandomResizedCrop(32, mean=mean, std=std)
+        fused.__repr__()
+        for seed in range(10):
+            random.seed(seed)
+            expected_output = expected(img)
+            random.seed(seed)
+            output = fused(img)
+            assert np.allclose(output.numpy(), expected_output.numpy(), atol=1e-5)
+
+        random.seed(0)
+        expected_output = transforms.Compose([
+            transforms.RandomResizedCrop(32), transforms.RandomHorizontalFlip(p=1), transforms.ToByteTensor()])(img)
+        random.seed(0)
+        output = transforms.FusedRandomResizedCrop(32, flip_p=1, dtype=torch.uint8)(img)
+        assert torch.equal(output, expected_output)
+
+        output = F.resized_crop_to_tensor(np.array(img), 10, 20, 100, 80, (40, 30), flip=True)
+        expected_output = transforms.ToTensor()(F.hflip(F.resized_crop(np.array(img), 10, 20, 100, 80, (40, 30))))
+        self.assertEqual(output.size(), (3, 40, 30))
+        assert np.allclose(output.numpy(), expected_output.numpy(), atol=1e-6)
+
+        with self.assertRaises(ValueError):
+            transforms.FusedRandomResizedCrop(32, mean=mean, std=std, dtype=torch.uint8)
+
+    def test_img_circle(self):
+        def loop_img_circle(ima):
+            r2 = min(ima.size)
+            if ima.size[0] != ima.size[1]:
+                ima = ima.resize((r2, r2), Image.ANTIALIAS)
+            r3 = int(r2 / 2)
+            r = float(r2 / 2)
+            imb = Image.new('RGBA', (r3 * 2, r3 * 2), (255, 255, 255, 0))
+            pima = ima.load()
+            pimb = imb.load()
+            for i in range(r2):
+                for j in range(r2):
+                    if (pow(abs(i - r), 2) + pow(abs(j - r), 2)) ** 0.5 < r3:
+                        pimb[i - (r - r3), j - (r - r3)] = pima[i, j]
+            return imb
+
+        for width, height in [(2, 2), (9, 9), (10, 10), (31, 24), (24, 37)]:
+            for mode in ['RGB', 'RGBA']:
+                data = np.random.randint(0, 256, (height, width, len(mode)), dtype=np.uint8)
+                img = Image.fromarray(data, mode)
+                expected_output = np.array(loop_img_circle(img))
+                output = np.array(F.img_circle(img))
+                assert np.array_equal(output, expected_output)
+
+        img = Image.open(GRACE_HOPPER).convert('RGB')
+        output = transforms.Resize_circle(64, circle_rio=1)(img)
+        self.assertEqual((output.mode, output.size), ('RGBA', (64, 64)))
+        self.assertEqual(output.getpixel((0, 0))[3], 0)
+        self.assertEqual(output.getpixel((32, 32))[3], 255)
+
     def test_1_channel_tensor_to_pil_image(self):
         to_tensor = transforms.ToTensor()
 
@@ -804,6 +1033,32 @@ class Tester(unittest.TestCase):
         # Checking if Normalize can be printed as string
         transforms.Normalize(mean, std).__repr__()
 
+    def test_normalize_cached_constants(self):
+        mean, std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+        img = torch.rand(3, 10, 10)
+        expected = (img - torch.tensor(mean)[:, None, None]) / torch.tensor(std)[:, None, None]
+        normalize = transforms.Normalize(mean, std)
+        for _ in range(2):
+            output = normalize(img)
+            assert output is not img
+            assert torch.equal(output, expected)
+            assert torch.equal(F.normalize(img, mean, std), expected)
+        assert len(normalize._constants) == 1
+
+        # constants follow the dtype of the input
+        output = normalize(img.double())
+        assert output.dtype == torch.float64
+        assert torch.allclose(output.float(), expected, atol=1e-6)
+        assert len(normalize._constants) == 2
+
+        # pickling drops the cache
+        assert pickle.loads(pickle.dumps(normalize))._constants == {}
+
+        copy = img.clone()
+        output = transforms.Normalize(mean, std, inplace=True)(copy)
+        assert output.data_ptr() == copy.data_ptr()
+        assert torch.equal(output, expected)
+
     def test_adjust_brightness(self):
         x_shape = [2, 2, 3]
         x_data = [0, 5, 13, 54, 135, 226, 37, 8, 234, 90, 255, 1]
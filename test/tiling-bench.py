@@ -0,0 +1,54 @@
+import argparse
+import resource
+import subprocess
+import sys
+from timeit import default_timer as timer
+import numpy as np
+import torch
+from torchvision import models
+
+
+parser = argparse.ArgumentParser(description='Tiled inference peak memory benchmark')
+parser.add_argument('--model', default='inception_v3', help='model name in torchvision.models')
+parser.add_argument('--size', default=2000, type=int, help='square input size (default: 2000)')
+parser.add_argument('-b', '--batch-size', default=1, type=int)
+parser.add_argument('--tile-sizes', default=[0, 1024, 512, 256], type=int, nargs='+',
+                    help='tile sizes to compare, 0 runs the whole image (default: 0 1024 512 256)')
+parser.add_argument('--tile-size', default=None, type=int,
+                    help='run a single tile size in this process (used internally)')
+
+
+def run(args):
+    kwargs = {'aux_logits': False} if args.model == 'inception_v3' else {}
+    model = models.__dict__[args.model](tile_size=args.tile_size or None, **kwargs)
+    model.eval()
+    x = torch.rand(args.batch_size, 3, args.size, args.size)
+    with torch.no_grad():
+        if args.tile_size:
+            # measure the receptive field before timing
+            model(x[:, :, :256, :256])
+        # ru_maxrss is reported in kilobytes on Linux
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        start_time = timer()
+        output = model(x)
+        elapsed = timer() - start_time
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print("{model} {size}px, tile {tile}: {time:.2f} s, max RSS {rss:.0f} MB (+{growth:.0f} MB), "
+          "output sum {checksum:.4f}".format(model=args.model, size=args.size, tile=args.tile_size or 'none',
+                                             time=elapsed, rss=rss, growth=rss - before,
+                                             checksum=output.double().sum().item()))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.tile_size is not None:
+        # Inception3 draws its initial weights from numpy
+        np.random.seed(0)
+        torch.manual_seed(0)
+        run(args)
+    else:
+        # each tile size runs in a fresh interpreter so RSS is not shared between them
+        for tile_size in args.tile_sizes:
+            subprocess.check_call([sys.executable, __file__, '--model', args.model, '--size', str(args.size),
+                                   '-b', str(args.batch_size), '--tile-size', str(tile_size)])
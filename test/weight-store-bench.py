@@ -0,0 +1,58 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+from timeit import default_timer as timer
+import torch
+from torchvision import models
+from torchvision.models.store import WeightStore, set_weight_store
+
+
+parser = argparse.ArgumentParser(description='Concurrent pretrained loading from a WeightStore')
+parser.add_argument('--arch', default='resnet152', help='resnet model name (default: resnet152)')
+parser.add_argument('-j', '--jobs', default=8, type=int, help='simultaneous jobs (default: 8)')
+
+
+def load_state_dict_job(args):
+    # every job reads the whole cached checkpoint into memory, as
+    # load_state_dict_from_url did
+    arch, path = args
+    model = models.__dict__[arch]()
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+
+
+def store_job(args):
+    arch, root = args
+    set_weight_store(root)
+    models.__dict__[arch](pretrained=True)
+
+
+def bench(fn, args, jobs):
+    pool = multiprocessing.Pool(jobs)
+    start_time = timer()
+    pool.map(fn, [args] * jobs)
+    elapsed = timer() - start_time
+    pool.close()
+    pool.join()
+    return elapsed
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    torch.set_num_threads(1)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        url = models.resnet.model_urls[args.arch]
+        checkpoint = os.path.join(temp_dir, os.path.basename(url))
+        torch.save(models.__dict__[args.arch]().state_dict(), checkpoint)
+        start_time = timer()
+        WeightStore(os.path.join(temp_dir, 'store')).add(checkpoint, progress=False)
+        print("{}: added to the store in {:.2f} s".format(args.arch, timer() - start_time))
+
+        baseline = bench(load_state_dict_job, (args.arch, checkpoint), args.jobs)
+        store = bench(store_job, (args.arch, os.path.join(temp_dir, 'store')), args.jobs)
+        print("{jobs} jobs: torch.load + load_state_dict {baseline:.2f} s, WeightStore {store:.2f} s"
+              .format(jobs=args.jobs, baseline=baseline, store=store))
+    finally:
+        shutil.rmtree(temp_dir)
@@ -1,14 +1,45 @@
-from torchvision import models
-from torchvision import datasets
+import importlib
+import sys
+
 from torchvision import transforms
 from torchvision import utils
 
+# models and datasets import every architecture and dataset module (and
+# OpenCV through the folder datasets), so they are only loaded on first access
+_lazy_submodules = ('models', 'datasets')
+
+if sys.version_info < (3, 7):
+    from torchvision import models
+    from torchvision import datasets
+else:
+    def __getattr__(name):
+        if name in _lazy_submodules:
+            return importlib.import_module('.' + name, __name__)
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy_submodules))
+
 try:
     from .version import __version__  # noqa: F401
 except ImportError:
     pass
 
 _image_backend = 'PIL'
+_image_loaders = {}
+
+
+def register_image_backend(backend, loader):
+    """
+    Registers a package that can be used to load images.
+
+    Args:
+        backend (string): Name the backend is selected by in :func:`set_image_backend`.
+        loader (callable): A function to load an image given its path. It may return
+            a PIL Image or an RGB ``numpy.ndarray`` of shape (H x W x C) and dtype
+            uint8, which the transforms accept as well.
+    """
+    _image_loaders[backend] = loader
 
 
 def set_image_backend(backend):
@@ -16,14 +47,16 @@ def set_image_backend(backend):
     Specifies the package used to load images.
 
     Args:
-        backend (string): Name of the image backend. one of {'PIL', 'accimage'}.
+        backend (string): Name of the image backend. one of {'PIL', 'accimage', 'cv2'}
+            or a backend added with :func:`register_image_backend`.
             The :mod:`accimage` package uses the Intel IPP library. It is
             generally faster than PIL, but does not support as many operations.
+            The ``'cv2'`` backend decodes with OpenCV into numpy arrays.
     """
     global _image_backend
-    if backend not in ['PIL', 'accimage']:
-        raise ValueError("Invalid backend '{}'. Options are 'PIL' and 'accimage'"
-                         .format(backend))
+    if backend not in _image_loaders:
+        raise ValueError("Invalid backend '{}'. Options are {}"
+                         .format(backend, sorted(_image_loaders)))
     _image_backend = backend
 
 
@@ -32,3 +65,24 @@ def get_image_backend():
     Gets the name of the package used to load images
     """
     return _image_backend
+
+
+def get_image_loader():
+    """
+    Gets the function used to load images with the current backend
+    """
+    return _image_loaders[_image_backend]
+
+
+def _folder_loader(name):
+    # resolves the loader from datasets.folder on first use
+    def loader(path):
+        from torchvision.datasets import folder
+        return getattr(folder, name)(path)
+    loader.__name__ = name
+    return loader
+
+
+register_image_backend('PIL', _folder_loader('pil_loader'))
+register_image_backend('accimage', _folder_loader('accimage_loader'))
+register_image_backend('cv2', _folder_loader('cv2_loader'))
@@ -1,17 +1,37 @@
 from .vision import VisionDataset
+from .heatmap import HeatmapCache, HeatmapIndex, HeatmapStore
 
 from PIL import Image
 
 import os
 import os.path
 import sys
+import math
+import time
+import functools
 import torch
 import json
+import collections
 import numpy as np
-import cv2
+
+if sys.version_info[0] == 2:
+    import cPickle as pickle
+    Sequence = collections.Sequence
+else:
+    import pickle
+    Sequence = collections.abc.Sequence
+
+_fsencode = getattr(os, 'fsencode', lambda path: path)
+_fsdecode = getattr(os, 'fsdecode', lambda path: path)
+
 DEBUG = False
 HEATMAP=True
 REFERRABLE=True
+MANIFEST_VERSION = 2
+# coarsest mtime resolution expected from the filesystems datasets live on
+_MTIME_RESOLUTION = 2.0
+
+
 def has_file_allowed_extension(filename, extensions):
     """Checks if a file is an allowed extension.
 
@@ -37,7 +57,83 @@ def is_image_file(filename):
     return has_file_allowed_extension(filename, IMG_EXTENSIONS)
 
 
-def make_dataset(dir, class_to_idx, extensions=None, is_valid_file=None):
+def _scan_class_dir(d, is_valid_file):
+    # taken before the walk: an entry changed while it runs may not move the
+    # mtime of its directory past the one recorded for it
+    scanned = time.time()
+    dirs = {}
+    files = []
+    for root, _, fnames in sorted(os.walk(d)):
+        dirs[os.path.relpath(root, d)] = os.stat(root).st_mtime
+        for fname in sorted(fnames):
+            path = os.path.join(root, fname)
+            if is_valid_file(path):
+                st = os.stat(path)
+                files.append((os.path.relpath(path, d), st.st_mtime, st.st_size))
+    return {'scanned': scanned, 'dirs': dirs, 'files': files}
+
+
+def _class_dir_unchanged(d, entry):
+    # a directory's mtime changes whenever an entry is added, removed or
+    # renamed in it, so the recorded mtimes stand in for a full listing.
+    # Mtimes only have the resolution of the filesystem, which is a second or
+    # more on network filesystems, so a directory modified in the tick of the
+    # scan or later could have changed without its mtime moving and is
+    # always scanned again.
+    limit = entry['scanned'] - _MTIME_RESOLUTION
+    try:
+        return all(mtime < limit and os.stat(os.path.join(d, rel)).st_mtime == mtime
+                   for rel, mtime in entry['dirs'].items())
+    except OSError:
+        return False
+
+
+def _load_manifest(manifest, dir, extensions):
+    if manifest is None or not os.path.isfile(manifest):
+        return {}
+    try:
+        with open(manifest, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        return {}
+    if data.get('version') != MANIFEST_VERSION or data.get('root') != os.path.abspath(dir) or \
+            data.get('extensions') != extensions:
+        return {}
+    return data['classes']
+
+
+def _save_manifest(manifest, dir, extensions, classes):
+    data = {'version': MANIFEST_VERSION, 'root': os.path.abspath(dir),
+            'extensions': extensions, 'classes': classes}
+    # write to a unique file first so concurrent jobs never read a partial manifest
+    tmp = '{}.{}.tmp'.format(manifest, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp, manifest)
+
+
+def make_dataset(dir, class_to_idx, extensions=None, is_valid_file=None, manifest=None, num_workers=1):
+    """Lists the (sample path, class_index) pairs found under ``dir``.
+
+    Args:
+        dir (string): Root directory path.
+        class_to_idx (dict): Dict with items (class_name, class_index).
+        extensions (tuple[string], optional): A list of allowed extensions.
+        is_valid_file (callable, optional): A function that takes path of a file
+            and checks if it is a valid file.
+        manifest (string, optional): Path of a file caching the listing of every class
+            folder, with the mtime and size of every file and the mtimes of its
+            directories. Class folders whose directories are unchanged, and were last
+            modified well before the folder was scanned, are taken from it instead of
+            being walked again, and the file is rewritten when any folder had to be
+            rescanned. Only used
+            together with ``extensions`` since ``is_valid_file`` cannot be fingerprinted.
+        num_workers (int, optional): Number of threads used to walk the class folders
+            that have to be scanned. Default: 1.
+
+    Returns:
+        list: List of (sample path, class_index) tuples.
+    """
     images = []
     dir = os.path.expanduser(dir)
     if not ((extensions is None) ^ (is_valid_file is None)):
@@ -45,31 +141,150 @@ def make_dataset(dir, class_to_idx, extensions=None, is_valid_file=None):
     if extensions is not None:
         def is_valid_file(x):
             return has_file_allowed_extension(x, extensions)
-    for target in sorted(class_to_idx.keys()):
+    else:
+        manifest = None
+    if manifest is not None:
+        manifest = os.path.expanduser(manifest)
+
+    targets = [target for target in sorted(class_to_idx.keys())
+               if os.path.isdir(os.path.join(dir, target))]
+    cached = _load_manifest(manifest, dir, extensions)
+    classes = {}
+    stale = []
+    for target in targets:
+        entry = cached.get(target)
+        if entry is not None and _class_dir_unchanged(os.path.join(dir, target), entry):
+            classes[target] = entry
+        else:
+            stale.append(target)
+
+    def scan(target):
+        return _scan_class_dir(os.path.join(dir, target), is_valid_file)
+
+    if num_workers > 1 and len(stale) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            classes.update(zip(stale, executor.map(scan, stale)))
+    else:
+        classes.update((target, scan(target)) for target in stale)
+
+    if manifest is not None and (stale or set(cached) != set(targets)):
+        _save_manifest(manifest, dir, extensions, classes)
+
+    for target in targets:
         d = os.path.join(dir, target)
-        if not os.path.isdir(d):
-            continue
-        for root, _, fnames in sorted(os.walk(d)):
-            for fname in sorted(fnames):
-                path = os.path.join(root, fname)
-                if is_valid_file(path):
-                    item = (path, class_to_idx[target])
-                    images.append(item)
+        images.extend((os.path.join(d, rel), class_to_idx[target]) for rel, _, _ in classes[target]['files'])
 
     return images
 
 
-def resize_flip(filename,input_size,srcarray):
-    srcarray=cv2.resize(srcarray,(input_size,input_size))
+class PackedSamples(Sequence):
+    """Read-only sequence of (sample path, class_index) tuples backed by NumPy arrays.
+
+    All paths live in one byte buffer indexed by an offset array and the
+    targets in one integer array. Python lists hold one object per sample
+    whose refcount is touched on every access, which makes forked DataLoader
+    workers copy the pages they live on. These three arrays are a handful of
+    objects, so their pages stay shared between workers.
+
+    Args:
+        samples (iterable): (sample path, class_index) tuples.
+
+    Attributes:
+        targets (numpy.ndarray): The class_index value for each sample, read-only.
+    """
+
+    def __init__(self, samples):
+        encoded = []
+        targets = []
+        for path, target in samples:
+            encoded.append(_fsencode(path))
+            targets.append(target)
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in encoded], out=offsets[1:])
+        self._buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        self._offsets = offsets
+        self.targets = np.array(targets, dtype=np.int64)
+        for array in (self._offsets, self.targets):
+            array.flags.writeable = False
+
+    def path(self, index):
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return _fsdecode(self._buffer[start:end].tobytes())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("{} index out of range".format(self.__class__.__name__))
+        return self.path(index), int(self.targets[index])
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or len(self) != len(other):
+            return False
+        return all(a == tuple(b) for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def composite_heatmap(sample, heatmap, masked=True, dtype=None):
+    """Stacks a sample with its lesion heatmaps into one preallocated tensor.
+
+    Args:
+        sample (Tensor): Image tensor of size (C, H, W).
+        heatmap (Tensor): Heatmaps of size (N, H, W).
+        masked (bool, optional): If True, the output is ``sample`` followed by
+            ``sample * heatmap[i]`` for every heatmap, i.e. ``C * (N + 1)``
+            channels as used by ``with_heatmap_v2``/``with_heatmap_v4``.
+            Otherwise the heatmaps are appended as ``N`` extra channels as
+            used by ``with_heatmap``.
+        dtype (torch.dtype, optional): Output dtype, e.g. ``torch.float16``.
+            Default: the dtype of ``sample``.
+
+    Returns:
+        Tensor: Composited sample.
+    """
+    if dtype is None:
+        dtype = sample.dtype
+    else:
+        sample = sample.to(dtype)
+    heatmap = heatmap.to(dtype)
+    c, h, w = sample.size()
+    n = heatmap.size(0)
+    if masked:
+        out = torch.empty((c * (n + 1), h, w), dtype=dtype, device=sample.device)
+        out[:c].copy_(sample)
+        torch.mul(sample.unsqueeze(0), heatmap.unsqueeze(1), out=out[c:].view(n, c, h, w))
+    else:
+        out = torch.empty((c + n, h, w), dtype=dtype, device=sample.device)
+        out[:c].copy_(sample)
+        out[c:].copy_(heatmap)
+    return out
+
+
+def flip_view(filename, srcarray):
+    """Applies the flip encoded in an augmented filename as a view of ``srcarray``."""
     if '_vflip' in filename:
-        srcarray = cv2.flip(srcarray,1)
+        srcarray = srcarray[:, ::-1]
     elif '_hflip' in filename:
-        srcarray = cv2.flip(srcarray,0)
+        srcarray = srcarray[::-1]
     elif '_vhflip' in filename:
-        srcarray = cv2.flip(srcarray,1)
-        srcarray = cv2.flip(srcarray,0)
+        srcarray = srcarray[::-1, ::-1]
     return srcarray
 
+
+def resize_flip(filename,input_size,srcarray):
+    import cv2
+    srcarray=cv2.resize(srcarray,(input_size,input_size))
+    return np.ascontiguousarray(flip_view(filename, srcarray))
+
 class DatasetFolder(VisionDataset):
     """A generic data loader where the samples are arranged in this way: ::
 
@@ -94,6 +309,23 @@ class DatasetFolder(VisionDataset):
         is_valid_file (callable, optional): A function that takes path of an Image file
             and check if the file is a valid_file (used to check of corrupt files)
             both extensions and is_valid_file should not be passed.
+        heatmap_store (string or HeatmapStore, optional): Heatmaps precomputed with
+            ``build_heatmap_store`` for this dataset. When given, the ``with_heatmap``
+            modes read from it instead of rebuilding the heatmaps from json and ``.npy`` files.
+        heatmap_index (string or HeatmapIndex, optional): Lesion records converted with
+            ``build_heatmap_index``. When given, records are queried per image instead of
+            loading every ``positive_heatmap.json`` into memory.
+        composite_dtype (torch.dtype, optional): Dtype of the samples built by the
+            ``with_heatmap``, ``with_heatmap_v2`` and ``with_heatmap_v4`` modes, e.g.
+            ``torch.float16``. Default: the dtype of the transformed sample.
+        heatmap_cache_size (int, optional): Number of resized, unflipped lesion heatmaps
+            kept in an LRU cache so the flipped copies of an image are built only once.
+            Each entry is an ``input_size x input_size`` float64 array. Default: 0 (disabled).
+        manifest (string, optional): File caching the directory scan, see ``make_dataset``.
+        scan_workers (int, optional): Number of threads used to scan class folders. Default: 1.
+        compact_samples (bool, optional): If True, ``samples`` is a read-only
+            :class:`PackedSamples` and ``targets`` a read-only NumPy array, which keeps
+            their memory shared across forked DataLoader workers. Default: False.
 
      Attributes:
         classes (list): List of the class names.
@@ -104,7 +336,9 @@ class DatasetFolder(VisionDataset):
 
     def __init__(self, root, loader, extensions=None, transform=None, target_transform=None, is_valid_file=None,
                         input_size=2000, with_heatmap = False,with_heatmap_v2=False,with_heatmap_v3 = False,with_heatmap_v4 = False,
-                        DR_REFERRABLE=False):
+                        DR_REFERRABLE=False, heatmap_store=None, heatmap_index=None,
+                        composite_dtype=None, heatmap_cache_size=0, manifest=None, scan_workers=1,
+                        compact_samples=False):
         super(DatasetFolder, self).__init__(root)
         self.transform = transform
         self.target_transform = target_transform
@@ -114,8 +348,11 @@ class DatasetFolder(VisionDataset):
         self.with_heatmap_v3 = with_heatmap_v3
         self.with_heatmap_v4 = with_heatmap_v4
         self.DR_REFERRABLE = DR_REFERRABLE
+        self.composite_dtype = composite_dtype
+        self.heatmap_cache = HeatmapCache(heatmap_cache_size) if heatmap_cache_size > 0 else None
         classes, class_to_idx = self._find_classes(self.root)
-        samples = make_dataset(self.root, class_to_idx, extensions, is_valid_file)
+        samples = make_dataset(self.root, class_to_idx, extensions, is_valid_file,
+                               manifest=manifest, num_workers=scan_workers)
         
         if len(samples) == 0:
             raise (RuntimeError("Found 0 files in subfolders of: " + self.root + "\n"
@@ -126,9 +363,27 @@ class DatasetFolder(VisionDataset):
 
         self.classes = classes
         self.class_to_idx = class_to_idx
-        self.samples = samples
-        self.targets = [s[1] for s in samples]
-        if self.with_heatmap or self.with_heatmap_v2:
+        if compact_samples:
+            self.samples = PackedSamples(samples)
+            self.targets = self.samples.targets
+        else:
+            self.samples = samples
+            self.targets = [s[1] for s in samples]
+        if isinstance(heatmap_store, torch._six.string_classes):
+            heatmap_store = HeatmapStore(heatmap_store)
+        if heatmap_store is not None:
+            if heatmap_store.input_size != self.input_size:
+                raise ValueError("Heatmap store was built for input_size {}, got {}"
+                                 .format(heatmap_store.input_size, self.input_size))
+            if not heatmap_store.check_samples(self.root, samples):
+                raise RuntimeError("Heatmap store does not match the samples found in: " + self.root)
+        self.heatmap_store = heatmap_store
+        if isinstance(heatmap_index, torch._six.string_classes):
+            heatmap_index = HeatmapIndex(heatmap_index)
+        self.heatmap_index = heatmap_index
+        # get_heatmap reads these in every with_heatmap mode, v3 and v4 included
+        if heatmap_store is None and heatmap_index is None and (self.with_heatmap or self.with_heatmap_v2 or
+                                                                self.with_heatmap_v3 or self.with_heatmap_v4):
             self.heatmap_Hemorrhages_jsons=[]
             self.heatmap_Microaneurysms_jsons=[]
             self.heatmap_Hard_Exudate_jsons=[]
@@ -177,7 +432,15 @@ class DatasetFolder(VisionDataset):
             stage=3
         elif '/4/' in heatmap_path:
             stage=4
-        if category_id==1:
+        key = (original_image_filename, category_id, stage, self.input_size)
+        if self.heatmap_cache is not None:
+            heatmap = self.heatmap_cache.get(key)
+            if heatmap is not None:
+                return flip_view(image_filename, heatmap)
+
+        if self.heatmap_index is not None:
+            heatmap_json = self.heatmap_index.get(stage, category_id, original_image_filename)
+        elif category_id==1:
             heatmap_json = self.heatmap_Hemorrhages_jsons[stage][original_image_filename]
         elif category_id==2:
             heatmap_json = self.heatmap_Microaneurysms_jsons[stage][original_image_filename]
@@ -195,8 +458,11 @@ class DatasetFolder(VisionDataset):
                 heatmap[int(bbox[1]):int(bbox[1]+bbox[3]),int(bbox[0]):int(bbox[0]+bbox[2])] = patch_heatmap
                 bbox_count+=1
 
-        heatmap = resize_flip(image_filename,self.input_size,heatmap)
-        return heatmap
+        import cv2
+        heatmap = cv2.resize(heatmap,(self.input_size,self.input_size))
+        if self.heatmap_cache is not None:
+            self.heatmap_cache.put(key, heatmap)
+        return flip_view(image_filename, heatmap)
 
     def get_heatmap(self,image_path,input_size):
 
@@ -224,19 +490,13 @@ class DatasetFolder(VisionDataset):
             original_image_filename = image_filename.replace('_vhflip','')
 
         if True or '/0/' in image_path:
-            heatmap1 = self.create_heatmap_from_json(1,input_size,image_filename,original_image_filename,
-                                os.path.join(heat_map_npy_path,lesion_category[0],'positive_heatmap_v2'))
-            heatmap2 = self.create_heatmap_from_json(2,input_size,image_filename,original_image_filename,
-                                os.path.join(heat_map_npy_path,lesion_category[1],'positive_heatmap_v2'))
-            heatmap3 = self.create_heatmap_from_json(3,input_size,image_filename,original_image_filename,
-                                os.path.join(heat_map_npy_path,lesion_category[2],'positive_heatmap_v2'))
-            heatmap4 = self.create_heatmap_from_json(4,input_size,image_filename,original_image_filename,
-                                os.path.join(heat_map_npy_path,lesion_category[3],'positive_heatmap_v2'))
-            heatmap1 = torch.stack([torch.from_numpy(heatmap1)],0)
-            heatmap2 = torch.stack([torch.from_numpy(heatmap2)],0)
-            heatmap3 = torch.stack([torch.from_numpy(heatmap3)],0)
-            heatmap4 = torch.stack([torch.from_numpy(heatmap4)],0)
-            heatmap = torch.cat((heatmap1,heatmap2,heatmap3,heatmap4),0)
+            # every channel is written straight into its slot of one tensor
+            heatmap = torch.empty((len(lesion_category), self.input_size, self.input_size), dtype=torch.float64)
+            for i, lesion in enumerate(lesion_category):
+                # the flipped view is materialized by this copy into the output
+                heatmap[i].numpy()[...] = self.create_heatmap_from_json(
+                    i + 1,input_size,image_filename,original_image_filename,
+                    os.path.join(heat_map_npy_path,lesion,'positive_heatmap_v2'))
 
             return heatmap
         else:
@@ -259,7 +519,12 @@ class DatasetFolder(VisionDataset):
             heatmap = torch.cat((heatmap1,heatmap2,heatmap3,heatmap4),0)
 
             return heatmap
-            
+
+    def _load_heatmap(self, index, path):
+        if self.heatmap_store is not None:
+            return self.heatmap_store[index]
+        return self.get_heatmap(path, self.input_size)
+
     def __getitem__(self, index):
         """
         Args:
@@ -291,28 +556,13 @@ class DatasetFolder(VisionDataset):
             print(target)
             pass
         if self.with_heatmap:
-            heatmap = self.get_heatmap(path,self.input_size)
-            heatmap = heatmap.type(sample.dtype)
-            #print(heatmap.size())
-            #print(sample.size())
-
-            sample = torch.cat((sample,heatmap),0)
-            #print(sample.size())
-            #print(sample.size())
+            heatmap = self._load_heatmap(index, path)
+            sample = composite_heatmap(sample, heatmap, masked=False, dtype=self.composite_dtype)
         if self.with_heatmap_v2:
-            heatmap = self.get_heatmap(path,self.input_size)
-            heatmap = heatmap.type(sample.dtype)
-            #print(heatmap.size())
-            #print(sample.size())
-
-            sample1 = sample[:]*heatmap[0]
-            sample2 = sample[:]*heatmap[1]
-            sample3 = sample[:]*heatmap[2]
-            sample4 = sample[:]*heatmap[3]
-            
-            sample = torch.cat((sample,sample1,sample2,sample3,sample4),0)
+            heatmap = self._load_heatmap(index, path)
+            sample = composite_heatmap(sample, heatmap, dtype=self.composite_dtype)
         if self.with_heatmap_v3:
-            heatmap = self.get_heatmap(path,self.input_size)
+            heatmap = self._load_heatmap(index, path)
             heatmap = heatmap.type(sample.dtype)
             #print(heatmap.size())
             #print(sample.size())
@@ -320,9 +570,8 @@ class DatasetFolder(VisionDataset):
             sample = sample/5
             #sample = torch.cat((sample,heatmap),0)  
         if self.with_heatmap_v4:
-            heatmap = self.get_heatmap(path,self.input_size)
-            heatmap = heatmap.type(sample.dtype)
-            sample = torch.cat((sample,sample*heatmap[0],sample*heatmap[1],sample*heatmap[2],sample*heatmap[3]),0)
+            heatmap = self._load_heatmap(index, path)
+            sample = composite_heatmap(sample, heatmap, dtype=self.composite_dtype)
 
         return sample, target
 
@@ -334,10 +583,20 @@ class DatasetFolder(VisionDataset):
 IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif', '.tiff', '.webp')
 
 
-def pil_loader(path):
+def pil_loader(path, draft_size=None):
+    """Loads an image as RGB.
+
+    Args:
+        path (string): Image file.
+        draft_size (tuple, optional): Smallest (width, height) the image is needed at.
+            JPEG files are then decoded with DCT scaling at the smallest power-of-two
+            reduction that is still at least this large. Other formats ignore it.
+    """
     # open path as file to avoid ResourceWarning (https://github.com/python-pillow/Pillow/issues/835)
     with open(path, 'rb') as f:
         img = Image.open(f)
+        if draft_size is not None:
+            img.draft('RGB', draft_size)
         return img.convert('RGB')
 
 
@@ -350,12 +609,55 @@ def accimage_loader(path):
         return pil_loader(path)
 
 
+def cv2_loader(path):
+    import cv2
+    # cv2.imread returns None instead of raising on unreadable files
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError("Could not read image: " + path)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
 def default_loader(path):
-    from torchvision import get_image_backend
-    if get_image_backend() == 'accimage':
-        return accimage_loader(path)
-    else:
-        return pil_loader(path)
+    from torchvision import get_image_loader
+    return get_image_loader()(path)
+
+
+def _size_to_wh(size):
+    if isinstance(size, int):
+        return size, size
+    return size[1], size[0]
+
+
+def get_draft_size(transform):
+    """Finds the smallest image size ``transform`` needs to produce its output.
+
+    The transforms are walked in order up to the first one that resizes the
+    image. Only flips and color transforms may come before it, since they do
+    not depend on the image resolution. ``RandomResizedCrop`` asks for enough
+    pixels that its smallest crop is still at least ``size``.
+
+    Args:
+        transform (callable): A transform or ``transforms.Compose``.
+
+    Returns:
+        tuple: (width, height), or None if the size can not be derived.
+    """
+    from torchvision import transforms as T
+
+    passthrough = (T.RandomHorizontalFlip, T.RandomVerticalFlip, T.ColorJitter,
+                   T.Grayscale, T.RandomGrayscale)
+    for t in (transform.transforms if isinstance(transform, T.Compose) else [transform]):
+        if isinstance(t, (T.Resize, T.Resize2, T.Resize_circle)):
+            return _size_to_wh(t.size)
+        if isinstance(t, T.RandomResizedCrop):
+            min_scale = min(t.scale)
+            h, w = t.size
+            return (int(math.ceil(w / math.sqrt(min_scale * min(t.ratio)))),
+                    int(math.ceil(h / math.sqrt(min_scale / max(t.ratio)))))
+        if not isinstance(t, passthrough):
+            return None
+    return None
 
 
 class ImageFolder(DatasetFolder):
@@ -378,6 +680,9 @@ class ImageFolder(DatasetFolder):
         loader (callable, optional): A function to load an image given its path.
         is_valid_file (callable, optional): A function that takes path of an Image file
             and check if the file is a valid_file (used to check of corrupt files)
+        draft (bool, optional): If True and the default PIL loader is used, JPEG files
+            are decoded at a reduced size that is still large enough for ``transform``,
+            see ``get_draft_size``. Default: False.
 
      Attributes:
         classes (list): List of the class names.
@@ -387,7 +692,13 @@ class ImageFolder(DatasetFolder):
 
     def __init__(self, root, transform=None, target_transform=None,
                  loader=default_loader, is_valid_file=None,input_size=2000,with_heatmap=False,with_heatmap_v2=False,
-                 DR_REFERRABLE=False):
+                 DR_REFERRABLE=False, heatmap_store=None, heatmap_index=None, composite_dtype=None,
+                 heatmap_cache_size=0, manifest=None, scan_workers=1, compact_samples=False, draft=False):
+        from torchvision import get_image_backend
+        if draft and loader is default_loader and get_image_backend() == 'PIL':
+            draft_size = get_draft_size(transform)
+            if draft_size is not None:
+                loader = functools.partial(pil_loader, draft_size=draft_size)
         super(ImageFolder, self).__init__(root, loader, IMG_EXTENSIONS if is_valid_file is None else None,
                                           transform=transform,
                                           target_transform=target_transform,
@@ -395,9 +706,18 @@ class ImageFolder(DatasetFolder):
                                           input_size=input_size,
                                           with_heatmap=with_heatmap,
                                           with_heatmap_v2 = with_heatmap_v2,
-                                          DR_REFERRABLE=DR_REFERRABLE)
+                                          DR_REFERRABLE=DR_REFERRABLE,
+                                          heatmap_store=heatmap_store,
+                                          heatmap_index=heatmap_index,
+                                          composite_dtype=composite_dtype,
+                                          heatmap_cache_size=heatmap_cache_size,
+                                          manifest=manifest,
+                                          scan_workers=scan_workers,
+                                          compact_samples=compact_samples)
         self.imgs = self.samples
     def get_imgs(self):
         return self.imgs
     def set_imgs(self,imgs):
+        if isinstance(self.samples, PackedSamples):
+            imgs = PackedSamples(imgs)
         self.samples = imgs
\ No newline at end of file
@@ -0,0 +1,285 @@
+import os
+import os.path
+import json
+import sqlite3
+from collections import OrderedDict
+import numpy as np
+import torch
+
+from .utils import makedir_exist_ok
+
+
+HEATMAP_STORE_DTYPES = ('float16', 'uint8')
+HEATMAP_STAGES = 5
+LESION_CATEGORIES = ('Hemorrhages', 'Microaneurysms', 'Hard_Exudate', 'Cotton_Wool_Spot')
+
+
+class HeatmapCache(object):
+    """Bounded LRU cache of resized, unflipped heatmaps.
+
+    The flipped copies of an image in the ``*_aug`` folders share one entry,
+    so the flip is applied afterwards as a view of the cached array. Entries
+    are made read-only to keep those views from mutating the cache.
+
+    Args:
+        maxsize (int): Maximum number of heatmaps kept. Every entry holds one
+            ``input_size x input_size`` float64 array.
+
+    Attributes:
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that had to build the heatmap.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        heatmap = self._entries.pop(key, None)
+        if heatmap is None:
+            self.misses += 1
+            return None
+        self._entries[key] = heatmap
+        self.hits += 1
+        return heatmap
+
+    def put(self, key, heatmap):
+        heatmap.flags.writeable = False
+        self._entries.pop(key, None)
+        self._entries[key] = heatmap
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(maxsize={0}, hits={1}, misses={2})'.format(
+            self.maxsize, self.hits, self.misses)
+
+
+class HeatmapIndex(object):
+    """Lazy lookup of the ``positive_heatmap.json`` lesion records.
+
+    The records of all stages and lesion categories are kept in one SQLite
+    file written by :func:`build_heatmap_index` and queried one image at a
+    time, so nothing is parsed up front and DataLoader workers share the
+    file through the page cache instead of holding their own copy of the
+    dicts. Each process opens its own read-only connection on first use.
+
+    Args:
+        path (string): SQLite file written by :func:`build_heatmap_index`.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        if not os.path.isfile(self.path):
+            raise RuntimeError("Heatmap index not found: " + self.path)
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # sqlite connections must not be shared with forked workers
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA query_only = ON')
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, stage, category_id, filename):
+        """
+        Args:
+            stage (int): DR stage folder the image belongs to.
+            category_id (int): 1-based index into ``LESION_CATEGORIES``.
+            filename (string): Image filename without flip suffix.
+
+        Returns:
+            dict: The record stored under ``filename`` in the json file.
+        """
+        row = self._connection().execute(
+            'SELECT record FROM records WHERE stage = ? AND category_id = ? AND filename = ?',
+            (stage, category_id, filename)).fetchone()
+        if row is None:
+            raise KeyError(filename)
+        return json.loads(row[0])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
+
+
+def build_heatmap_index(heatmap_root, path=None):
+    """Converts the ``positive_heatmap.json`` files under ``heatmap_root`` into a :class:`HeatmapIndex`.
+
+    Args:
+        heatmap_root (string): The ``*_heatmap`` directory laid out as
+            ``heatmap_root/<stage>/<lesion>/positive_heatmap.json``.
+        path (string, optional): Where to write the index. Default:
+            ``heatmap_root/positive_heatmap.sqlite``.
+
+    Returns:
+        HeatmapIndex: The index that was written.
+    """
+    heatmap_root = os.path.expanduser(heatmap_root)
+    if path is None:
+        path = os.path.join(heatmap_root, 'positive_heatmap.sqlite')
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    with conn:
+        conn.execute('CREATE TABLE records (stage INTEGER, category_id INTEGER, filename TEXT, record TEXT, '
+                     'PRIMARY KEY (stage, category_id, filename)) WITHOUT ROWID')
+        for stage in range(HEATMAP_STAGES):
+            for category_id, lesion in enumerate(LESION_CATEGORIES, 1):
+                with open(os.path.join(heatmap_root, str(stage), lesion, 'positive_heatmap.json')) as f:
+                    records = json.load(f)
+                conn.executemany('INSERT INTO records VALUES (?, ?, ?, ?)',
+                                 ((stage, category_id, filename, json.dumps(record))
+                                  for filename, record in records.items()))
+                del records
+    conn.close()
+    os.rename(tmp_path, path)
+    return HeatmapIndex(path)
+
+
+class HeatmapStore(object):
+    """Read-only view over heatmaps precomputed by :func:`build_heatmap_store`.
+
+    The heatmaps of every sample are kept in a single ``.npy`` file which is
+    memory-mapped on first access, so indexing the store returns a tensor
+    that shares memory with the page cache instead of decoding and resizing
+    the per-bbox ``.npy`` patches again. The mapping is reopened lazily after
+    pickling, which keeps DataLoader workers from copying the whole file.
+
+    Args:
+        root (string): Directory written by :func:`build_heatmap_store`.
+
+    Attributes:
+        input_size (int): Side length the heatmaps were resized to.
+        dtype (string): Storage dtype, one of ``'float16'`` or ``'uint8'``.
+        paths (list): Sample paths, relative to the dataset root, in row order.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        with open(self.index_file, 'r') as f:
+            index = json.load(f)
+        self.input_size = index['input_size']
+        self.dtype = index['dtype']
+        self.paths = index['paths']
+        self._heatmaps = None
+        self._scales = None
+
+    @property
+    def index_file(self):
+        return os.path.join(self.root, 'index.json')
+
+    @property
+    def heatmaps_file(self):
+        return os.path.join(self.root, 'heatmaps.npy')
+
+    @property
+    def scales_file(self):
+        return os.path.join(self.root, 'scales.npy')
+
+    def _open(self):
+        # copy-on-write keeps the array writable for torch.from_numpy
+        # without ever touching the file on disk
+        self._heatmaps = np.load(self.heatmaps_file, mmap_mode='c')
+        if self.dtype == 'uint8':
+            self._scales = np.load(self.scales_file)
+
+    def check_samples(self, root, samples):
+        """Checks that the store was built for ``samples`` of the dataset at ``root``."""
+        if len(samples) != len(self.paths):
+            return False
+        for (path, _), stored in zip(samples, self.paths):
+            if os.path.relpath(path, root) != stored:
+                return False
+        return True
+
+    def __getitem__(self, index):
+        """
+        Args:
+            index (int): Index of the sample in the dataset the store was built from.
+
+        Returns:
+            Tensor: Heatmaps of size (4, input_size, input_size).
+        """
+        if self._heatmaps is None:
+            self._open()
+        heatmap = torch.from_numpy(self._heatmaps[index])
+        if self.dtype == 'uint8':
+            scale = torch.from_numpy(self._scales[index])
+            heatmap = heatmap.float().mul_(scale[:, None, None] / 255)
+        return heatmap
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_heatmaps'] = None
+        state['_scales'] = None
+        return state
+
+
+def build_heatmap_store(dataset, root, dtype='float16'):
+    """Precomputes the heatmaps of a ``DatasetFolder`` into a :class:`HeatmapStore`.
+
+    Every sample is run once through ``dataset.get_heatmap`` and the resized,
+    flipped 4-channel result is written to row ``index`` of a memory-mapped
+    array, so it can later be passed as ``heatmap_store`` to the dataset.
+
+    Args:
+        dataset (DatasetFolder): Dataset created with one of the ``with_heatmap`` modes.
+        root (string): Directory to write the store into.
+        dtype (string, optional): ``'float16'`` or ``'uint8'``. With ``'uint8'``
+            every heatmap channel is quantized against its own maximum, which
+            requires the heatmaps to be non-negative.
+
+    Returns:
+        HeatmapStore: The store that was written.
+    """
+    if dtype not in HEATMAP_STORE_DTYPES:
+        raise ValueError("Invalid dtype '{}'. Options are {}".format(dtype, HEATMAP_STORE_DTYPES))
+    root = os.path.expanduser(root)
+    makedir_exist_ok(root)
+
+    size = dataset.input_size
+    shape = (len(dataset.samples), 4, size, size)
+    heatmaps = np.lib.format.open_memmap(os.path.join(root, 'heatmaps.npy'), mode='w+',
+                                         dtype=dtype, shape=shape)
+    scales = np.ones((len(dataset.samples), 4), dtype=np.float32)
+    paths = []
+    for index, (path, _) in enumerate(dataset.samples):
+        heatmap = dataset.get_heatmap(path, size).numpy()
+        if dtype == 'uint8':
+            if heatmap.min() < 0:
+                raise ValueError("Cannot quantize the negative heatmap of {} to uint8, use float16"
+                                 .format(path))
+            scale = heatmap.reshape(4, -1).max(axis=1)
+            scale[scale <= 0] = 1
+            scales[index] = scale
+            heatmap = np.rint(heatmap / scale[:, None, None] * 255)
+        heatmaps[index] = heatmap
+        paths.append(os.path.relpath(path, dataset.root))
+    heatmaps.flush()
+    del heatmaps
+
+    if dtype == 'uint8':
+        np.save(os.path.join(root, 'scales.npy'), scales)
+    with open(os.path.join(root, 'index.json'), 'w') as f:
+        json.dump({'input_size': size, 'dtype': dtype, 'paths': paths}, f)
+    return HeatmapStore(root)
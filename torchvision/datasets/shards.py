@@ -0,0 +1,160 @@
+import os
+import os.path
+import json
+import numpy as np
+import torch
+from PIL import Image
+
+from .vision import VisionDataset
+from .utils import makedir_exist_ok
+
+
+def _shard_file(root, shard):
+    return os.path.join(root, 'shard-{:05d}.npy'.format(shard))
+
+
+def _to_uint8_array(img):
+    if isinstance(img, torch.Tensor):
+        # CHW tensor to HWC
+        img = img.permute(1, 2, 0).numpy()
+    img = np.asarray(img)
+    if img.dtype != np.uint8:
+        raise TypeError('Transformed images should be uint8. Got {}'.format(img.dtype))
+    if img.ndim == 2:
+        img = img[:, :, None]
+    return img
+
+
+def build_image_shards(dataset, root, transform=None, shard_size=1024):
+    """Decodes the images of an ``ImageFolder`` once into :class:`ImageShards`.
+
+    Every sample is loaded with ``dataset.loader`` and passed through
+    ``transform``, which should be the deterministic prefix of the training
+    pipeline, e.g. ``transforms.Resize2(299)``. The resulting uint8 images are
+    written in sample order into ``.npy`` shards of ``shard_size`` images each.
+
+    Args:
+        dataset (DatasetFolder): Dataset to convert. Its own transforms are not applied.
+        root (string): Directory to write the shards into.
+        transform (callable, optional): A function/transform that takes in a loaded
+            image and returns a PIL Image or uint8 ``numpy.ndarray``. Every output
+            must have the same size.
+        shard_size (int, optional): Number of images per shard. Default: 1024.
+
+    Returns:
+        ImageShards: The dataset that was written.
+    """
+    root = os.path.expanduser(root)
+    makedir_exist_ok(root)
+
+    num_samples = len(dataset.samples)
+    shape = None
+    shard = None
+    for index, (path, _) in enumerate(dataset.samples):
+        img = dataset.loader(path)
+        if transform is not None:
+            img = transform(img)
+        img = _to_uint8_array(img)
+        if shape is None:
+            shape = img.shape
+        elif img.shape != shape:
+            raise ValueError('All images should have the same size after transform. '
+                             'Got {} for {}, expected {}'.format(img.shape, path, shape))
+        if index % shard_size == 0:
+            if shard is not None:
+                shard.flush()
+            count = min(shard_size, num_samples - index)
+            shard = np.lib.format.open_memmap(_shard_file(root, index // shard_size), mode='w+',
+                                              dtype=np.uint8, shape=(count,) + shape)
+        shard[index % shard_size] = img
+    if shard is not None:
+        shard.flush()
+    del shard
+
+    np.save(os.path.join(root, 'targets.npy'), np.array([s[1] for s in dataset.samples], dtype=np.int64))
+    with open(os.path.join(root, 'index.json'), 'w') as f:
+        json.dump({'shape': list(shape), 'shard_size': shard_size, 'num_samples': num_samples,
+                   'classes': dataset.classes, 'class_to_idx': dataset.class_to_idx,
+                   'paths': [os.path.relpath(s[0], dataset.root) for s in dataset.samples]}, f)
+    return ImageShards(root)
+
+
+class ImageShards(VisionDataset):
+    """Images preprocessed into uint8 shards by :func:`build_image_shards`.
+
+    The shards are memory-mapped on first access, so a sample is a slice of
+    the page cache instead of a decoded and resized JPEG. The mappings are
+    reopened lazily after pickling, which keeps DataLoader workers from
+    copying them.
+
+    Args:
+        root (string): Directory written by :func:`build_image_shards`.
+        transform (callable, optional): A function/transform that takes in an
+            (H x W x C) uint8 ``numpy.ndarray``, or a PIL Image if ``to_pil`` is
+            True, and returns a transformed version. E.g, ``transforms.RandomCrop``
+        target_transform (callable, optional): A function/transform that takes in the
+            target and transforms it.
+        to_pil (bool, optional): If True, samples are converted to PIL Images before
+            ``transform``, for transforms that only support PIL. Default: False.
+
+     Attributes:
+        classes (list): List of the class names.
+        class_to_idx (dict): Dict with items (class_name, class_index).
+        paths (list): Sample paths, relative to the original dataset root.
+        targets (numpy.ndarray): The class_index value for each image in the dataset
+    """
+
+    def __init__(self, root, transform=None, target_transform=None, to_pil=False):
+        super(ImageShards, self).__init__(root, transform=transform, target_transform=target_transform)
+        with open(os.path.join(self.root, 'index.json'), 'r') as f:
+            index = json.load(f)
+        self.shape = tuple(index['shape'])
+        self.shard_size = index['shard_size']
+        self.classes = index['classes']
+        self.class_to_idx = index['class_to_idx']
+        self.paths = index['paths']
+        self.targets = np.load(os.path.join(self.root, 'targets.npy'))
+        self.to_pil = to_pil
+        self._shards = None
+
+    def _open(self):
+        num_shards = (len(self.paths) + self.shard_size - 1) // self.shard_size
+        # copy-on-write keeps samples writable for in-place transforms
+        # without ever touching the files on disk
+        self._shards = [np.load(_shard_file(self.root, shard), mmap_mode='c') for shard in range(num_shards)]
+
+    def __getitem__(self, index):
+        """
+        Args:
+            index (int): Index
+
+        Returns:
+            tuple: (sample, target) where target is class_index of the target class.
+        """
+        if self._shards is None:
+            self._open()
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('index {} is out of range'.format(index))
+        sample = self._shards[index // self.shard_size][index % self.shard_size]
+        target = int(self.targets[index])
+        if self.to_pil:
+            sample = Image.fromarray(sample[:, :, 0] if sample.shape[2] == 1 else sample)
+        if self.transform is not None:
+            sample = self.transform(sample)
+        if self.target_transform is not None:
+            target = self.target_transform(target)
+        return sample, target
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = None
+        return state
+
+    def extra_repr(self):
+        return "Image shape: {}".format(self.shape)
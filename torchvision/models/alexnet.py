@@ -1,5 +1,6 @@
+import torch
 import torch.nn as nn
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained
 
 
 __all__ = ['AlexNet', 'alexnet']
@@ -43,7 +44,7 @@ class AlexNet(nn.Module):
     def forward(self, x):
         x = self.features(x)
         x = self.avgpool(x)
-        x = x.view(x.size(0), 256 * 6 * 6)
+        x = torch.flatten(x, 1)
         x = self.classifier(x)
         return x
 
@@ -58,7 +59,5 @@ def alexnet(pretrained=False, progress=True, **kwargs):
     """
     model = AlexNet(**kwargs)
     if pretrained:
-        state_dict = load_state_dict_from_url(model_urls['alexnet'],
-                                              progress=progress)
-        model.load_state_dict(state_dict)
+        load_pretrained(model, model_urls['alexnet'], progress)
     return model
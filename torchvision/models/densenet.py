@@ -2,7 +2,7 @@ import re
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained, checkpoint_module
 from collections import OrderedDict
 
 __all__ = ['DenseNet', 'densenet121', 'densenet169', 'densenet201', 'densenet161']
@@ -15,8 +15,8 @@ model_urls = {
 }
 
 
-class _DenseLayer(nn.Sequential):
-    def __init__(self, num_input_features, growth_rate, bn_size, drop_rate):
+class _DenseLayer(nn.Module):
+    def __init__(self, num_input_features, growth_rate, bn_size, drop_rate, memory_efficient=False):
         super(_DenseLayer, self).__init__()
         self.add_module('norm1', nn.BatchNorm2d(num_input_features)),
         self.add_module('relu1', nn.ReLU(inplace=True)),
@@ -29,23 +29,46 @@ class _DenseLayer(nn.Sequential):
                                            kernel_size=3, stride=1, padding=1,
                                            bias=False)),
         self.drop_rate = drop_rate
-
-    def forward(self, x):
-        new_features = super(_DenseLayer, self).forward(x)
+        self.memory_efficient = memory_efficient
+
+    def bn_function(self, *prev_features):
+        concated_features = torch.cat(prev_features, 1)
+        return self.conv1(self.relu1(self.norm1(concated_features)))
+
+    def forward(self, prev_features):
+        if isinstance(prev_features, torch.Tensor):
+            prev_features = [prev_features]
+        if self.memory_efficient:
+            # the concatenation and its normalized copy are the only
+            # activations that grow with the depth of the block, so they are
+            # recomputed in the backward pass instead of stored
+            bottleneck_output = checkpoint_module(self.bn_function, *prev_features)
+        else:
+            bottleneck_output = self.bn_function(*prev_features)
+        new_features = self.conv2(self.relu2(self.norm2(bottleneck_output)))
         if self.drop_rate > 0:
             new_features = F.dropout(new_features, p=self.drop_rate,
                                      training=self.training)
-        return torch.cat([x, new_features], 1)
+        return new_features
 
 
-class _DenseBlock(nn.Sequential):
-    def __init__(self, num_layers, num_input_features, bn_size, growth_rate, drop_rate):
+class _DenseBlock(nn.Module):
+    def __init__(self, num_layers, num_input_features, bn_size, growth_rate, drop_rate,
+                 memory_efficient=False):
         super(_DenseBlock, self).__init__()
         for i in range(num_layers):
             layer = _DenseLayer(num_input_features + i * growth_rate, growth_rate,
-                                bn_size, drop_rate)
+                                bn_size, drop_rate, memory_efficient)
             self.add_module('denselayer%d' % (i + 1), layer)
 
+    def forward(self, init_features):
+        # every layer reads the outputs of all the previous ones, which are
+        # only concatenated once at the end of the block
+        features = [init_features]
+        for layer in self.children():
+            features.append(layer(features))
+        return torch.cat(features, 1)
+
 
 class _Transition(nn.Sequential):
     def __init__(self, num_input_features, num_output_features):
@@ -69,12 +92,19 @@ class DenseNet(nn.Module):
           (i.e. bn_size * k features in the bottleneck layer)
         drop_rate (float) - dropout rate after each dense layer
         num_classes (int) - number of classification classes
+        checkpoint (bool) - recompute the activations inside each dense block in the backward
+          pass instead of storing them, see :func:`~torchvision.models.utils.checkpoint_module`
+        memory_efficient (bool) - recompute the concatenation and first batch norm of every
+          dense layer in the backward pass, which makes the memory of a dense block grow
+          linearly instead of quadratically with its depth
     """
 
     def __init__(self, growth_rate=32, block_config=(6, 12, 24, 16),
-                 num_init_features=64, bn_size=4, drop_rate=0, num_classes=1000):
+                 num_init_features=64, bn_size=4, drop_rate=0, num_classes=1000, checkpoint=False,
+                 memory_efficient=False):
 
         super(DenseNet, self).__init__()
+        self.checkpoint = checkpoint
 
         # First convolution
         self.features = nn.Sequential(OrderedDict([
@@ -90,7 +120,7 @@ class DenseNet(nn.Module):
         for i, num_layers in enumerate(block_config):
             block = _DenseBlock(num_layers=num_layers, num_input_features=num_features,
                                 bn_size=bn_size, growth_rate=growth_rate,
-                                drop_rate=drop_rate)
+                                drop_rate=drop_rate, memory_efficient=memory_efficient)
             self.features.add_module('denseblock%d' % (i + 1), block)
             num_features = num_features + num_layers * growth_rate
             if i != len(block_config) - 1:
@@ -116,7 +146,15 @@ class DenseNet(nn.Module):
                 nn.init.constant_(m.bias, 0)
 
     def forward(self, x):
-        features = self.features(x)
+        if self.checkpoint:
+            features = x
+            for module in self.features:
+                if isinstance(module, _DenseBlock):
+                    features = checkpoint_module(module, features)
+                else:
+                    features = module(features)
+        else:
+            features = self.features(x)
         out = F.relu(features, inplace=True)
         out = F.adaptive_avg_pool2d(out, (1, 1)).view(features.size(0), -1)
         out = self.classifier(out)
@@ -131,14 +169,11 @@ def _load_state_dict(model, model_url, progress):
     pattern = re.compile(
         r'^(.*denselayer\d+\.(?:norm|relu|conv))\.((?:[12])\.(?:weight|bias|running_mean|running_var))$')
 
-    state_dict = load_state_dict_from_url(model_url, progress=progress)
-    for key in list(state_dict.keys()):
+    def rename(key):
         res = pattern.match(key)
-        if res:
-            new_key = res.group(1) + res.group(2)
-            state_dict[new_key] = state_dict[key]
-            del state_dict[key]
-    model.load_state_dict(state_dict)
+        return res.group(1) + res.group(2) if res else key
+
+    return load_pretrained(model, model_url, progress, rename=rename)
 
 
 def _densenet(arch, growth_rate, block_config, num_init_features, pretrained, progress,
@@ -156,6 +191,8 @@ def densenet121(pretrained=False, progress=True, **kwargs):
     Args:
         pretrained (bool): If True, returns a model pre-trained on ImageNet
         progress (bool): If True, displays a progress bar of the download to stderr
+        memory_efficient (bool): If True, recomputes the concatenated features of every
+          dense layer in the backward pass instead of storing them, see :class:`DenseNet`
     """
     return _densenet('densenet121', 32, (6, 12, 24, 16), 64, pretrained, progress,
                      **kwargs)
@@ -168,6 +205,8 @@ def densenet161(pretrained=False, progress=True, **kwargs):
     Args:
         pretrained (bool): If True, returns a model pre-trained on ImageNet
         progress (bool): If True, displays a progress bar of the download to stderr
+        memory_efficient (bool): If True, recomputes the concatenated features of every
+          dense layer in the backward pass instead of storing them, see :class:`DenseNet`
     """
     return _densenet('densenet161', 48, (6, 12, 36, 24), 96, pretrained, progress,
                      **kwargs)
@@ -180,6 +219,8 @@ def densenet169(pretrained=False, progress=True, **kwargs):
     Args:
         pretrained (bool): If True, returns a model pre-trained on ImageNet
         progress (bool): If True, displays a progress bar of the download to stderr
+        memory_efficient (bool): If True, recomputes the concatenated features of every
+          dense layer in the backward pass instead of storing them, see :class:`DenseNet`
     """
     return _densenet('densenet169', 32, (6, 12, 32, 32), 64, pretrained, progress,
                      **kwargs)
@@ -192,6 +233,8 @@ def densenet201(pretrained=False, progress=True, **kwargs):
     Args:
         pretrained (bool): If True, returns a model pre-trained on ImageNet
         progress (bool): If True, displays a progress bar of the download to stderr
+        memory_efficient (bool): If True, recomputes the concatenated features of every
+          dense layer in the backward pass instead of storing them, see :class:`DenseNet`
     """
     return _densenet('densenet201', 32, (6, 12, 48, 32), 64, pretrained, progress,
                      **kwargs)
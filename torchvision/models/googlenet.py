@@ -3,7 +3,7 @@ from collections import namedtuple
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained, truncated_normal_
 
 __all__ = ['GoogLeNet', 'googlenet']
 
@@ -39,9 +39,7 @@ def googlenet(pretrained=False, progress=True, **kwargs):
         kwargs['aux_logits'] = True
         kwargs['init_weights'] = False
         model = GoogLeNet(**kwargs)
-        state_dict = load_state_dict_from_url(model_urls['googlenet'],
-                                              progress=progress)
-        model.load_state_dict(state_dict)
+        load_pretrained(model, model_urls['googlenet'], progress)
         if not original_aux_logits:
             model.aux_logits = False
             del model.aux1, model.aux2
@@ -91,12 +89,7 @@ class GoogLeNet(nn.Module):
     def _initialize_weights(self):
         for m in self.modules():
             if isinstance(m, nn.Conv2d) or isinstance(m, nn.Linear):
-                import scipy.stats as stats
-                X = stats.truncnorm(-2, 2, scale=0.01)
-                values = torch.as_tensor(X.rvs(m.weight.numel()), dtype=m.weight.dtype)
-                values = values.view(m.weight.size())
-                with torch.no_grad():
-                    m.weight.copy_(values)
+                truncated_normal_(m.weight, std=0.01)
             elif isinstance(m, nn.BatchNorm2d):
                 nn.init.constant_(m.weight, 1)
                 nn.init.constant_(m.bias, 0)
@@ -2,7 +2,9 @@ from collections import namedtuple
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained, checkpoint_module, fold_normalization, multiscale_conv2d, \
+    truncated_normal_
+from .tiling import receptive_field, tiled_forward
 
 
 __all__ = ['Inception3', 'inception_v3','inception_v3_wide']
@@ -31,6 +33,12 @@ def inception_v3(pretrained=False, progress=True, **kwargs):
             Default: *True*
         transform_input (bool): If True, preprocesses the input according to the method with which it
             was trained on ImageNet. Default: *False*
+        tile_size (int): If set, the layers before ``Mixed_5b`` are evaluated on tiles of this many
+            input pixels in eval mode, see :func:`~torchvision.models.tiling.tiled_forward`.
+            Default: *None*
+        checkpoint (bool): If True, the activations inside the ``Mixed_*`` blocks are recomputed
+            in the backward pass instead of being stored, see
+            :func:`~torchvision.models.utils.checkpoint_module`. Default: *False*
     """
     if pretrained:
         if 'transform_input' not in kwargs:
@@ -40,13 +48,12 @@ def inception_v3(pretrained=False, progress=True, **kwargs):
             kwargs['aux_logits'] = True
         else:
             original_aux_logits = True
+        # only the layers missing from the checkpoint need their initialization
+        kwargs['init_weights'] = False
         model = Inception3(**kwargs)
-        state_dict = load_state_dict_from_url(model_urls['inception_v3_google'],
-                                              progress=progress)
-        model_dict=model.state_dict()
-        pretrained_dict = {k: v for k, v in state_dict.items() if not('Conv2d_1a_3x3' in k or 'deephead' in k)}
-        model_dict.update(pretrained_dict)
-        model.load_state_dict(model_dict)
+        result = load_pretrained(model, model_urls['inception_v3_google'], progress,
+                                 skip=lambda k: 'Conv2d_1a_3x3' in k or 'deephead' in k, strict=False)
+        model._initialize_weights(skip=set(model.state_dict()) - set(result.missing_keys))
         if not original_aux_logits:
             model.aux_logits = False
             del model.AuxLogits
@@ -69,6 +76,12 @@ def inception_v3_wide(pretrained=False, progress=True, **kwargs):
             Default: *True*
         transform_input (bool): If True, preprocesses the input according to the method with which it
             was trained on ImageNet. Default: *False*
+        tile_size (int): If set, the layers before ``Mixed_5b`` are evaluated on tiles of this many
+            input pixels in eval mode, see :func:`~torchvision.models.tiling.tiled_forward`.
+            Default: *None*
+        checkpoint (bool): If True, the activations inside the ``Mixed_*`` blocks are recomputed
+            in the backward pass instead of being stored, see
+            :func:`~torchvision.models.utils.checkpoint_module`. Default: *False*
     """
     if pretrained:
         if 'transform_input' not in kwargs:
@@ -78,13 +91,12 @@ def inception_v3_wide(pretrained=False, progress=True, **kwargs):
             kwargs['aux_logits'] = True
         else:
             original_aux_logits = True
+        # only the layers missing from the checkpoint need their initialization
+        kwargs['init_weights'] = False
         model = Inception3(**kwargs)
-        state_dict = load_state_dict_from_url(model_urls['inception_v3_google'],
-                                              progress=progress)
-        model_dict=model.state_dict()
-        pretrained_dict = {k: v for k, v in state_dict.items() if not('Conv2d_1a_3x3' in k)}
-        model_dict.update(pretrained_dict)
-        model.load_state_dict(model_dict)
+        result = load_pretrained(model, model_urls['inception_v3_google'], progress,
+                                 skip=lambda k: 'Conv2d_1a_3x3' in k, strict=False)
+        model._initialize_weights(skip=set(model.state_dict()) - set(result.missing_keys))
         if not original_aux_logits:
             model.aux_logits = False
             del model.AuxLogits
@@ -96,7 +108,8 @@ class Inception3(nn.Module):
 
     def __init__(self, num_classes=1000, aux_logits=True, transform_input=False,
                             wide = False,wider = False,wide2=False,wider2=False,bigger_wider = False,
-                            with_heatmap=False,with_heatmap_v2=False,with_deephead_v1=False,with_deephead_v2=False):
+                            with_heatmap=False,with_heatmap_v2=False,with_deephead_v1=False,with_deephead_v2=False,
+                            tile_size=None, checkpoint=False, init_weights=True):
         super(Inception3, self).__init__()
         self.with_deephead_v1 = with_deephead_v1
         self.with_deephead_v2 = with_deephead_v2
@@ -109,6 +122,16 @@ class Inception3(nn.Module):
         self.bigger_wider = bigger_wider
         self.with_heatmap = with_heatmap
         self.with_heatmap_v2 = with_heatmap_v2
+        self.input_folded = False
+        self.tile_size = tile_size
+        self._stem_field = None
+        self.checkpoint = checkpoint
+        if with_heatmap:
+            self.input_channels = 7
+        elif with_heatmap_v2:
+            self.input_channels = 15
+        else:
+            self.input_channels = 3
         if bigger_wider:
             self.Conv2d_1a_3x3a = BasicConv2d(3, 32, kernel_size=21, stride=10,padding = 10)
             self.Conv2d_1a_3x3b = BasicConv2d(3, 32, kernel_size=41, stride=10,padding = 20)
@@ -151,60 +174,70 @@ class Inception3(nn.Module):
             self.deephead = Deephead_v2(2048)
         self.fc = nn.Linear(2048, num_classes)
 
-        for m in self.modules():
+        if init_weights:
+            self._initialize_weights()
+
+    def _initialize_weights(self, skip=()):
+        # modules whose weight is in `skip` keep their current parameters
+        for name, m in self.named_modules():
+            if name + '.weight' in skip:
+                continue
             if isinstance(m, nn.Conv2d) or isinstance(m, nn.Linear):
-                import scipy.stats as stats
                 stddev = m.stddev if hasattr(m, 'stddev') else 0.1
-                X = stats.truncnorm(-2, 2, scale=stddev)
-                values = torch.as_tensor(X.rvs(m.weight.numel()), dtype=m.weight.dtype)
-                values = values.view(m.weight.size())
-                with torch.no_grad():
-                    m.weight.copy_(values)
+                truncated_normal_(m.weight, std=stddev)
             elif isinstance(m, nn.BatchNorm2d):
                 nn.init.constant_(m.weight, 1)
                 nn.init.constant_(m.bias, 0)
 
-    def forward(self, x):
-        '''
-        if self.transform_input:
-            x_ch0 = torch.unsqueeze(x[:, 0], 1) * (0.229 / 0.5) + (0.485 - 0.5) / 0.5
-            x_ch1 = torch.unsqueeze(x[:, 1], 1) * (0.224 / 0.5) + (0.456 - 0.5) / 0.5
-            x_ch2 = torch.unsqueeze(x[:, 2], 1) * (0.225 / 0.5) + (0.406 - 0.5) / 0.5
-            x = torch.cat((x_ch0, x_ch1, x_ch2), 1)
-        '''
-        if self.with_heatmap:
-            #print(x.size())
-            x_ch0 = torch.unsqueeze(x[:, 0], 1) / 0.5 - 1
-            x_ch1 = torch.unsqueeze(x[:, 1], 1) / 0.5 - 1
-            x_ch2 = torch.unsqueeze(x[:, 2], 1) / 0.5 - 1
-            x_ch3 = torch.unsqueeze(x[:, 3], 1) / 0.5 - 1
-            x_ch4 = torch.unsqueeze(x[:, 4], 1) / 0.5 - 1
-            x_ch5 = torch.unsqueeze(x[:, 5], 1) / 0.5 - 1
-            x_ch6 = torch.unsqueeze(x[:, 6], 1) / 0.5 - 1
-            x = torch.cat((x_ch0, x_ch1, x_ch2,x_ch3,x_ch4,x_ch5,x_ch6), 1) 
-        elif self.with_heatmap_v2:
-
-            #x = x[:,0:4]+x[:,0:4]*x[:,4]+x[:,0:4]*x[:,5]+x[:,0:4]*x[:,6]
-            #print(x.size())
-            x_ch0 = torch.unsqueeze(x[:, 0], 1) / 0.5 - 1
-            for i in range(1,15):
-                x_ch = torch.unsqueeze(x[:, i], 1) / 0.5 - 1
-                if i==1:
-                    temp_x = torch.cat((x_ch0,x_ch),1)
-                else:
-                    temp_x = torch.cat((temp_x,x_ch),1)
-
-            x = temp_x   
+    def fold_input_transform(self, max_value=1.):
+        """Folds the ``x / 0.5 - 1`` input rescaling of ``forward`` into the stem.
+
+        After this the model takes images in ``[0, max_value]`` as they come
+        out of ``ToTensor`` (``max_value=1``) or ``ToByteTensor`` cast to float
+        (``max_value=255``), and no normalization is left to the data loading
+        workers or to ``forward``. Call it once the weights are loaded; the
+        flag is not part of the ``state_dict``.
+
+        Only the unpadded ``3x3`` stems can be folded exactly, so the ``wide``
+        variants raise a ``ValueError``.
+
+        Args:
+            max_value (float, optional): Value of a white pixel in the input.
+                Default: 1.
+
+        Returns:
+            Inception3: The model itself.
+        """
+        if self.input_folded:
+            raise RuntimeError('The input transform is already folded into the stem')
+        if self.with_heatmap or self.with_heatmap_v2:
+            stem = self.Conv2d_1a_3x3_with_heatmap
+        elif isinstance(getattr(self, 'Conv2d_1a_3x3', None), BasicConv2d):
+            stem = self.Conv2d_1a_3x3
         else:
-            x_ch0 = torch.unsqueeze(x[:, 0], 1) / 0.5 - 1
-            x_ch1 = torch.unsqueeze(x[:, 1], 1) / 0.5 - 1
-            x_ch2 = torch.unsqueeze(x[:, 2], 1) / 0.5 - 1
-            x = torch.cat((x_ch0, x_ch1, x_ch2), 1)           
+            raise ValueError('Only the 3x3 stems can be folded, their input is not padded')
+        fold_normalization(stem.conv, 0.5 * max_value, 0.5 * max_value, bn=stem.bn)
+        self.input_folded = True
+        return self
+
+    def _run_block(self, block, x):
+        if self.checkpoint:
+            return checkpoint_module(block, x)
+        return block(x)
+
+    def _forward_stem(self, x):
+        # the layers before Mixed_5b, which run at the highest resolution
+        x = x[:, :self.input_channels]
+        if not self.input_folded:
+            # rescale from [0, 1] to [-1, 1] in one pass over all channels
+            x = torch.mul(x, 2.).sub_(1.)
         # N x 3 x 299 x 299
         if self.wider or self.bigger_wider:
-            x1 = self.Conv2d_1a_3x3a(x)
-            x2 = self.Conv2d_1a_3x3b(x)
-            x3 = self.Conv2d_1a_3x3c(x)
+            stem = (self.Conv2d_1a_3x3a, self.Conv2d_1a_3x3b, self.Conv2d_1a_3x3c)
+            # one merged convolution for the three kernel sizes, split along
+            # the channels before each branch's batch norm
+            x1, x2, x3 = [F.relu(m.bn(out), inplace=True)
+                          for m, out in zip(stem, multiscale_conv2d(x, [m.conv for m in stem]))]
             x = x1+x2+x3
         elif self.with_heatmap or self.with_heatmap_v2:
             x = self.Conv2d_1a_3x3_with_heatmap(x)
@@ -223,30 +256,48 @@ class Inception3(nn.Module):
         # N x 192 x 71 x 71
         x = F.max_pool2d(x, kernel_size=3, stride=2)
         # N x 192 x 35 x 35
-        x = self.Mixed_5b(x)
+        return x
+
+    def forward(self, x):
+        '''
+        if self.transform_input:
+            x_ch0 = torch.unsqueeze(x[:, 0], 1) * (0.229 / 0.5) + (0.485 - 0.5) / 0.5
+            x_ch1 = torch.unsqueeze(x[:, 1], 1) * (0.224 / 0.5) + (0.456 - 0.5) / 0.5
+            x_ch2 = torch.unsqueeze(x[:, 2], 1) * (0.225 / 0.5) + (0.406 - 0.5) / 0.5
+            x = torch.cat((x_ch0, x_ch1, x_ch2), 1)
+        '''
+        if self.tile_size is not None and not self.training:
+            if self._stem_field is None:
+                self._stem_field = receptive_field(self._forward_stem, self.input_channels, dtype=x.dtype,
+                                                    device=x.device)
+            x = tiled_forward(self._forward_stem, x, self.tile_size, self._stem_field)
+        else:
+            x = self._forward_stem(x)
+        # N x 192 x 35 x 35
+        x = self._run_block(self.Mixed_5b, x)
         # N x 256 x 35 x 35
-        x = self.Mixed_5c(x)
+        x = self._run_block(self.Mixed_5c, x)
         # N x 288 x 35 x 35
-        x = self.Mixed_5d(x)
+        x = self._run_block(self.Mixed_5d, x)
         # N x 288 x 35 x 35
-        x = self.Mixed_6a(x)
+        x = self._run_block(self.Mixed_6a, x)
         # N x 768 x 17 x 17
-        x = self.Mixed_6b(x)
+        x = self._run_block(self.Mixed_6b, x)
         # N x 768 x 17 x 17
-        x = self.Mixed_6c(x)
+        x = self._run_block(self.Mixed_6c, x)
         # N x 768 x 17 x 17
-        x = self.Mixed_6d(x)
+        x = self._run_block(self.Mixed_6d, x)
         # N x 768 x 17 x 17
-        x = self.Mixed_6e(x)
+        x = self._run_block(self.Mixed_6e, x)
         # N x 768 x 17 x 17
         if self.training and self.aux_logits:
             aux = self.AuxLogits(x)
         # N x 768 x 17 x 17
-        x = self.Mixed_7a(x)
+        x = self._run_block(self.Mixed_7a, x)
         # N x 1280 x 8 x 8
-        x = self.Mixed_7b(x)
+        x = self._run_block(self.Mixed_7b, x)
         # N x 2048 x 8 x 8
-        x = self.Mixed_7c(x)
+        x = self._run_block(self.Mixed_7c, x)
         # N x 2048 x 8 x 8
         # Adaptive average pooling
         if self.with_deephead_v1 or self.with_deephead_v2:
@@ -482,6 +533,8 @@ class BasicConv2d_wide2(nn.Module):
         x = self.bn(x)
         return F.relu(x, inplace=True)
 class BasicConv2d_wider2(nn.Module):
+    # forward sums these before the batch norm, see models.utils.fuse_conv_bn
+    _summed_convs = ('conv1', 'conv2', 'conv3')
 
     def __init__(self, in_channels, out_channels, **kwargs):
         super(BasicConv2d_wider2, self).__init__()
@@ -491,10 +544,7 @@ class BasicConv2d_wider2(nn.Module):
         self.bn = nn.BatchNorm2d(out_channels, eps=0.001)
 
     def forward(self, x):
-        x1 = self.conv1(x)
-        x2 = self.conv2(x)
-        x3 = self.conv3(x)
-        x = x1+x2+x3
+        x = multiscale_conv2d(x, (self.conv1, self.conv2, self.conv3), summed=True)
         x = self.bn(x)
         return F.relu(x, inplace=True)
 
@@ -1,8 +1,7 @@
 import torch.nn as nn
-import torch.utils.model_zoo as model_zoo
 import torch
 import torch.nn.functional as F
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained
 from collections import namedtuple
 __all__ = ['InceptionV4', 'inceptionv4']
 
@@ -315,13 +314,8 @@ def inceptionv4(num_classes = 1001,pretrained=False,aux_logits = True):
     model = InceptionV4(num_classes = num_classes,aux_logits = aux_logits)
     if pretrained:
         if num_classes==1001:
-            model.load_state_dict(model_zoo.load_url(model_urls['inceptionv4']))
+            load_pretrained(model, model_urls['inceptionv4'])
         else:
-            state_dict = load_state_dict_from_url(model_urls['inceptionv4'],
-                                                progress=True)
-            model_dict=model.state_dict()
-            pretrained_dict = {k: v for k, v in state_dict.items() if not('classif' in k)}
-            model_dict.update(pretrained_dict)
-            model.load_state_dict(model_dict)
+            load_pretrained(model, model_urls['inceptionv4'], skip=lambda k: 'classif' in k, strict=False)
     return model
 
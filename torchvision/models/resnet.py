@@ -1,5 +1,6 @@
 import torch.nn as nn
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained, checkpoint_module, multiscale_conv2d
+from .tiling import receptive_field, tiled_forward
 import torch
 
 __all__ = ['ResNet', 'resnet18', 'resnet34', 'resnet50', 'resnet101',
@@ -115,10 +116,12 @@ class Bottleneck(nn.Module):
 
 
 class ResNet(nn.Module):
+    # the wider stem sums these before bn1, see models.utils.fuse_conv_bn
+    _summed_convs = ('conv1a', 'conv1b', 'conv1c')
 
     def __init__(self, block, layers, num_classes=1000, zero_init_residual=False,
                  groups=1, width_per_group=64, replace_stride_with_dilation=None,
-                 norm_layer=None,large_size_input = False,wider = False):
+                 norm_layer=None,large_size_input = False,wider = False,tile_size=None,checkpoint=False):
         super(ResNet, self).__init__()
         if norm_layer is None:
             norm_layer = nn.BatchNorm2d
@@ -137,6 +140,9 @@ class ResNet(nn.Module):
         self.base_width = width_per_group
 
         self.wider = wider
+        self.tile_size = tile_size
+        self._stem_field = None
+        self.checkpoint = checkpoint
         if wider:
             self.conv1a = nn.Conv2d(3, self.inplanes, kernel_size=15, stride=5, padding=7,
                                bias=False)
@@ -207,26 +213,38 @@ class ResNet(nn.Module):
 
         return nn.Sequential(*layers)
 
-    def forward(self, x):
+    def _run_block(self, block, x):
+        if self.checkpoint:
+            return checkpoint_module(block, x)
+        return block(x)
+
+    def _forward_stem(self, x):
+        # the layers up to layer2, which run at the highest resolution
         x_ch0 = torch.unsqueeze(x[:, 0], 1) * (0.229 / 0.5) + (0.485 - 0.5) / 0.5
         x_ch1 = torch.unsqueeze(x[:, 1], 1) * (0.224 / 0.5) + (0.456 - 0.5) / 0.5
         x_ch2 = torch.unsqueeze(x[:, 2], 1) * (0.225 / 0.5) + (0.406 - 0.5) / 0.5
         x = torch.cat((x_ch0, x_ch1, x_ch2), 1)
         if self.wider:
-            x1 = self.conv1a(x)
-            x2 = self.conv1b(x)
-            x3 = self.conv1c(x)
-            x = x1+x2+x3
+            x = multiscale_conv2d(x, (self.conv1a, self.conv1b, self.conv1c), summed=True)
         else:
             x = self.conv1(x)
         x = self.bn1(x)
         x = self.relu(x)
         x = self.maxpool(x)
 
-        x = self.layer1(x)
-        x = self.layer2(x)
-        x = self.layer3(x)
-        x = self.layer4(x)
+        x = self._run_block(self.layer1, x)
+        x = self._run_block(self.layer2, x)
+        return x
+
+    def forward(self, x):
+        if self.tile_size is not None and not self.training:
+            if self._stem_field is None:
+                self._stem_field = receptive_field(self._forward_stem, dtype=x.dtype, device=x.device)
+            x = tiled_forward(self._forward_stem, x, self.tile_size, self._stem_field)
+        else:
+            x = self._forward_stem(x)
+        x = self._run_block(self.layer3, x)
+        x = self._run_block(self.layer4, x)
 
         x = self.avgpool(x)
         x = x.view(x.size(0), -1)
@@ -238,13 +256,8 @@ class ResNet(nn.Module):
 def _resnet(arch, inplanes, planes, pretrained, progress, **kwargs):
     model = ResNet(inplanes, planes, **kwargs)
     if pretrained:
-        state_dict = load_state_dict_from_url(model_urls[arch],
-                                              progress=progress)
-        model_dict=model.state_dict()
-        
-        pretrained_dict = {k: v for k, v in state_dict.items() if not('conv1' in k)}
-        model_dict.update(pretrained_dict)
-        model.load_state_dict(model_dict)
+        load_pretrained(model, model_urls[arch], progress,
+                        skip=lambda key: 'conv1' in key, strict=False)
     return model
 
 
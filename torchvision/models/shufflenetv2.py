@@ -2,6 +2,7 @@ import functools
 
 import torch
 import torch.nn as nn
+from .utils import load_pretrained
 
 __all__ = ['ShuffleNetV2', 'shufflenetv2',
            'shufflenetv2_x0_5', 'shufflenetv2_x1_0',
@@ -159,7 +160,7 @@ def shufflenetv2(pretrained=False, num_classes=1000, input_size=224, width_mult=
             raise ValueError('model {} is not support'.format(model_type))
         if model_url is None:
             raise NotImplementedError('pretrained {} is not supported'.format(model_type))
-        model.load_state_dict(torch.utils.model_zoo.load_url(model_url))
+        load_pretrained(model, model_url)
 
     return model
 
@@ -0,0 +1,321 @@
+import errno
+import hashlib
+import inspect
+import json
+import os
+import re
+import tempfile
+import zipfile
+import torch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from torch.hub import download_url_to_file
+except ImportError:
+    download_url_to_file = None
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+try:
+    _MMAP_SUPPORTED = 'mmap' in inspect.signature(torch.load).parameters
+except (AttributeError, ValueError):
+    _MMAP_SUPPORTED = False
+
+# checkpoint names end with the first digits of their sha256, as in torch.hub
+_HASH_PREFIX = re.compile(r'-([a-f0-9]*)\.')
+_HASH_SUFFIX = re.compile(r'-([a-f0-9]+)$')
+
+_weight_store = None
+
+
+def _checkpoint_name(url):
+    return os.path.basename(urlparse(url).path)
+
+
+def _converted_name_parts(name):
+    # 'resnet18-5c106cde.pth' -> ('resnet18.5c106cde-', 8, '.pth'): a copy
+    # converted to the zip format has other contents, so the digest of the
+    # source moves out of the place where torch.hub looks for it
+    stem, ext = os.path.splitext(name)
+    match = _HASH_SUFFIX.search(stem)
+    if match is None:
+        return stem + '-', 8, ext
+    return stem[:match.start()] + '.' + match.group(1) + '-', len(match.group(1)), ext
+
+
+def _converted_name(name, sha256):
+    prefix, digits, ext = _converted_name_parts(name)
+    return prefix + sha256[:digits] + ext
+
+
+def _find_converted(path):
+    prefix, digits, ext = _converted_name_parts(os.path.basename(path))
+    pattern = re.compile('{}[a-f0-9]{{{}}}{}$'.format(re.escape(prefix), digits, re.escape(ext)))
+    root = os.path.dirname(path) or '.'
+    for name in sorted(os.listdir(root)):
+        if pattern.match(name) and zipfile.is_zipfile(os.path.join(root, name)):
+            return os.path.join(root, name)
+    return None
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class _FileLock(object):
+    # advisory lock shared by every process on the machine; a no-op where
+    # fcntl is not available
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+def _save_as_zip(src, dst):
+    # the zip format is the one torch.load can memory-map
+    state_dict = torch.load(src, map_location='cpu')
+    torch.save(state_dict, dst)
+
+
+def _mmap_copy(path):
+    """Returns a checkpoint file equivalent to ``path`` that torch.load can memory-map.
+
+    That is ``path`` itself unless it was saved in the legacy format, in which
+    case a zip-format copy is written once next to it, leaving ``path``
+    untouched. The copy is named after its own sha256, as torch.hub names
+    checkpoints, e.g. ``resnet18.5c106cde-1a2b3c4d.pth`` for
+    ``resnet18-5c106cde.pth``. Several processes may ask for the same copy
+    at once: only the first one writes it, under a lock.
+    """
+    if not _MMAP_SUPPORTED or zipfile.is_zipfile(path):
+        return path
+    converted = _find_converted(path)
+    if converted is not None:
+        return converted
+    with _FileLock(path + '.lock'):
+        converted = _find_converted(path)
+        if converted is None:
+            fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path),
+                                            dir=os.path.dirname(path) or '.')
+            os.close(fd)
+            try:
+                _save_as_zip(path, tmp_path)
+                converted = os.path.join(os.path.dirname(path),
+                                         _converted_name(os.path.basename(path), _sha256(tmp_path)))
+                getattr(os, 'replace', os.rename)(tmp_path, converted)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    return converted
+
+
+class WeightStore(object):
+    """Directory of pretrained checkpoints with a precomputed hash index.
+
+    The store holds one file per checkpoint, named as in its URL, and an
+    ``index.json`` with the sha256 and size of every file, computed once
+    when it was added. Looking a checkpoint up only compares its size with
+    the index, so the many jobs started on a node can all memory-map the
+    same file from the page cache without reading it to hash it. Files are
+    stored in the zip serialization format so that they can be mapped; a
+    checkpoint converted from the legacy format is stored under a name with
+    the digest of the converted file instead of the one in its URL, e.g.
+    ``resnet18.5c106cde-1a2b3c4d.pth`` for ``resnet18-5c106cde.pth``.
+
+    Adding files is safe from several processes at once: every checkpoint
+    is written under a temporary name and renamed into place, and the index
+    is rewritten the same way while holding a lock.
+
+    Args:
+        root (string): Directory of the store. Created by :meth:`add` if needed.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        self._index = None
+        self._index_mtime = None
+
+    @property
+    def index_file(self):
+        return os.path.join(self.root, 'index.json')
+
+    def _read_index(self):
+        try:
+            mtime = os.path.getmtime(self.index_file)
+        except OSError:
+            return {}
+        if mtime != self._index_mtime:
+            with open(self.index_file, 'r') as f:
+                self._index = json.load(f)['files']
+            self._index_mtime = mtime
+        return self._index
+
+    def _makedirs(self):
+        try:
+            os.makedirs(self.root)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def get(self, url):
+        """Returns the path of the checkpoint of ``url`` in the store, or ``None``.
+
+        Args:
+            url (string): URL of the checkpoint, or just its file name.
+        """
+        name = _checkpoint_name(url)
+        entry = self._read_index().get(name)
+        if entry is None:
+            return None
+        path = os.path.join(self.root, entry.get('file', name))
+        if os.path.getsize(path) != entry['size']:
+            raise RuntimeError('{} does not match the size in {}, run verify() or add it again'
+                               .format(path, self.index_file))
+        return path
+
+    def __contains__(self, url):
+        return _checkpoint_name(url) in self._read_index()
+
+    def __len__(self):
+        return len(self._read_index())
+
+    def add(self, url, progress=True, check_hash=False):
+        """Adds a checkpoint to the store if it is not there yet.
+
+        Args:
+            url (string): URL to download the checkpoint from, or path to a local
+                copy of it (e.g. brought over to an air-gapped cluster).
+            progress (bool, optional): If True, displays a progress bar of the download to stderr.
+            check_hash (bool, optional): If True, checks that the sha256 of the download starts
+                with the digits after the last ``-`` of the file name, as ``torch.hub`` does.
+
+        Returns:
+            string: Path of the checkpoint in the store.
+        """
+        self._makedirs()
+        name = _checkpoint_name(url)
+        with _FileLock(os.path.join(self.root, '.' + name + '.lock')):
+            path = self.get(name)
+            if path is not None:
+                return path
+
+            fd, tmp_path = tempfile.mkstemp(prefix='.' + name, dir=self.root)
+            os.close(fd)
+            try:
+                if os.path.isfile(url):
+                    with open(url, 'rb') as src, open(tmp_path, 'wb') as dst:
+                        for chunk in iter(lambda: src.read(1 << 20), b''):
+                            dst.write(chunk)
+                else:
+                    match = _HASH_PREFIX.search(name) if check_hash else None
+                    download_url_to_file(url, tmp_path, match.group(1) if match else None,
+                                         progress=progress)
+                converted = _MMAP_SUPPORTED and not zipfile.is_zipfile(tmp_path)
+                if converted:
+                    _save_as_zip(tmp_path, tmp_path)
+                entry = {'sha256': _sha256(tmp_path), 'size': os.path.getsize(tmp_path)}
+                entry['file'] = _converted_name(name, entry['sha256']) if converted else name
+                path = os.path.join(self.root, entry['file'])
+                getattr(os, 'replace', os.rename)(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            with _FileLock(self.index_file + '.lock'):
+                self._index_mtime = None
+                index = dict(self._read_index())
+                index[name] = entry
+                fd, tmp_index = tempfile.mkstemp(prefix='.index', dir=self.root)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'files': index}, f, indent=1, sort_keys=True)
+                getattr(os, 'replace', os.rename)(tmp_index, self.index_file)
+        return path
+
+    def verify(self):
+        """Hashes every checkpoint again and returns the names of those that do not match the index."""
+        paths = [(name, os.path.join(self.root, entry.get('file', name)), entry)
+                 for name, entry in sorted(self._read_index().items())]
+        return [name for name, path, entry in paths
+                if not os.path.exists(path) or _sha256(path) != entry['sha256']]
+
+    def __repr__(self):
+        return '{}(root={!r}, checkpoints={})'.format(self.__class__.__name__, self.root, len(self))
+
+
+def pretrained_urls():
+    """Returns the checkpoint URLs of every pretrained model in this package."""
+    from . import alexnet, densenet, googlenet, inception, inceptionv4, resnet, shufflenetv2, squeezenet, vgg
+    urls = []
+    for module in (alexnet, densenet, googlenet, inception, inceptionv4, resnet, shufflenetv2, squeezenet, vgg):
+        for url in module.model_urls.values():
+            if url is not None and url not in urls:
+                urls.append(url)
+    return urls
+
+
+def build_weight_store(root, urls=None, progress=True, check_hash=False):
+    """Adds checkpoints to the :class:`WeightStore` at ``root``.
+
+    Args:
+        root (string): Directory of the store.
+        urls (sequence, optional): URLs or local paths of the checkpoints. Default: every
+            pretrained model in this package, see :func:`pretrained_urls`.
+        progress (bool, optional): If True, displays a progress bar of the downloads to stderr.
+        check_hash (bool, optional): If True, checks the downloads against the hash
+            prefix in their names, see :meth:`WeightStore.add`.
+
+    Returns:
+        WeightStore: The store.
+    """
+    store = WeightStore(root)
+    for url in (pretrained_urls() if urls is None else urls):
+        store.add(url, progress=progress, check_hash=check_hash)
+    return store
+
+
+def set_weight_store(store):
+    """Makes the ``pretrained=True`` builders load their checkpoints from ``store``.
+
+    Checkpoints missing from the store are downloaded to the torch hub cache
+    as before. The store can also be set with the ``TORCHVISION_WEIGHT_STORE``
+    environment variable, which reaches ``torch.hub.load`` and worker
+    processes too.
+
+    Args:
+        store (WeightStore or string): The store or its directory, or ``None`` to go back
+            to the environment variable.
+    """
+    global _weight_store
+    if store is not None and not isinstance(store, WeightStore):
+        store = WeightStore(store)
+    _weight_store = store
+
+
+def get_weight_store():
+    """Returns the :class:`WeightStore` checkpoints are loaded from, or ``None``."""
+    global _weight_store
+    if _weight_store is None and os.environ.get('TORCHVISION_WEIGHT_STORE'):
+        _weight_store = WeightStore(os.environ['TORCHVISION_WEIGHT_STORE'])
+    return _weight_store
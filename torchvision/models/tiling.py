@@ -0,0 +1,163 @@
+import torch
+from torch import nn
+
+
+def _probe_input(n, in_channels, length, width, axis, dtype, device):
+    shape = (n, in_channels, length, width) if axis == 0 else (n, in_channels, width, length)
+    return torch.zeros(shape, dtype=dtype, device=device)
+
+
+def _axis_field(fn, in_channels, length, width, axis, max_stride, dtype, device):
+    # the output length grows by one every `stride` input pixels
+    steps = []
+    previous = fn(_probe_input(1, in_channels, length, width, axis, dtype, device)).size(2 + axis)
+    for extra in range(1, 2 * max_stride + 1):
+        current = fn(_probe_input(1, in_channels, length + extra, width, axis, dtype, device)).size(2 + axis)
+        if current != previous:
+            steps.append(extra)
+            previous = current
+        if len(steps) == 2:
+            break
+    if len(steps) < 2:
+        raise ValueError('The stride of the module is larger than max_stride={}'.format(max_stride))
+    stride = steps[1] - steps[0]
+
+    # NaN rows (or columns) mark every output that depends on them, one
+    # probe for every position within a stride
+    centre = length // 2
+    x = _probe_input(stride, in_channels, length, width, axis, dtype, device)
+    for k in range(stride):
+        if axis == 0:
+            x[k, :, centre + k, :] = float('nan')
+        else:
+            x[k, :, :, centre + k] = float('nan')
+    affected = torch.isnan(fn(x)).any(dim=1).any(dim=2 if axis == 0 else 1)
+    first, last = None, None
+    for k in range(stride):
+        indices = affected[k].nonzero().view(-1)
+        if len(indices) == 0:
+            raise ValueError('The output of the module does not depend on its input')
+        low, high = indices.min().item(), indices.max().item()
+        if low == 0 or high == affected.size(1) - 1:
+            # the probe reaches the border, retry with a larger input
+            return None
+        position = centre + k
+        first = position - high * stride if first is None else min(first, position - high * stride)
+        last = position - low * stride if last is None else max(last, position - low * stride)
+    return stride, first, last
+
+
+def receptive_field(fn, in_channels=3, width=128, max_size=8192, max_stride=64, dtype=torch.float32,
+                    device=None):
+    """Measures which input pixels every output pixel of a convolutional trunk depends on.
+
+    The trunk is run on inputs with a row (or column) of NaNs, which spread
+    to every output that depends on them regardless of the weights. Batch
+    norms should be in eval mode.
+
+    Args:
+        fn (callable): Fully convolutional module or function taking (N, C, H, W) inputs.
+        in_channels (int, optional): Number of input channels. Default: 3.
+        width (int, optional): Size of the probe inputs along the other axis. Default: 128.
+        max_size (int, optional): Largest probe size tried before giving up. Default: 8192.
+        max_stride (int, optional): Largest total stride detected. Default: 64.
+        dtype (torch.dtype, optional): Dtype of the probe inputs. Default: ``torch.float32``.
+        device (torch.device, optional): Device of the probe inputs, that of ``fn``'s
+            parameters. Default: the CPU.
+
+    Returns:
+        tuple: ``((stride, first, last), (stride, first, last))`` for rows and
+        columns: output ``i`` depends on input ``[i * stride + first, i * stride + last]``.
+    """
+    with torch.no_grad():
+        fields = []
+        for axis in (0, 1):
+            length = max(width, 2 * max_stride)
+            field = None
+            while field is None:
+                if length > max_size:
+                    raise ValueError('The receptive field of the module is larger than '
+                                     'max_size={}, is it fully convolutional?'.format(max_size))
+                field = _axis_field(fn, in_channels, length, width, axis, max_stride, dtype, device)
+                length *= 2
+            fields.append(field)
+    return tuple(fields)
+
+
+def _tiles(length, tile_size, stride, first, last):
+    # (start, end) of every input crop, and the slice of its output that is kept
+    step = max(tile_size // stride, 1)
+    index = 0
+    while True:
+        start = max(0, (index * stride + first) // stride * stride)
+        end = (index + step - 1) * stride + last + 1
+        offset = index - start // stride
+        if end >= length:
+            yield start, length, slice(offset, None)
+            return
+        yield start, end, slice(offset, offset + step)
+        index += step
+
+
+def tiled_forward(fn, x, tile_size, field=None):
+    """Runs a convolutional trunk over overlapping tiles of ``x``.
+
+    Every tile is cropped with enough context around it for its outputs to
+    see the same input as they would in the whole image, and the crops
+    start on multiples of the trunk's stride, so the stitched result equals
+    ``fn(x)``. Only one tile's activations are alive at a time, so peak
+    memory scales with ``tile_size`` plus the receptive field instead of
+    with the image size.
+
+    Args:
+        fn (callable): Fully convolutional module or function, in eval mode.
+        x (Tensor): Input of size (N, C, H, W).
+        tile_size (int): Input pixels covered by the kept output of each tile,
+            rounded down to a multiple of the stride.
+        field (tuple, optional): Result of :func:`receptive_field` for ``fn``.
+            Measured on every call if not given.
+
+    Returns:
+        Tensor: The output of ``fn`` for the whole of ``x``.
+    """
+    if field is None:
+        field = receptive_field(fn, x.size(1), dtype=x.dtype, device=x.device)
+    rows = []
+    for row_start, row_end, row_slice in _tiles(x.size(2), tile_size, *field[0]):
+        cols = []
+        for col_start, col_end, col_slice in _tiles(x.size(3), tile_size, *field[1]):
+            out = fn(x[:, :, row_start:row_end, col_start:col_end])
+            cols.append(out[:, :, row_slice, col_slice])
+        rows.append(torch.cat(cols, 3))
+    return torch.cat(rows, 2)
+
+
+class TiledForward(nn.Module):
+    """Evaluates a fully convolutional module tile by tile, see :func:`tiled_forward`.
+
+    The receptive field is measured on the first call and reused. In
+    training mode the module is run on the whole input, since batch norms
+    would otherwise normalize every tile with its own statistics.
+
+    Args:
+        module (nn.Module): Fully convolutional module, e.g. the early layers of a model.
+        tile_size (int): Input pixels covered by the kept output of each tile.
+    """
+
+    def __init__(self, module, tile_size):
+        super(TiledForward, self).__init__()
+        self.module = module
+        self.tile_size = tile_size
+        self._fields = {}
+
+    def forward(self, x):
+        if self.training:
+            return self.module(x)
+        field = self._fields.get(x.size(1))
+        if field is None:
+            field = receptive_field(self.module, x.size(1), dtype=x.dtype, device=x.device)
+            self._fields[x.size(1)] = field
+        return tiled_forward(self.module, x, self.tile_size, field)
+
+    def extra_repr(self):
+        return 'tile_size={}'.format(self.tile_size)
@@ -1,4 +1,473 @@
+from collections import OrderedDict, namedtuple
+import copy
+import inspect
+import math
+import os
+import zipfile
+import torch
+from torch import nn
+import torch.nn.functional as F
+import torch.utils.checkpoint as cp
+
 try:
     from torch.hub import load_state_dict_from_url
 except ImportError:
     from torch.utils.model_zoo import load_url as load_state_dict_from_url
+
+try:
+    from torch.hub import download_url_to_file, get_dir
+except ImportError:
+    download_url_to_file, get_dir = None, None
+
+from .store import _MMAP_SUPPORTED, _checkpoint_name, _mmap_copy, get_weight_store
+
+_LoadResult = namedtuple('LoadResult', ['missing_keys', 'unexpected_keys', 'skipped_keys'])
+
+
+def _cached_file(url, progress):
+    # the checkpoint in the torch hub cache, or the zip-format copy written
+    # next to it the first time so that torch.load can memory-map it
+    cached_file = os.path.join(get_dir(), 'checkpoints', _checkpoint_name(url))
+    if not os.path.exists(cached_file):
+        try:
+            os.makedirs(os.path.dirname(cached_file))
+        except OSError:
+            pass
+        download_url_to_file(url, cached_file, None, progress=progress)
+    return _mmap_copy(cached_file)
+
+
+def _load_checkpoint(url, progress):
+    store = get_weight_store()
+    path = url if os.path.isfile(url) else None
+    if path is None and store is not None:
+        path = store.get(url)
+    if path is None:
+        if get_dir is None:
+            return load_state_dict_from_url(url, progress=progress)
+        path = _cached_file(url, progress)
+    if _MMAP_SUPPORTED and zipfile.is_zipfile(path):
+        return torch.load(path, map_location='cpu', mmap=True)
+    return torch.load(path, map_location='cpu')
+
+
+def load_pretrained(model, url, progress=True, skip=None, rename=None, strict=True):
+    """Copies the weights of a checkpoint into ``model`` one tensor at a time.
+
+    The checkpoint is taken from the :class:`~torchvision.models.store.WeightStore`
+    if one is set and holds it, otherwise it is downloaded to the torch hub
+    cache. It is memory-mapped from there, so its tensors are read straight
+    into the parameters of ``model`` instead of being loaded in full next to
+    them. For hub checkpoints in the legacy serialization format, a zip-format
+    copy is written once next to the cached file. Without memory-mapping
+    support in the installed torch, checkpoints are loaded in memory.
+
+    Args:
+        model (nn.Module): Model to load the weights into.
+        url (string): URL of the checkpoint, or path to a local file.
+        progress (bool, optional): If True, displays a progress bar of the download to stderr.
+        skip (callable, optional): Takes a (renamed) checkpoint key and returns True if the
+            tensor should not be loaded.
+        rename (callable, optional): Maps a checkpoint key to the name of the parameter
+            or buffer of ``model`` it holds.
+        strict (bool, optional): If True, every parameter and buffer of ``model`` has
+            to be loaded. Checkpoint keys that are neither skipped nor in ``model``
+            are an error either way.
+
+    Returns:
+        namedtuple: ``missing_keys`` of ``model`` left as they were, ``unexpected_keys``
+        (always empty) and the ``skipped_keys`` of the checkpoint.
+    """
+    state_dict = _load_checkpoint(url, progress)
+    selected = OrderedDict()
+    skipped_keys = []
+    for key, value in state_dict.items():
+        name = rename(key) if rename is not None else key
+        if skip is not None and skip(name):
+            skipped_keys.append(key)
+        else:
+            selected[name] = value
+    metadata = getattr(state_dict, '_metadata', None)
+    if metadata is not None:
+        selected._metadata = metadata
+    del state_dict
+
+    missing_keys, unexpected_keys = model.load_state_dict(selected, strict=False)
+    errors = []
+    if unexpected_keys:
+        errors.append('Unexpected key(s) in state_dict: {}.'.format(', '.join(unexpected_keys)))
+    if strict and missing_keys:
+        errors.append('Missing key(s) in state_dict: {}.'.format(', '.join(missing_keys)))
+    if errors:
+        raise RuntimeError('Error(s) in loading state_dict for {}:\n\t{}'.format(
+            model.__class__.__name__, '\n\t'.join(errors)))
+    return _LoadResult(list(missing_keys), list(unexpected_keys), skipped_keys)
+
+
+try:
+    # the reentrant variant loses the gradients of blocks whose input does not require grad
+    _CHECKPOINT_KWARGS = ({'use_reentrant': False}
+                          if 'use_reentrant' in inspect.signature(cp.checkpoint).parameters else {})
+except (AttributeError, ValueError):
+    _CHECKPOINT_KWARGS = {}
+
+
+def checkpoint_module(module, *inputs):
+    """Applies ``module`` to ``inputs`` without keeping its intermediate activations.
+
+    They are recomputed during the backward pass instead, which trades one
+    extra forward of ``module`` for the memory of everything inside it. The
+    running statistics of the batch norms in ``module`` are restored after
+    the recomputation, so they move once per step as without checkpointing.
+
+    Args:
+        module (callable): Block to run, an ``nn.Module`` or a method of one.
+        *inputs (Tensor): Its inputs.
+
+    Returns:
+        Tensor: ``module(*inputs)``.
+    """
+    if not torch.is_grad_enabled():
+        return module(*inputs)
+    owner = module if isinstance(module, nn.Module) else getattr(module, '__self__', None)
+    norms = [m for m in owner.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm) and
+             m.training and m.track_running_stats] if isinstance(owner, nn.Module) else []
+    if not norms:
+        return cp.checkpoint(module, *inputs, **_CHECKPOINT_KWARGS)
+
+    calls = [0]
+
+    def run(*inputs):
+        calls[0] += 1
+        if calls[0] == 1:
+            return module(*inputs)
+        # recomputation in the backward pass
+        buffers = [(buf, buf.clone()) for m in norms
+                   for buf in (m.running_mean, m.running_var, m.num_batches_tracked) if buf is not None]
+        try:
+            return module(*inputs)
+        finally:
+            with torch.no_grad():
+                for buf, saved in buffers:
+                    buf.copy_(saved)
+
+    return cp.checkpoint(run, *inputs, **_CHECKPOINT_KWARGS)
+
+
+def truncated_normal_(tensor, std=1., bound=2.):
+    """Fills ``tensor`` in place with a normal distribution truncated to ``[-bound * std, bound * std]``.
+
+    Draws the same distribution as ``scipy.stats.truncnorm(-bound, bound, scale=std)``
+    by inverse transform sampling, directly in the tensor's dtype and on its
+    device.
+
+    Args:
+        tensor (Tensor): Tensor to fill.
+        std (float, optional): Standard deviation of the normal distribution before truncation.
+        bound (float, optional): Truncation bound, in standard deviations.
+
+    Returns:
+        Tensor: ``tensor``.
+    """
+    with torch.no_grad():
+        # the normal CDF maps [-bound, bound] to [cdf(-bound), cdf(bound)],
+        # here in the [-1, 1] range of erf
+        limit = math.erf(bound / math.sqrt(2.))
+        tensor.uniform_(-limit, limit)
+        tensor.erfinv_().mul_(std * math.sqrt(2.))
+        tensor.clamp_(-bound * std, bound * std)
+    return tensor
+
+
+def _pair(value):
+    return tuple(value) if isinstance(value, (tuple, list)) else (value, value)
+
+
+def fold_normalization(conv, mean, std, bn=None):
+    """Folds a per-channel input normalization into the weights of ``conv``.
+
+    Afterwards ``conv(x)`` computes what ``conv((x - mean) / std)`` did
+    before, so the normalization no longer has to be applied to the input.
+    The constant offset this introduces is added to ``conv.bias``, or, when
+    the convolution is followed by ``bn``, subtracted from its running mean,
+    which keeps the parameters of the model unchanged.
+
+    Only convolutions without padding can be folded exactly: the zeros
+    padded around a normalized input would otherwise correspond to ``mean``
+    instead of ``0`` in the folded one.
+
+    Args:
+        conv (nn.Conv2d): First convolution applied to the input.
+        mean (sequence): Sequence of means for each input channel.
+        std (sequence): Sequence of standard deviations for each input channel.
+        bn (nn.BatchNorm2d, optional): Batch norm applied right after ``conv``.
+
+    Returns:
+        nn.Conv2d: ``conv``, modified in place.
+    """
+    if any(p != 0 for p in _pair(conv.padding)):
+        raise ValueError('Cannot fold the input normalization into a convolution with '
+                         'padding {}'.format(conv.padding))
+    if conv.groups != 1:
+        raise ValueError('Cannot fold the input normalization into a grouped convolution')
+    with torch.no_grad():
+        weight = conv.weight
+        mean = torch.as_tensor(mean, dtype=weight.dtype, device=weight.device).expand(weight.size(1))
+        std = torch.as_tensor(std, dtype=weight.dtype, device=weight.device).expand(weight.size(1))
+        # conv((x - mean) / std) == conv'(x) + shift with conv' = conv / std
+        weight.div_(std[None, :, None, None])
+        shift = -(weight.sum(dim=(2, 3)) * mean[None, :]).sum(dim=1)
+        if bn is not None:
+            bn.running_mean.sub_(shift)
+        elif conv.bias is not None:
+            conv.bias.add_(shift)
+        else:
+            conv.bias = nn.Parameter(shift)
+    return conv
+
+
+def _fold_bn(convs, bn):
+    # bn(sum(conv(x))) == sum(conv'(x)) with conv' = bn.scale * conv and the
+    # bn shift added to the bias of the first convolution
+    with torch.no_grad():
+        scale = torch.rsqrt(bn.running_var + bn.eps)
+        shift = -bn.running_mean * scale
+        if bn.affine:
+            scale = scale * bn.weight
+            shift = shift * bn.weight + bn.bias
+        for conv in convs:
+            conv.weight.mul_(scale[:, None, None, None])
+            if conv.bias is not None:
+                conv.bias.mul_(scale)
+        if convs[0].bias is None:
+            convs[0].bias = nn.Parameter(shift)
+        else:
+            convs[0].bias.add_(shift)
+
+
+def _fuse_children(module):
+    summed = tuple(getattr(module, '_summed_convs', ()))
+    run = []
+    for name, child in list(module.named_children()):
+        if isinstance(child, nn.Conv2d):
+            run.append((name, child))
+            continue
+        if isinstance(child, nn.BatchNorm2d):
+            names = tuple(n for n, _ in run)
+            if child.track_running_stats and (len(run) == 1 or (run and names == summed)):
+                _fold_bn([conv for _, conv in run], child)
+                setattr(module, name, nn.Identity())
+        else:
+            _fuse_children(child)
+        run = []
+
+
+def fuse_conv_bn(model, inplace=False, example=None, tolerance=1e-4):
+    """Folds every batch norm into the convolution it follows, for inference.
+
+    A ``BatchNorm2d`` registered right after a ``Conv2d`` in the same parent
+    module is taken to normalize that convolution's output, which is how
+    all the models in this package are laid out. The batch norm's running
+    statistics and affine parameters are folded into the convolution's
+    weight and bias, and the batch norm is replaced by ``nn.Identity``.
+
+    Modules whose forward sums several convolutions before a single batch
+    norm list their names in a ``_summed_convs`` class attribute; other
+    batch norms that follow more than one convolution are left alone.
+
+    The pairing follows the registration order, not the forward pass, so a
+    module laid out differently can be fused wrongly. Pass an ``example``
+    batch to check the fused model against the original one.
+
+    Args:
+        model (nn.Module): Model to fuse.
+        inplace (bool, optional): If True, fuse ``model`` itself instead of a copy.
+        example (Tensor, optional): Batch to compare the outputs of both models on. Raises
+            a ``RuntimeError`` if their largest difference, relative to the largest output
+            of ``model``, is more than ``tolerance``.
+        tolerance (float, optional): Default: 1e-4.
+
+    Returns:
+        nn.Module: The fused model, in eval mode. It no longer matches the
+        original once put back into training mode.
+    """
+    if example is not None:
+        training = model.training
+        model.eval()
+        with torch.no_grad():
+            expected = model(example)
+        model.train(training)
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.eval()
+    _fuse_children(model)
+
+    if example is not None:
+        with torch.no_grad():
+            output = model(example)
+        error = ((output - expected).abs().max() / expected.abs().max()).item()
+        if not error <= tolerance:
+            raise RuntimeError('The fused model differs from the original one by {:.3g} of the largest '
+                               'output on the example batch, more than the tolerance of {}. Some batch '
+                               'norm does not normalize the convolution registered before it'
+                               .format(error, tolerance))
+    return model
+
+
+_CHANNELS_LAST = getattr(torch, 'channels_last', None)
+
+# largest difference to the float32 output accepted by prepare_for_inference,
+# relative to the largest float32 output
+_INFERENCE_TOLERANCES = OrderedDict([
+    (torch.float32, 1e-3),
+    (torch.bfloat16, 5e-2),
+    (torch.qint8, 5e-2),
+])
+
+
+class _InferenceModel(nn.Module):
+    # casts the input to the dtype and memory format of the prepared model,
+    # and its output back to float32
+    def __init__(self, module, dtype, memory_format):
+        super(_InferenceModel, self).__init__()
+        self.module = module
+        self.dtype = dtype
+        self.memory_format = memory_format
+
+    def forward(self, x):
+        if self.dtype.is_floating_point:
+            x = x.to(self.dtype)
+        if self.memory_format is not None:
+            x = x.contiguous(memory_format=self.memory_format)
+        return self.module(x).float()
+
+    def extra_repr(self):
+        return 'dtype={}, memory_format={}'.format(self.dtype, self.memory_format)
+
+
+def prepare_for_inference(model, dtype=torch.float32, memory_format=_CHANNELS_LAST, example=None,
+                          tolerance=None):
+    """Returns a copy of ``model`` converted for fast CPU inference.
+
+    The batch norms are folded into the convolutions with :func:`fuse_conv_bn`,
+    then the weights are converted to ``dtype`` and ``memory_format``. With
+    ``torch.qint8`` the fully connected layers are dynamically quantized and
+    the convolutions stay in float32, since PyTorch only quantizes linear
+    layers dynamically. The returned model takes and returns float32 tensors,
+    and converts its input itself.
+
+    Args:
+        model (nn.Module): Any of the classification models in this package.
+        dtype (torch.dtype, optional): ``torch.float32``, ``torch.bfloat16`` or ``torch.qint8``.
+        memory_format (torch.memory_format, optional): Layout of the activations, or ``None``
+            to keep the default contiguous one. Default: ``torch.channels_last``.
+        example (Tensor, optional): Batch to compare the outputs of both models on. Raises
+            a ``RuntimeError`` if their largest difference, relative to the largest float32
+            output, is more than ``tolerance``.
+        tolerance (float, optional): Default: 1e-3 for float32 and 5e-2 otherwise.
+
+    Returns:
+        nn.Module: The prepared model, in eval mode.
+    """
+    if dtype not in _INFERENCE_TOLERANCES:
+        raise ValueError("Invalid dtype '{}'. Options are {}".format(dtype, list(_INFERENCE_TOLERANCES)))
+    if example is not None:
+        training = model.training
+        model.eval()
+        with torch.no_grad():
+            expected = model(example)
+        model.train(training)
+
+    prepared = fuse_conv_bn(model)
+    if memory_format is not None:
+        prepared = prepared.to(memory_format=memory_format)
+    if dtype == torch.qint8:
+        try:
+            from torch.ao.quantization import quantize_dynamic
+        except ImportError:
+            from torch.quantization import quantize_dynamic
+        prepared = quantize_dynamic(prepared, {nn.Linear}, dtype=torch.qint8)
+    elif dtype != torch.float32:
+        prepared = prepared.to(dtype)
+    prepared = _InferenceModel(prepared, dtype, memory_format).eval()
+
+    if example is not None:
+        with torch.no_grad():
+            output = prepared(example)
+        error = ((output - expected).abs().max() / expected.abs().max()).item()
+        if tolerance is None:
+            tolerance = _INFERENCE_TOLERANCES[dtype]
+        if not error <= tolerance:
+            raise RuntimeError('The {} model differs from the float32 one by {:.3g} of the largest '
+                               'output on the example batch, more than the tolerance of {}'
+                               .format(dtype, error, tolerance))
+    return prepared
+
+
+def _space_to_depth(x, stride):
+    # (N, C, H, W) -> (N, C * stride**2, H / stride, W / stride)
+    n, c, h, w = x.size()
+    x = x.view(n, c, h // stride, stride, w // stride, stride)
+    return x.permute(0, 1, 3, 5, 2, 4).reshape(n, c * stride * stride, h // stride, w // stride)
+
+
+def multiscale_conv2d(x, convs, summed=False):
+    """Applies convolutions that share a centre and a stride in one pass over ``x``.
+
+    The wide stems run several square convolutions with the same stride and
+    ``kernel_size // 2`` padding over the full-resolution input, with kernels
+    of up to ``81 x 81``. Here the padded input is rearranged once so that
+    every ``stride x stride`` block becomes a channel, which turns each
+    strided convolution into a dense one with a ``stride`` times smaller
+    kernel. This gives the same result as calling the convolutions, without
+    the very slow large-kernel path they take on CPU.
+
+    Args:
+        x (Tensor): Input of size (N, C, H, W).
+        convs (sequence of nn.Conv2d): Convolutions to apply.
+        summed (bool, optional): If True, return the sum of the outputs. The
+            kernels are then zero-padded to the largest size and added up
+            into a single convolution.
+
+    Returns:
+        list or Tensor: The output of every convolution, or their sum.
+    """
+    stride = convs[0].stride[0]
+    for conv in convs:
+        k = conv.kernel_size[0]
+        if (conv.kernel_size != (k, k) or k % 2 != 1 or conv.padding != (k // 2, k // 2) or
+                conv.stride != (stride, stride) or conv.dilation != (1, 1) or conv.groups != 1):
+            raise ValueError('Expected centred convolutions with odd square kernels and a common '
+                             'stride, got {}'.format(conv))
+    size = max(conv.kernel_size[0] for conv in convs)
+    pad = size // 2
+    n, c, h, w = x.size()
+    out_h = (h - 1) // stride + 1
+    out_w = (w - 1) // stride + 1
+
+    # (kernel offset from the largest window, weight, bias) per convolution
+    branches = [((size - conv.kernel_size[0]) // 2, conv.weight, conv.bias) for conv in convs]
+    if summed:
+        weight = sum(F.pad(weight, [offset] * 4) for offset, weight, _ in branches)
+        biases = [bias for _, _, bias in branches if bias is not None]
+        branches = [(0, weight, sum(biases) if biases else None)]
+
+    blocks = []
+    for offset, weight, bias in branches:
+        k = weight.size(-1)
+        start, lead = offset // stride, offset % stride
+        kk = (lead + k + stride - 1) // stride
+        weight = F.pad(weight, [lead, kk * stride - lead - k] * 2)
+        blocks.append((start, kk, _space_to_depth(weight, stride), bias))
+
+    # pad the input to a whole number of blocks covering every window; every
+    # convolution reads the whole rearranged input, so it is not copied per
+    # kernel size, and its output is cropped to the offset of its kernel
+    rows = max(start + kk for start, kk, _, _ in blocks)
+    padded_h = max(out_h + rows - 1, (h + pad + stride - 1) // stride) * stride
+    padded_w = max(out_w + rows - 1, (w + pad + stride - 1) // stride) * stride
+    x = _space_to_depth(F.pad(x, [pad, padded_w - w - pad, pad, padded_h - h - pad]), stride)
+
+    outputs = [F.conv2d(x, weight, bias)[:, :, start:start + out_h, start:start + out_w]
+               for start, kk, weight, bias in blocks]
+    return outputs[0] if summed else outputs
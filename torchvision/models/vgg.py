@@ -1,5 +1,6 @@
+import torch
 import torch.nn as nn
-from .utils import load_state_dict_from_url
+from .utils import load_pretrained
 
 
 __all__ = [
@@ -41,7 +42,7 @@ class VGG(nn.Module):
     def forward(self, x):
         x = self.features(x)
         x = self.avgpool(x)
-        x = x.view(x.size(0), -1)
+        x = torch.flatten(x, 1)
         x = self.classifier(x)
         return x
 
@@ -88,9 +89,7 @@ def _vgg(arch, cfg, batch_norm, pretrained, progress, **kwargs):
         kwargs['init_weights'] = False
     model = VGG(make_layers(cfgs[cfg], batch_norm=batch_norm), **kwargs)
     if pretrained:
-        state_dict = load_state_dict_from_url(model_urls[arch],
-                                              progress=progress)
-        model.load_state_dict(state_dict)
+        load_pretrained(model, model_urls[arch], progress)
     return model
 
 
@@ -37,6 +37,63 @@ def _is_numpy_image(img):
     return isinstance(img, np.ndarray) and (img.ndim in {2, 3})
 
 
+def _get_image_size(img):
+    """Returns the (width, height) of a PIL Image, an HWC ndarray or a CHW tensor."""
+    if _is_pil_image(img):
+        return img.size
+    elif _is_numpy_image(img):
+        return img.shape[1], img.shape[0]
+    elif _is_tensor_image(img):
+        return img.shape[2], img.shape[1]
+    raise TypeError('img should be PIL Image, ndarray or Tensor. Got {}'.format(type(img)))
+
+
+_pil_interpolation_to_torch = {
+    Image.NEAREST: 'nearest',
+    Image.BILINEAR: 'bilinear',
+    Image.BICUBIC: 'bicubic',
+}
+
+# cv2 is only imported once an ndarray image is resized, by name so the
+# table does not need it at import time
+_pil_interpolation_to_cv2 = {
+    Image.NEAREST: 'INTER_NEAREST',
+    Image.BILINEAR: 'INTER_LINEAR',
+    Image.BICUBIC: 'INTER_CUBIC',
+    Image.LANCZOS: 'INTER_LANCZOS4',
+}
+
+
+def _resize_to(img, ow, oh, interpolation):
+    # resizes to exactly (ow, oh) without going through PIL for arrays and tensors
+    if _is_pil_image(img):
+        return img.resize((ow, oh), interpolation)
+    if _is_numpy_image(img):
+        try:
+            import cv2
+        except ImportError:
+            raise ImportError('Resizing ndarray images requires OpenCV (cv2)')
+        out = cv2.resize(img, (ow, oh), interpolation=getattr(cv2, _pil_interpolation_to_cv2[interpolation]))
+        if img.ndim == 3 and out.ndim == 2:
+            # cv2 drops a single channel dimension
+            out = out[:, :, None]
+        return out
+    mode = _pil_interpolation_to_torch[interpolation]
+    align_corners = None if mode == 'nearest' else False
+    out = torch.nn.functional.interpolate(img.unsqueeze(0).float(), size=(oh, ow), mode=mode,
+                                          align_corners=align_corners)[0]
+    if not img.is_floating_point():
+        if img.dtype == torch.uint8:
+            out = out.clamp_(0, 255)
+        out = out.round_().to(img.dtype)
+    return out
+
+
+def _check_image(img):
+    if not(_is_pil_image(img) or _is_numpy_image(img) or _is_tensor_image(img)):
+        raise TypeError('img should be PIL Image, ndarray or Tensor. Got {}'.format(type(img)))
+
+
 def to_tensor(pic):
     """Convert a ``PIL Image`` or ``numpy.ndarray`` to tensor.
 
@@ -59,7 +116,7 @@ def to_tensor(pic):
         img = torch.from_numpy(pic.transpose((2, 0, 1)))
         # backward compatibility
         if isinstance(img, torch.ByteTensor):
-            return img.float().div(255)
+            return img.float().div_(255)
         else:
             return img
 
@@ -69,16 +126,31 @@ def to_tensor(pic):
         return torch.from_numpy(nppic)
 
     # handle PIL Image
+    nppic = _pil_to_numpy(pic)
+    # write straight into the CHW output instead of transposing a copy;
+    # uint8 images are cast to float on the way and scaled in place
+    img = np.empty((nppic.shape[2], nppic.shape[0], nppic.shape[1]),
+                   dtype=np.float32 if nppic.dtype == np.uint8 else nppic.dtype)
+    np.copyto(img, nppic.transpose((2, 0, 1)), casting='unsafe')
+    img = torch.from_numpy(img)
+    if nppic.dtype == np.uint8:
+        return img.div_(255)
+    else:
+        return img
+
+
+def _pil_to_numpy(pic):
+    # writable (H x W x C) array of the pixel data
     if pic.mode == 'I':
-        img = torch.from_numpy(np.array(pic, np.int32, copy=False))
+        nppic = np.array(pic, np.int32)
     elif pic.mode == 'I;16':
-        img = torch.from_numpy(np.array(pic, np.int16, copy=False))
+        nppic = np.array(pic, np.int16)
     elif pic.mode == 'F':
-        img = torch.from_numpy(np.array(pic, np.float32, copy=False))
+        nppic = np.array(pic, np.float32)
     elif pic.mode == '1':
-        img = 255 * torch.from_numpy(np.array(pic, np.uint8, copy=False))
+        nppic = np.asarray(pic, np.uint8) * np.uint8(255)
     else:
-        img = torch.ByteTensor(torch.ByteStorage.from_buffer(pic.tobytes()))
+        nppic = np.array(pic, np.uint8)
     # PIL image mode: L, LA, P, I, F, RGB, YCbCr, RGBA, CMYK
     if pic.mode == 'YCbCr':
         nchannel = 3
@@ -86,14 +158,33 @@ def to_tensor(pic):
         nchannel = 1
     else:
         nchannel = len(pic.mode)
-    img = img.view(pic.size[1], pic.size[0], nchannel)
-    # put it from HWC to CHW format
-    # yikes, this transpose takes 80% of the loading time/CPU
-    img = img.transpose(0, 1).transpose(0, 2).contiguous()
-    if isinstance(img, torch.ByteTensor):
-        return img.float().div(255)
+    return nppic.reshape(pic.size[1], pic.size[0], nchannel)
+
+
+def to_byte_tensor(pic):
+    """Convert a uint8 ``PIL Image`` or ``numpy.ndarray`` to a uint8 tensor without scaling.
+
+    See ``ToByteTensor`` for more details.
+
+    Args:
+        pic (PIL Image or numpy.ndarray): Image to be converted to tensor.
+
+    Returns:
+        Tensor: Converted image of size (C x H x W), laid out channels-last in memory.
+    """
+    if not(_is_pil_image(pic) or _is_numpy_image(pic)):
+        raise TypeError('pic should be PIL Image or ndarray. Got {}'.format(type(pic)))
+
+    if isinstance(pic, np.ndarray):
+        if pic.ndim == 2:
+            pic = pic[:, :, None]
+        if not pic.flags.writeable or any(stride < 0 for stride in pic.strides):
+            pic = np.array(pic)
     else:
-        return img
+        pic = _pil_to_numpy(pic)
+    if pic.dtype != np.uint8:
+        raise TypeError('pic should be uint8. Got {}'.format(pic.dtype))
+    return torch.from_numpy(pic).permute(2, 0, 1)
 
 
 def to_pil_image(pic, mode=None):
@@ -193,8 +284,9 @@ def normalize(tensor, mean, std, inplace=False):
 
     Args:
         tensor (Tensor): Tensor image of size (C, H, W) to be normalized.
-        mean (sequence): Sequence of means for each channel.
-        std (sequence): Sequence of standard deviations for each channel.
+        mean (sequence or Tensor): Sequence of means for each channel.
+        std (sequence or Tensor): Sequence of standard deviations for each channel.
+        inplace (bool, optional): Bool to make this operation inplace.
 
     Returns:
         Tensor: Normalized Tensor image.
@@ -202,43 +294,33 @@ def normalize(tensor, mean, std, inplace=False):
     if not _is_tensor_image(tensor):
         raise TypeError('tensor is not a torch image.')
 
-    if not inplace:
-        tensor = tensor.clone()
     if DEBUG:
         print(tensor)
-    mean = torch.as_tensor(mean, dtype=torch.float32, device=tensor.device)
-    std = torch.as_tensor(std, dtype=torch.float32, device=tensor.device)
-    tensor.sub_(mean[:, None, None]).div_(std[:, None, None])
-    return tensor
+    dtype = tensor.dtype if tensor.is_floating_point() else torch.float32
+    mean = torch.as_tensor(mean, dtype=dtype, device=tensor.device)
+    std = torch.as_tensor(std, dtype=dtype, device=tensor.device)
+    if inplace:
+        return tensor.sub_(mean[:, None, None]).div_(std[:, None, None])
+    # the out-of-place subtraction allocates the result, so no clone is needed
+    return torch.sub(tensor, mean[:, None, None]).div_(std[:, None, None])
 
 def resize2(img,size, interpolation=Image.BILINEAR):
-    if not _is_pil_image(img):
-        raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
+    _check_image(img)
     if not (isinstance(size, int) or (isinstance(size, Iterable) and len(size) == 2)):
         raise TypeError('Got inappropriate size arg: {}'.format(size))
 
     if isinstance(size, int):
-        w, h = img.size
-        return img.resize((size, size), interpolation)
-        '''
-        if (w <= h and w == size) or (h <= w and h == size):
-            return img
-        if w < h:
-            ow = size
-            oh = int(size * h / w)
-            return img.resize((ow, oh), interpolation)
-        else:
-            oh = size
-            ow = int(size * w / h)
-            return img.resize((ow, oh), interpolation)
-        '''
+        return _resize_to(img, size, size, interpolation)
     else:
-        return img.resize(size[::-1], interpolation)    
+        return _resize_to(img, size[1], size[0], interpolation)
+
+
 def resize(img, size, interpolation=Image.BILINEAR):
     r"""Resize the input PIL Image to the given size.
 
     Args:
-        img (PIL Image): Image to be resized.
+        img (PIL Image, numpy.ndarray or Tensor): Image to be resized. Arrays are
+            (H x W x C) and resized with OpenCV, tensors are (C x H x W).
         size (sequence or int): Desired output size. If size is a sequence like
             (h, w), the output size will be matched to this. If size is an int,
             the smaller edge of the image will be matched to this number maintaing
@@ -248,27 +330,26 @@ def resize(img, size, interpolation=Image.BILINEAR):
             ``PIL.Image.BILINEAR``
 
     Returns:
-        PIL Image: Resized image.
+        PIL Image, numpy.ndarray or Tensor: Resized image.
     """
-    if not _is_pil_image(img):
-        raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
+    _check_image(img)
     if not (isinstance(size, int) or (isinstance(size, Iterable) and len(size) == 2)):
         raise TypeError('Got inappropriate size arg: {}'.format(size))
 
     if isinstance(size, int):
-        w, h = img.size
+        w, h = _get_image_size(img)
         if (w <= h and w == size) or (h <= w and h == size):
             return img
         if w < h:
             ow = size
             oh = int(size * h / w)
-            return img.resize((ow, oh), interpolation)
+            return _resize_to(img, ow, oh, interpolation)
         else:
             oh = size
             ow = int(size * w / h)
-            return img.resize((ow, oh), interpolation)
+            return _resize_to(img, ow, oh, interpolation)
     else:
-        return img.resize(size[::-1], interpolation)
+        return _resize_to(img, size[1], size[0], interpolation)
 
 
 def scale(*args, **kwargs):
@@ -369,17 +450,23 @@ def crop(img, i, j, h, w):
     """Crop the given PIL Image.
 
     Args:
-        img (PIL Image): Image to be cropped.
+        img (PIL Image, numpy.ndarray or Tensor): Image to be cropped. Arrays and
+            tensors are cropped as views.
         i (int): i in (i,j) i.e coordinates of the upper left corner.
         j (int): j in (i,j) i.e coordinates of the upper left corner.
         h (int): Height of the cropped image.
         w (int): Width of the cropped image.
 
     Returns:
-        PIL Image: Cropped image.
+        PIL Image, numpy.ndarray or Tensor: Cropped image.
     """
-    if not _is_pil_image(img):
-        raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
+    _check_image(img)
+    if _is_numpy_image(img):
+        i, j, h, w = int(i), int(j), int(h), int(w)
+        return img[i:i + h, j:j + w]
+    if _is_tensor_image(img):
+        i, j, h, w = int(i), int(j), int(h), int(w)
+        return img[:, i:i + h, j:j + w]
 
     return img.crop((j, i, j + w, i + h))
 
@@ -387,7 +474,7 @@ def crop(img, i, j, h, w):
 def center_crop(img, output_size):
     if isinstance(output_size, numbers.Number):
         output_size = (int(output_size), int(output_size))
-    w, h = img.size
+    w, h = _get_image_size(img)
     th, tw = output_size
     i = int(round((h - th) / 2.))
     j = int(round((w - tw) / 2.))
@@ -400,7 +487,7 @@ def resized_crop(img, i, j, h, w, size, interpolation=Image.BILINEAR):
     Notably used in :class:`~torchvision.transforms.RandomResizedCrop`.
 
     Args:
-        img (PIL Image): Image to be cropped.
+        img (PIL Image, numpy.ndarray or Tensor): Image to be cropped.
         i (int): i in (i,j) i.e coordinates of the upper left corner
         j (int): j in (i,j) i.e coordinates of the upper left corner
         h (int): Height of the cropped image.
@@ -409,25 +496,92 @@ def resized_crop(img, i, j, h, w, size, interpolation=Image.BILINEAR):
         interpolation (int, optional): Desired interpolation. Default is
             ``PIL.Image.BILINEAR``.
     Returns:
-        PIL Image: Cropped image.
+        PIL Image, numpy.ndarray or Tensor: Cropped image.
     """
-    assert _is_pil_image(img), 'img should be PIL Image'
+    assert _is_pil_image(img) or _is_numpy_image(img) or _is_tensor_image(img), \
+        'img should be PIL Image, ndarray or Tensor'
     img = crop(img, i, j, h, w)
     img = resize(img, size, interpolation)
     return img
 
 
+def resized_crop_to_tensor(img, i, j, h, w, size, interpolation=Image.BILINEAR, flip=False,
+                           mean=None, std=None, dtype=torch.float32):
+    """Crop, resize, optionally flip and normalize an image straight into a tensor.
+
+    Gives the result of ``resized_crop``, ``hflip``, ``to_tensor`` and ``normalize``
+    in turn. The flip, the HWC to CHW transpose and the normalization are
+    folded into a single write of the output tensor, so no flipped image or
+    intermediate tensors are made.
+
+    Args:
+        img (PIL Image or numpy.ndarray): Image to be cropped.
+        i (int): i in (i,j) i.e coordinates of the upper left corner
+        j (int): j in (i,j) i.e coordinates of the upper left corner
+        h (int): Height of the cropped image.
+        w (int): Width of the cropped image.
+        size (sequence or int): Desired output size (h, w).
+        interpolation (int, optional): Desired interpolation. Default is
+            ``PIL.Image.BILINEAR``.
+        flip (bool, optional): If True, the output is flipped horizontally.
+        mean (sequence, optional): Sequence of means for each channel.
+        std (sequence, optional): Sequence of standard deviations for each channel.
+        dtype (torch.dtype, optional): ``torch.float32`` gives values scaled to [0, 1]
+            and normalized if ``mean`` and ``std`` are given. ``torch.uint8`` keeps the
+            pixel values and leaves normalization to the model. Default: ``torch.float32``.
+
+    Returns:
+        Tensor: Image of size (C, size[0], size[1]).
+    """
+    if isinstance(size, numbers.Number):
+        size = (int(size), int(size))
+    oh, ow = size
+    if _is_pil_image(img):
+        src = np.asarray(img.crop((j, i, j + w, i + h)).resize((ow, oh), interpolation))
+    elif _is_numpy_image(img):
+        src = _resize_to(crop(img, i, j, h, w), ow, oh, interpolation)
+    else:
+        raise TypeError('img should be PIL Image or ndarray. Got {}'.format(type(img)))
+
+    if src.ndim == 2:
+        src = src[:, :, None]
+    if flip:
+        src = src[:, ::-1]
+    src = src.transpose((2, 0, 1))
+    out = torch.empty(src.shape, dtype=dtype)
+    if dtype == torch.uint8:
+        if mean is not None or std is not None:
+            raise ValueError('uint8 output can not be normalized')
+        np.copyto(out.numpy(), src)
+        return out
+
+    scale = np.float32(1. / 255 if src.dtype == np.uint8 else 1.)
+    if std is not None:
+        scale = scale / np.asarray(std, dtype=np.float32).reshape(-1, 1, 1)
+    out_np = out.numpy()
+    np.multiply(src, scale, out=out_np, casting='unsafe')
+    if mean is not None:
+        shift = np.asarray(mean, dtype=np.float32).reshape(-1, 1, 1)
+        if std is not None:
+            shift = shift / np.asarray(std, dtype=np.float32).reshape(-1, 1, 1)
+        out_np -= shift
+    return out
+
+
 def hflip(img):
     """Horizontally flip the given PIL Image.
 
     Args:
-        img (PIL Image): Image to be flipped.
+        img (PIL Image, numpy.ndarray or Tensor): Image to be flipped.
 
     Returns:
-        PIL Image:  Horizontall flipped image.
+        PIL Image, numpy.ndarray or Tensor:  Horizontall flipped image.
     """
-    if not _is_pil_image(img):
-        raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
+    _check_image(img)
+    if _is_numpy_image(img):
+        return np.ascontiguousarray(img[:, ::-1])
+    if _is_tensor_image(img):
+        return img.flip(2)
 
     return img.transpose(Image.FLIP_LEFT_RIGHT)
 
@@ -479,13 +633,16 @@ def vflip(img):
     """Vertically flip the given PIL Image.
 
     Args:
-        img (PIL Image): Image to be flipped.
+        img (PIL Image, numpy.ndarray or Tensor): Image to be flipped.
 
     Returns:
-        PIL Image:  Vertically flipped image.
+        PIL Image, numpy.ndarray or Tensor:  Vertically flipped image.
     """
-    if not _is_pil_image(img):
-        raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
+    _check_image(img)
+    if _is_numpy_image(img):
+        return np.ascontiguousarray(img[::-1])
+    if _is_tensor_image(img):
+        return img.flip(1)
 
     return img.transpose(Image.FLIP_TOP_BOTTOM)
 
@@ -823,33 +980,187 @@ def to_grayscale(img, num_output_channels=1):
     return img
 
 
+def _is_tensor_batch(batch):
+    return torch.is_tensor(batch) and batch.ndimension() == 4
+
+
+def _batch_factors(batch, factors):
+    factors = torch.as_tensor(factors, dtype=torch.float32)
+    if factors.dim() == 0:
+        factors = factors.expand(batch.size(0))
+    return factors.view(-1, 1, 1, 1)
+
+
+def _blend(img1, img2, ratio, bound):
+    return (ratio * img1 + (1 - ratio) * img2).clamp_(0, bound)
+
+
+def _rgb_to_grayscale(batch):
+    # same weights as PIL's 'L' conversion
+    r, g, b = batch.unbind(1)
+    return (0.299 * r + 0.587 * g + 0.114 * b).unsqueeze(1)
+
+
+def _rgb_to_hsv(batch):
+    r, g, b = batch.unbind(1)
+    maxc = batch.max(1)[0]
+    minc = batch.min(1)[0]
+    delta = maxc - minc
+    s = delta / torch.where(maxc > 0, maxc, torch.ones_like(maxc))
+    deltac = torch.where(delta > 0, delta, torch.ones_like(delta))
+    rc = (maxc - r) / deltac
+    gc = (maxc - g) / deltac
+    bc = (maxc - b) / deltac
+    h = torch.where(maxc == r, bc - gc, torch.where(maxc == g, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = torch.where(delta > 0, (h / 6.0) % 1.0, torch.zeros_like(h))
+    return h, s, maxc
+
+
+def _hsv_to_rgb(h, s, v):
+    i = torch.floor(h * 6.0)
+    f = h * 6.0 - i
+    i = i.long() % 6
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    channels = []
+    for order in ((v, q, p, p, t, v), (t, v, v, q, p, p), (p, p, t, v, v, q)):
+        channels.append(torch.stack(order).gather(0, i.unsqueeze(0))[0])
+    return torch.stack(channels, 1)
+
+
+def batch_adjust_brightness(batch, brightness_factors, max_value=255.):
+    """Adjust brightness of every image in a batch.
+
+    Args:
+        batch (Tensor): Float tensor of size (N, C, H, W) with values in [0, max_value].
+        brightness_factors (float or Tensor): Factor of each image, see ``adjust_brightness``.
+        max_value (float, optional): Largest pixel value, results are clamped to it.
+            Default: 255, as for ``batch.float()`` of uint8 images.
+
+    Returns:
+        Tensor: Brightness adjusted batch.
+    """
+    return _blend(batch, 0, _batch_factors(batch, brightness_factors), max_value)
+
+
+def batch_adjust_contrast(batch, contrast_factors, max_value=255.):
+    """Adjust contrast of every image in a batch.
+
+    Args:
+        batch (Tensor): Float tensor of size (N, C, H, W) with values in [0, max_value].
+        contrast_factors (float or Tensor): Factor of each image, see ``adjust_contrast``.
+        max_value (float, optional): Largest pixel value. Default: 255.
+
+    Returns:
+        Tensor: Contrast adjusted batch.
+    """
+    gray = _rgb_to_grayscale(batch) if batch.size(1) == 3 else batch
+    mean = gray.view(batch.size(0), -1).mean(1).view(-1, 1, 1, 1)
+    return _blend(batch, mean, _batch_factors(batch, contrast_factors), max_value)
+
+
+def batch_adjust_saturation(batch, saturation_factors, max_value=255.):
+    """Adjust color saturation of every image in a batch.
+
+    Args:
+        batch (Tensor): Float tensor of size (N, C, H, W) with values in [0, max_value].
+        saturation_factors (float or Tensor): Factor of each image, see ``adjust_saturation``.
+        max_value (float, optional): Largest pixel value. Default: 255.
+
+    Returns:
+        Tensor: Saturation adjusted batch. Single channel batches are returned unchanged.
+    """
+    if batch.size(1) != 3:
+        return batch
+    return _blend(batch, _rgb_to_grayscale(batch), _batch_factors(batch, saturation_factors), max_value)
+
+
+def batch_adjust_hue(batch, hue_factors):
+    """Adjust hue of every image in a batch.
+
+    Args:
+        batch (Tensor): Float tensor of size (N, C, H, W) with non negative values.
+        hue_factors (float or Tensor): Shift of each image, in [-0.5, 0.5], see ``adjust_hue``.
+
+    Returns:
+        Tensor: Hue adjusted batch. Single channel batches are returned unchanged.
+    """
+    if batch.size(1) != 3:
+        return batch
+    factors = _batch_factors(batch, hue_factors).view(-1, 1, 1)
+    if not bool(((factors >= -0.5) & (factors <= 0.5)).all()):
+        raise ValueError('hue_factor is not in [-0.5, 0.5].')
+    h, s, v = _rgb_to_hsv(batch)
+    return _hsv_to_rgb((h + factors) % 1.0, s, v)
+
+
+def batch_normalize(batch, mean, std):
+    """Normalize a batch of images with mean and standard deviation.
+
+    Args:
+        batch (Tensor): Tensor of size (N, C, H, W). uint8 batches are first
+            scaled to [0, 1] as ``to_tensor`` would, in the same pass.
+        mean (sequence or Tensor): Sequence of means for each channel.
+        std (sequence or Tensor): Sequence of standard deviations for each channel.
+
+    Returns:
+        Tensor: Normalized float batch.
+    """
+    if not _is_tensor_batch(batch):
+        raise TypeError('batch is not a torch image batch.')
+    scale = 1. / 255 if batch.dtype == torch.uint8 else 1.
+    mean = torch.as_tensor(mean, dtype=torch.float32, device=batch.device).view(1, -1, 1, 1)
+    std = torch.as_tensor(std, dtype=torch.float32, device=batch.device).view(1, -1, 1, 1)
+    return batch.to(torch.float32, copy=True).mul_(scale / std).sub_(mean / std)
+
+
+_circle_masks = collections.OrderedDict()
+_CIRCLE_MASK_CACHE_SIZE = 8
+
+
+def _circle_mask(size):
+    # mask of the pixels img_circle keeps, cached per side length
+    mask = _circle_masks.pop(size, None)
+    if mask is None:
+        r = float(size / 2)
+        r3 = int(size / 2)
+        dist = np.abs(np.arange(size) - r)
+        inside = np.sqrt(dist[:, None] ** 2 + dist[None, :] ** 2) < r3
+        offset = size - 2 * r3
+        mask = Image.fromarray(inside[offset:, offset:].astype(np.uint8) * 255, 'L')
+    _circle_masks[size] = mask
+    while len(_circle_masks) > _CIRCLE_MASK_CACHE_SIZE:
+        _circle_masks.popitem(last=False)
+    return mask
+
+
 def img_circle(img):
+    """Cut the largest centered circle out of an image.
 
+    Non-square images are first resized to a square of their smaller side.
+    Pixels outside the circle are transparent white.
+
+    Args:
+        img (PIL Image): Image to be cut.
+
+    Returns:
+        PIL Image: RGBA image of even side length.
+    """
     if not _is_pil_image(img):
         raise TypeError('img should be PIL Image. Got {}'.format(type(img)))
 
     ima = img
     size = ima.size
-    print(size)
-    
+
     r2 = min(size[0], size[1])
     if size[0] != size[1]:
         ima = ima.resize((r2, r2), Image.ANTIALIAS)
-    
-    r3 = int(r2/2)
-    imb = Image.new('RGBA', (r3*2, r3*2),(255,255,255,0))
-    pima = ima.load() 
-    pimb = imb.load()
-    r = float(r2/2) 
- 
-    for i in range(r2):
-        for j in range(r2):
-            lx = abs(i-r)
-            ly = abs(j-r)
-            l = (pow(lx,2) + pow(ly,2))** 0.5
-            if l < r3:
-                pimb[i-(r-r3),j-(r-r3)] = pima[i,j]
- 
-    return imb
-
 
+    r3 = int(r2 / 2)
+    # odd sides drop the first row and column, which lie outside the circle
+    offset = r2 - 2 * r3
+    if offset:
+        ima = ima.crop((offset, offset, r2, r2))
+    imb = Image.new('RGBA', (r3 * 2, r3 * 2), (255, 255, 255, 0))
+    return Image.composite(ima.convert('RGBA'), imb, _circle_mask(r2))
@@ -28,7 +28,8 @@ __all__ = ["Compose", "ToTensor", "ToPILImage", "Normalize", "Resize","Resize2",
            "Lambda", "RandomApply", "RandomChoice", "RandomOrder", "RandomCrop", "RandomHorizontalFlip",
            "RandomVerticalFlip", "RandomResizedCrop", "RandomSizedCrop", "FiveCrop", "TenCrop", "LinearTransformation",
            "ColorJitter", "RandomRotation", "RandomRotation2", "RandomAffine", "Grayscale", "RandomGrayscale",
-           "RandomPerspective"]
+           "RandomPerspective", "ToByteTensor", "BatchRandomHorizontalFlip", "BatchRandomVerticalFlip",
+           "BatchRandomRotation2", "BatchColorJitter", "BatchNormalize", "FusedRandomResizedCrop"]
 
 _pil_interpolation_to_str = {
     Image.NEAREST: 'PIL.Image.NEAREST',
@@ -141,17 +142,32 @@ class Normalize(object):
     ``input[channel] = (input[channel] - mean[channel]) / std[channel]``
 
     .. note::
-        This transform acts out of place, i.e., it does not mutates the input tensor.
+        This transform acts out of place by default, i.e., it does not mutates the input tensor.
+
+    The ``mean`` and ``std`` tensors are built once per dtype and device and
+    reused on later calls.
 
     Args:
         mean (sequence): Sequence of means for each channel.
         std (sequence): Sequence of standard deviations for each channel.
+        inplace (bool, optional): Bool to make this operation inplace.
     """
 
     def __init__(self, mean, std, inplace=False):
         self.mean = mean
         self.std = std
         self.inplace = inplace
+        self._constants = {}
+
+    def _get_constants(self, tensor):
+        dtype = tensor.dtype if tensor.is_floating_point() else torch.float32
+        key = (dtype, tensor.device)
+        constants = self._constants.get(key)
+        if constants is None:
+            constants = (torch.as_tensor(self.mean, dtype=dtype, device=tensor.device),
+                         torch.as_tensor(self.std, dtype=dtype, device=tensor.device))
+            self._constants[key] = constants
+        return constants
 
     def __call__(self, tensor):
         """
@@ -161,7 +177,14 @@ class Normalize(object):
         Returns:
             Tensor: Normalized Tensor image.
         """
-        return F.normalize(tensor, self.mean, self.std, self.inplace)
+        mean, std = self._get_constants(tensor)
+        return F.normalize(tensor, mean, std, self.inplace)
+
+    def __getstate__(self):
+        # cached tensors may live on a device the unpickling process cannot use
+        state = self.__dict__.copy()
+        state['_constants'] = {}
+        return state
 
     def __repr__(self):
         return self.__class__.__name__ + '(mean={0}, std={1})'.format(self.mean, self.std)
@@ -473,7 +496,7 @@ class RandomCrop(object):
         Returns:
             tuple: params (i, j, h, w) to be passed to ``crop`` for random crop.
         """
-        w, h = img.size
+        w, h = F._get_image_size(img)
         th, tw = output_size
         if w == tw and h == th:
             return 0, 0, h, w
@@ -664,7 +687,8 @@ class RandomResizedCrop(object):
             tuple: params (i, j, h, w) to be passed to ``crop`` for a random
                 sized crop.
         """
-        area = img.size[0] * img.size[1]
+        width, height = F._get_image_size(img)
+        area = width * height
 
         for attempt in range(10):
             target_area = random.uniform(*scale) * area
@@ -674,24 +698,24 @@ class RandomResizedCrop(object):
             w = int(round(math.sqrt(target_area * aspect_ratio)))
             h = int(round(math.sqrt(target_area / aspect_ratio)))
 
-            if w <= img.size[0] and h <= img.size[1]:
-                i = random.randint(0, img.size[1] - h)
-                j = random.randint(0, img.size[0] - w)
+            if w <= width and h <= height:
+                i = random.randint(0, height - h)
+                j = random.randint(0, width - w)
                 return i, j, h, w
 
         # Fallback to central crop
-        in_ratio = img.size[0] / img.size[1]
+        in_ratio = width / height
         if (in_ratio < min(ratio)):
-            w = img.size[0]
+            w = width
             h = w / min(ratio)
         elif (in_ratio > max(ratio)):
-            h = img.size[1]
+            h = height
             w = h * max(ratio)
         else:  # whole image
-            w = img.size[0]
-            h = img.size[1]
-        i = (img.size[1] - h) // 2
-        j = (img.size[0] - w) // 2
+            w = width
+            h = height
+        i = (height - h) // 2
+        j = (width - w) // 2
         return i, j, h, w
 
     def __call__(self, img):
@@ -714,6 +738,56 @@ class RandomResizedCrop(object):
         return format_string
 
 
+class FusedRandomResizedCrop(RandomResizedCrop):
+    """Random resized crop, horizontal flip, ``ToTensor`` and ``Normalize`` in one transform.
+
+    Draws the same crop and flip as ``RandomResizedCrop`` followed by
+    ``RandomHorizontalFlip`` and writes the result straight into the output
+    tensor, see :func:`~torchvision.transforms.functional.resized_crop_to_tensor`.
+
+    Args:
+        size: expected output size of each edge
+        scale: range of size of the origin size cropped
+        ratio: range of aspect ratio of the origin aspect ratio cropped
+        interpolation: Default: PIL.Image.BILINEAR
+        flip_p (float): probability of the image being flipped. Default value is 0.5
+        mean (sequence, optional): Sequence of means for each channel.
+        std (sequence, optional): Sequence of standard deviations for each channel.
+        dtype (torch.dtype, optional): ``torch.uint8`` skips scaling and normalization,
+            e.g. to run :class:`BatchNormalize` after collation. Default: ``torch.float32``.
+    """
+
+    def __init__(self, size, scale=(0.08, 1.0), ratio=(3. / 4., 4. / 3.), interpolation=Image.BILINEAR,
+                 flip_p=0.5, mean=None, std=None, dtype=torch.float32):
+        super(FusedRandomResizedCrop, self).__init__(size, scale, ratio, interpolation)
+        if dtype == torch.uint8 and (mean is not None or std is not None):
+            raise ValueError('uint8 output can not be normalized')
+        self.flip_p = flip_p
+        self.mean = mean
+        self.std = std
+        self.dtype = dtype
+
+    def __call__(self, img):
+        """
+        Args:
+            img (PIL Image or numpy.ndarray): Image to be cropped and resized.
+
+        Returns:
+            Tensor: Randomly cropped, resized and flipped image.
+        """
+        i, j, h, w = self.get_params(img, self.scale, self.ratio)
+        flip = random.random() < self.flip_p
+        return F.resized_crop_to_tensor(img, i, j, h, w, self.size, self.interpolation, flip,
+                                        self.mean, self.std, self.dtype)
+
+    def __repr__(self):
+        format_string = super(FusedRandomResizedCrop, self).__repr__()[:-1]
+        format_string += ', flip_p={0}'.format(self.flip_p)
+        format_string += ', mean={0}, std={1}'.format(self.mean, self.std)
+        format_string += ', dtype={0})'.format(self.dtype)
+        return format_string
+
+
 class RandomSizedCrop(RandomResizedCrop):
     """
     Note: This transform is deprecated in favor of RandomResizedCrop.
@@ -1321,4 +1395,191 @@ class Resize_circle(object):
 
     def __repr__(self):
         interpolate_str = _pil_interpolation_to_str[self.interpolation]
-        return self.__class__.__name__ + '(size={0}, interpolation={1})'.format(self.size, interpolate_str)
\ No newline at end of file
+        return self.__class__.__name__ + '(size={0}, interpolation={1})'.format(self.size, interpolate_str)
+
+
+def _check_batch(batch):
+    if not F._is_tensor_batch(batch):
+        raise TypeError('batch should be a Tensor of size (N, C, H, W). Got {}'.format(
+            batch.size() if torch.is_tensor(batch) else type(batch)))
+
+
+def _flip_random_rows(batch, p, dim):
+    batch = batch.clone()
+    index = (torch.rand(batch.size(0)) < p).nonzero().view(-1)
+    if len(index):
+        batch[index] = batch[index].flip(dim)
+    return batch
+
+
+class ToByteTensor(object):
+    """Convert a ``PIL Image`` or ``numpy.ndarray`` to a uint8 tensor without scaling.
+
+    Converts a PIL Image or numpy.ndarray (H x W x C) of uint8 to a torch.ByteTensor
+    of shape (C x H x W) that keeps the channels-last memory layout of the image,
+    so that the DataLoader collates uint8 batches for the ``Batch*`` transforms.
+    Writable ndarrays are wrapped without a copy.
+    """
+
+    def __call__(self, pic):
+        """
+        Args:
+            pic (PIL Image or numpy.ndarray): Image to be converted to tensor.
+
+        Returns:
+            Tensor: Converted image.
+        """
+        return F.to_byte_tensor(pic)
+
+    def __repr__(self):
+        return self.__class__.__name__ + '()'
+
+
+class BatchRandomHorizontalFlip(RandomHorizontalFlip):
+    """Horizontally flip each image of a batch with a given probability.
+
+    Args:
+        p (float): probability of an image being flipped. Default value is 0.5
+    """
+
+    def __call__(self, batch):
+        """
+        Args:
+            batch (Tensor): Batch of size (N, C, H, W) to be flipped.
+
+        Returns:
+            Tensor: Randomly flipped batch.
+        """
+        _check_batch(batch)
+        return _flip_random_rows(batch, self.p, 3)
+
+
+class BatchRandomVerticalFlip(RandomVerticalFlip):
+    """Vertically flip each image of a batch with a given probability.
+
+    Args:
+        p (float): probability of an image being flipped. Default value is 0.5
+    """
+
+    def __call__(self, batch):
+        """
+        Args:
+            batch (Tensor): Batch of size (N, C, H, W) to be flipped.
+
+        Returns:
+            Tensor: Randomly flipped batch.
+        """
+        _check_batch(batch)
+        return _flip_random_rows(batch, self.p, 2)
+
+
+class BatchRandomRotation2(RandomRotation2):
+    """Rotate each image of a batch like :class:`RandomRotation2`.
+
+    Every image gets its own angle drawn from ``degrees``, which is rounded
+    down to a multiple of 90 as in ``RandomRotation2.get_params``, so the
+    rotations are exact and done with ``torch.rot90``.
+
+    Args:
+        degrees (sequence): Range of degrees to select from, within [0, 360].
+    """
+
+    def __init__(self, degrees=[0, 360]):
+        super(BatchRandomRotation2, self).__init__(degrees)
+        if not 0 <= self.degrees[0] <= self.degrees[1] <= 360:
+            raise ValueError("degrees should be a range within [0, 360].")
+
+    def __call__(self, batch):
+        """
+        Args:
+            batch (Tensor): Batch of size (N, C, H, W) to be rotated.
+
+        Returns:
+            Tensor: Rotated batch.
+        """
+        _check_batch(batch)
+        angles = torch.empty(batch.size(0)).uniform_(self.degrees[0], self.degrees[1])
+        turns = (angles // 90).clamp_(max=3).long()
+        out = batch.clone()
+        for k in (1, 2, 3):
+            index = (turns == k).nonzero().view(-1)
+            if len(index) == 0:
+                continue
+            if k != 2 and batch.size(2) != batch.size(3):
+                raise ValueError('Rotating by 90 degrees needs square images. Got {}'.format(batch.size()))
+            out[index] = torch.rot90(batch[index], k, (2, 3))
+        return out
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(degrees={0})'.format(self.degrees)
+
+
+class BatchColorJitter(ColorJitter):
+    """Randomly change the brightness, contrast, saturation and hue of each image of a batch.
+
+    Each image gets its own factors, drawn as in :class:`ColorJitter`. The
+    order of the adjustments is shuffled once per batch.
+
+    Args:
+        brightness, contrast, saturation, hue: See :class:`ColorJitter`.
+    """
+
+    def __call__(self, batch):
+        """
+        Args:
+            batch (Tensor): uint8 batch of size (N, C, H, W), or a float batch
+                with values in [0, 1].
+
+        Returns:
+            Tensor: Color jittered batch of the same dtype.
+        """
+        _check_batch(batch)
+        n = batch.size(0)
+        max_value = 255. if batch.dtype == torch.uint8 else 1.
+        adjustments = []
+        if self.brightness is not None:
+            brightness_factors = torch.empty(n).uniform_(*self.brightness)
+            adjustments.append(lambda img: F.batch_adjust_brightness(img, brightness_factors, max_value))
+        if self.contrast is not None:
+            contrast_factors = torch.empty(n).uniform_(*self.contrast)
+            adjustments.append(lambda img: F.batch_adjust_contrast(img, contrast_factors, max_value))
+        if self.saturation is not None:
+            saturation_factors = torch.empty(n).uniform_(*self.saturation)
+            adjustments.append(lambda img: F.batch_adjust_saturation(img, saturation_factors, max_value))
+        if self.hue is not None:
+            hue_factors = torch.empty(n).uniform_(*self.hue)
+            adjustments.append(lambda img: F.batch_adjust_hue(img, hue_factors))
+        random.shuffle(adjustments)
+
+        img = batch.float()
+        for adjust in adjustments:
+            img = adjust(img)
+        if batch.dtype == torch.uint8:
+            img = img.round_()
+        return img.to(batch.dtype)
+
+
+class BatchNormalize(Normalize):
+    """Normalize a batch of images with mean and standard deviation.
+
+    uint8 batches are scaled to [0, 1] in the same pass, so this replaces
+    ``ToTensor`` followed by :class:`Normalize` after collation.
+
+    Args:
+        mean (sequence): Sequence of means for each channel.
+        std (sequence): Sequence of standard deviations for each channel.
+    """
+
+    def __init__(self, mean, std):
+        super(BatchNormalize, self).__init__(mean, std)
+
+    def __call__(self, batch):
+        """
+        Args:
+            batch (Tensor): Batch of size (N, C, H, W) to be normalized.
+
+        Returns:
+            Tensor: Normalized float batch.
+        """
+        mean, std = self._get_constants(batch)
+        return F.batch_normalize(batch, mean, std)